@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the forward mode (Variable) implementation.
+
+Run from the repository root:
+
+    python benchmarks/bench_fd.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import lahg_ad as ad
+import numpy as np
+
+
+def timed(function, repeat=5):
+    """Return the best wall time of function over repeat calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def model(inputs):
+    """An N-vector function of k vector inputs."""
+    f = inputs[0]
+    for x in inputs[1:]:
+        f = (f * x).sin() + x.exp() / (1 + f ** 2)
+    return f.logistic()
+
+
+def bench_multi_direction():
+    """Compare one pass with k tangent directions against k single-direction passes."""
+    n, k = 10 ** 5, 8
+    values = [np.linspace(0.1, 1.0, n) + i for i in range(k)]
+    print(f"jacobian of an {n}-vector function of {k} inputs")
+
+    def one_direction_per_pass():
+        for j in range(k):
+            model([ad.Variable(v, np.full(n, float(i == j))) for i, v in enumerate(values)])
+
+    def all_directions():
+        model(ad.make_variables(values))
+
+    looped = timed(one_direction_per_pass)
+    batched = timed(all_directions)
+    print(f"  {k} passes {looped:7.3f} s, one pass with {k} directions {batched:7.3f} s")
+
+
+def bench_construction():
+    """Compare the validating constructor with the trusted one used for operation results."""
+    print("construction cost per Variable")
+    for label, value, seed in (
+        ("scalar", 1.5, 1.0),
+        ("1e6 elements", np.linspace(0, 1, 10 ** 6), np.ones(10 ** 6)),
+    ):
+        repeat = 10 ** 5 if label == "scalar" else 100
+        validated = timed(lambda: [ad.Variable(value, seed) for _ in range(repeat)])
+        trusted = timed(lambda: [ad.Variable._make(value, seed) for _ in range(repeat)])
+        print(
+            f"  {label:>12}: Variable() {validated / repeat * 1e6:9.2f} us, "
+            f"Variable._make() {trusted / repeat * 1e6:6.2f} us"
+        )
+    instance = ad.Variable(1.5, 1.0)
+    print(f"  instance size {sys.getsizeof(instance)} bytes, no __dict__: {not hasattr(instance, '__dict__')}")
+
+
+def bench_ufunc():
+    """Compare numpy code on an object array of scalar Variables with one array Variable."""
+    n = 10 ** 5
+    values = np.linspace(0.1, 1.0, n)
+    print(f"np.sin(x) * x + np.exp(x) on {n} elements")
+
+    def object_array():
+        x = np.array([ad.Variable(v, 1.0) for v in values], dtype=object)
+        return np.sin(x) * x + np.exp(x)
+
+    def array_variable():
+        x = ad.Variable(values, np.ones(n))
+        return np.sin(x) * x + np.exp(x)
+
+    looped = timed(object_array)
+    native = timed(array_variable)
+    print(f"  object array {looped:7.3f} s, array Variable {native:7.4f} s")
+
+
+def bench_dualarray():
+    """Compare an outer product expression on object arrays of Variables and on DualArrays."""
+    n = 300
+    values = np.linspace(0.1, 1.0, n)
+    print(f"np.sin(x[:, None] * y[None, :]) + x[:, None] / y[None, :] on {n}x{n} elements")
+    x_objects = np.array([ad.Variable(v, np.array([1.0, 0.0])) for v in values])
+    y_objects = np.array([ad.Variable(v, np.array([0.0, 1.0])) for v in values])
+    x, y = ad.DualArray.from_variables(x_objects), ad.DualArray.from_variables(y_objects)
+
+    def expression(x, y):
+        return np.sin(x[:, None] * y[None, :]) + x[:, None] / y[None, :]
+
+    looped = timed(lambda: expression(x_objects, y_objects), repeat=3)
+    native = timed(lambda: expression(x, y))
+    convert = timed(lambda: ad.DualArray.from_variables(x_objects))
+    print(f"  object arrays {looped:7.3f} s, DualArray {native:7.4f} s, from_variables {convert:7.4f} s")
+
+
+def composite(x, y):
+    """The example function of the Variable docstring with a few more operations."""
+    return np.cos(x * y) + x * y + 3 * np.log(x) + (x / y).logistic() - y.exp(2) + 1 / y
+
+
+def bench_trace():
+    """Compare calling a function of Variables with replaying its trace at many points."""
+    inputs = np.random.rand(20000, 2) + 0.5
+    for label, seeds in (("scalar tangents", [1.0, 0.0]), ("gradient tangents", np.eye(2))):
+        points = [ad.make_variables([a, b], seeds) for a, b in inputs]
+        program = ad.trace(composite, *points[0])
+        direct = timed(lambda: [composite(x, y) for x, y in points], repeat=3)
+        replay = timed(lambda: [program(x, y) for x, y in points], repeat=3)
+        compiled = ad.compile_program(program)
+        generated = timed(lambda: [compiled(x, y) for x, y in points], repeat=3)
+        per_call = (direct - replay) / len(points) * 1e6
+        per_call_generated = (direct - generated) / len(points) * 1e6
+        print(
+            f"{len(program)} operations at {len(points)} points with {label}\n"
+            f"  direct {direct:6.3f} s, traced {replay:6.3f} s, generated {generated:6.3f} s\n"
+            f"  overhead removed per call: traced {per_call:5.1f} us, "
+            f"generated {per_call_generated:5.1f} us"
+        )
+
+
+def bench_simplify():
+    """Compare replaying a trace before and after the graph simplification passes."""
+    inputs = np.random.rand(20000, 2) + 0.5
+    points = [ad.make_variables([a, b], np.eye(2)) for a, b in inputs]
+    program = ad.trace(composite, *points[0])
+    simple, removed = ad.simplify(program)
+    print(f"{len(program)} operations, {len(simple)} after simplification, removed {removed}")
+    versions = (
+        ("traced", program, simple),
+        ("generated", ad.compile_program(program), ad.compile_program(simple)),
+    )
+    for label, original, simplified in versions:
+        before = timed(lambda: [original(x, y) for x, y in points], repeat=3)
+        after = timed(lambda: [simplified(x, y) for x, y in points], repeat=3)
+        print(f"  {label:9} original {before:6.3f} s, simplified {after:6.3f} s")
+
+
+def peak_memory(function):
+    """Return the peak memory in MB allocated while calling function."""
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def bench_fused():
+    """Compare op-by-op evaluation with the blocked fused evaluation on large arrays."""
+    n = 10 ** 7
+    x = ad.DualArray(np.random.rand(n) + 0.5)
+    y = ad.DualArray(np.random.rand(n) + 0.5, np.zeros(n))
+    program = ad.trace(composite, x, y)
+    fused = ad.compile_program(program, "fused")
+    versions = (
+        ("op-by-op", lambda: composite(x, y)),
+        ("fused", lambda: fused(x, y)),
+    )
+    print(f"{len(program)} operations on {n} elements, block of {ad.codegen.BLOCK}")
+    for label, function in versions:
+        seconds = timed(function, repeat=3)
+        print(f"  {label:8} {seconds:6.3f} s, peak memory {peak_memory(function):7.1f} MB")
+
+
+def bench_primitives():
+    """Compare the fused primitives with the same functions composed from elementary operations."""
+    n = 10 ** 6
+    x = ad.Variable(np.random.randn(n), np.ones(n))
+    labels = np.random.rand(n) > 0.5
+    versions = (
+        ("softplus", lambda: (x.exp() + 1).log(np.e), x.softplus),
+        (
+            "sigmoid cross-entropy",
+            lambda: -(labels * x.logistic().log(np.e) + (1 - labels) * (1 - x.logistic()).log(np.e)),
+            lambda: x.sigmoid_cross_entropy(labels),
+        ),
+        ("log-sum-exp", lambda: np.sum(x.exp()).log(np.e), x.logsumexp),
+    )
+    print(f"primitives on {n} elements")
+    for label, composed, fused in versions:
+        print(f"  {label:22} composed {timed(composed):6.3f} s, fused {timed(fused):6.3f} s")
+
+    def logistic_exp():
+        # the single exponential formula, which overflows for x < -709
+        exp = np.exp(-x.val)
+        value = 1 / (1 + exp)
+        return ad.Variable(value, exp * value * value * x.der)
+
+    print(f"  {'logistic':22} exp(-x)  {timed(logistic_exp):6.3f} s, fused {timed(x.logistic):6.3f} s")
+
+
+def bench_constant_operands():
+    """Time arithmetic between a scalar Variable and constants of the supported types."""
+    x = ad.Variable(1.5, 1.0)
+    y = ad.Variable(2.5, 0.5)
+    a = ad.Variable(np.linspace(1.0, 2.0, 10), np.ones(10))
+    c = np.arange(10.0)
+    n = 100000
+    cases = (
+        ("x + 2.0", lambda: x + 2.0),
+        ("x - 2.0", lambda: x - 2.0),
+        ("2.0 - x", lambda: 2.0 - x),
+        ("x * 2.0", lambda: x * 2.0),
+        ("x * np.float64", lambda: x * np.float64(2.0)),
+        ("x / 2.0", lambda: x / 2.0),
+        ("2.0 / x", lambda: 2.0 / x),
+        ("x ** 2", lambda: x ** 2),
+        ("x == 2.0", lambda: x == 2.0),
+        ("array x * array", lambda: a * c),
+        ("x * y", lambda: x * y),
+    )
+    print(f"constant operand arithmetic, {n} operations each")
+    for label, operation in cases:
+        seconds = timed(lambda: [operation() for _ in range(n)])
+        print(f"  {label:16} {seconds / n * 1e6:6.3f} us per operation")
+
+
+def bench_scalar():
+    """Time elementary functions of a scalar Variable with and without the math fast path."""
+    x = ad.Variable(0.3, 1.0)
+    n = 100000
+    print(f"scalar elementary functions, {n} operations each")
+    for name in ("sin", "cos", "tan", "arcsin", "arccos", "arctan", "log"):
+        function = getattr(x, name)
+        seconds = timed(lambda: [function() for _ in range(n)])
+        scalars, ad.fd._SCALARS = ad.fd._SCALARS, ()
+        try:
+            numpy_seconds = timed(lambda: [function() for _ in range(n)])
+        finally:
+            ad.fd._SCALARS = scalars
+        print(
+            f"  {name:8} math {seconds / n * 1e6:6.3f} us, "
+            f"numpy {numpy_seconds / n * 1e6:6.3f} us"
+        )
+
+
+def bench_precision():
+    """Time and compare a DualArray model in float32 and float64."""
+    value = np.linspace(0.1, 1.0, 10 ** 6)
+
+    def run(dtype):
+        x = ad.DualArray(value, dtype=dtype)
+        return (x * x).sin() + x.exp() / (x + 1.0)
+
+    reference = run(np.float64)
+    print("precision, DualArray model on 10**6 elements")
+    for dtype in (np.float64, np.float32):
+        seconds = timed(lambda: run(dtype))
+        result = run(dtype)
+        error = np.max(np.abs(result.der - reference.der) / np.abs(reference.der))
+        print(
+            f"  {np.dtype(dtype).name}: {seconds * 1e3:7.2f} ms, "
+            f"{result.der.nbytes / 2 ** 20:5.1f} MiB per tangent, "
+            f"max relative error {error:.1e}"
+        )
+
+
+def bench_unchecked():
+    """Time a DualArray model with domain checks in checked and unchecked mode."""
+    x = ad.DualArray(np.linspace(0.1, 0.9, 10 ** 6))
+
+    def run():
+        return (x.log() + 1 / x) ** 0.5 + x.arcsin()
+
+    checked = timed(run)
+
+    def unchecked():
+        with ad.Unchecked():
+            run()
+
+    print("domain checks, DualArray model on 10**6 elements")
+    print(
+        f"  checked {checked * 1e3:7.2f} ms, unchecked {timed(unchecked) * 1e3:7.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    bench_multi_direction()
+    bench_construction()
+    bench_ufunc()
+    bench_dualarray()
+    bench_trace()
+    bench_simplify()
+    bench_fused()
+    bench_primitives()
+    bench_constant_operands()
+    bench_scalar()
+    bench_precision()
+    bench_unchecked()
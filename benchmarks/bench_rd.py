@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the reverse mode (RD) implementation.
+
+Run from the repository root:
+
+    python benchmarks/bench_rd.py
+"""
+import contextlib
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import lahg_ad as ad
+import numpy as np
+
+
+def chain(n, size=1):
+    """Build a chain of n multiplications on a leaf with size elements."""
+    x = ad.RD(np.ones(size))
+    f = x
+    for _ in range(n):
+        f = f * 1.0
+    return x, f
+
+
+def bench_chain_backward():
+    """Time the backward pass on long chains, which used to hit the recursion limit."""
+    print("chain backward (get_derivative)")
+    for n in (10 ** 5, 10 ** 6):
+        start = time.perf_counter()
+        x, f = chain(n)
+        built = time.perf_counter()
+        x.get_derivative()
+        done = time.perf_counter()
+        print(
+            f"  n = {n:>8}: build {built - start:7.3f} s, "
+            f"backward {done - built:7.3f} s ({(done - built) / n * 1e6:.2f} us/node)"
+        )
+
+
+def bench_tape_memory():
+    """Compare memory per node and backward time of the children lists and the tape."""
+    n = 10 ** 5
+    print(f"memory per node, chain of {n} scalar multiplications")
+    for mode in ("children", "tape"):
+        tracemalloc.start()
+        if mode == "tape":
+            with ad.Tape() as tape:
+                x, f = chain(n)
+        else:
+            x, f = chain(n)
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        x.get_derivative()
+        done = time.perf_counter()
+        print(
+            f"  {mode:>8}: {used / n:7.1f} bytes/node, "
+            f"backward {(done - start) / n * 1e6:.2f} us/node"
+        )
+        del x, f
+
+
+def bench_batched_jacobian():
+    """Compare one batched sweep against one backward pass per row of the Jacobian."""
+    n, depth = 200, 50
+    x = ad.RD(np.linspace(0.1, 1.0, n))
+    f = x
+    for _ in range(depth):
+        f = (f * 0.9).sin() + x
+    print(f"jacobian of {n} outputs through {depth * 3} operations")
+    start = time.perf_counter()
+    rows = [ad.backward(f, np.eye(n)[i], [x])[0] for i in range(n)]
+    looped = time.perf_counter() - start
+    start = time.perf_counter()
+    jac = ad.jacobian(f, x)
+    batched = time.perf_counter() - start
+    assert np.allclose(jac, np.array(rows))
+    print(f"  {n} backward passes {looped:7.3f} s, one batched sweep {batched:7.3f} s")
+
+
+def bench_graph_memory():
+    """Track memory over an optimization-style loop reusing the same input leaves."""
+    x = ad.RD(np.linspace(0.5, 1.5, 100))
+    n = 300
+    print(f"memory over {n} iterations reusing the input leaves")
+    for mode in ("children", "graph"):
+        x.reset()
+        tracemalloc.start()
+        start = time.perf_counter()
+        for i in range(n):
+            if mode == "graph":
+                with ad.Graph():
+                    f = (x * x).sin() + x.exp()
+                    x.get_derivative()
+            else:
+                f = (x * x).sin() + x.exp()
+                x.get_derivative()
+            if i == 9:
+                early = tracemalloc.get_traced_memory()[0]
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {mode:>8}: {early / 1024:9.1f} KiB after 10, {used / 1024:9.1f} KiB after {n}, "
+            f"{elapsed / n * 1e6:.1f} us/iteration"
+        )
+        del f
+
+
+def bench_checkpoint():
+    """Compare peak memory and time of checkpointed backward passes with full storage."""
+    n, size = 200, 5000
+    x0 = np.linspace(0.1, 1.0, size)
+    a = ad.RD(np.linspace(1.0, 2.0, size))
+
+    def step(y):
+        return (y * a).sin() + y * 0.5
+
+    def full():
+        a.reset()
+        x = ad.RD(x0)
+        f = x
+        for _ in range(n):
+            f = step(f)
+        return ad.backward(f, None, [x, a])
+
+    print(f"checkpointing, {n} steps on {size} elements")
+    cases = [("full storage", full)]
+    for checkpoints in (1, None, 40):
+        label = "sqrt(n)" if checkpoints is None else f"every {checkpoints}"
+        cases.append(
+            (
+                label,
+                lambda checkpoints=checkpoints: ad.checkpoint(
+                    [step] * n, ad.RD(x0), params=[a], checkpoints=checkpoints
+                ),
+            )
+        )
+    for label, function in cases:
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {label:>12}: peak {peak / 2 ** 20:8.1f} MiB, {elapsed:6.3f} s")
+
+
+def bench_lazy_derivatives():
+    """Compare the forward pass of an inference-only workload with eager and lazy derivatives."""
+    size, depth = 100000, 20
+    x = ad.RD(np.linspace(0.1, 1.0, size))
+    y = ad.RD(np.linspace(1.0, 2.0, size))
+
+    def model():
+        x.reset()
+        y.reset()
+        f = x
+        for _ in range(depth):
+            f = (f * y).sin().tanh() + f.arctan() ** 2 - np.hypot(f, y)
+        return f
+
+    def lazy_model():
+        with ad.lazy_derivatives():
+            return model()
+
+    print(f"forward pass without backward, {depth * 6} operations on {size} elements")
+    for label, function in (("eager", model), ("lazy", lazy_model)):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        f = function()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del f
+        print(f"  {label:>6}: {elapsed:6.3f} s, graph {used / 2 ** 20:7.1f} MiB")
+
+
+def bench_requires_grad():
+    """Compare graph memory and tape sweep time when constant data requires gradients or not."""
+    size, depth = 20000, 20
+    data0 = np.linspace(1.0, 2.0, size)
+
+    def build(requires_grad):
+        with ad.Tape() as tape:
+            w = ad.RD(np.full(size, 0.5))
+            data = ad.RD(data0, requires_grad=requires_grad)
+            features = data
+            for _ in range(depth):
+                features = (features * 0.9).sin() + data
+            f = (w * features).tanh()
+        return tape, w, f
+
+    print(f"{depth * 3} feature operations on constant data of {size} elements, on a tape")
+    for requires_grad in (True, False):
+        start = time.perf_counter()
+        tape, w, f = build(requires_grad)
+        built = time.perf_counter()
+        w.get_derivative()
+        done = time.perf_counter()
+        print(
+            f"  requires_grad={requires_grad!s:>5}: build {built - start:6.3f} s, "
+            f"backward {done - built:6.3f} s, {len(tape):3} records, "
+            f"tape {tape.nbytes() / 2 ** 20:6.1f} MiB"
+        )
+
+
+def bench_node_creation():
+    """Time RD construction and one operation on arrays of growing size."""
+    print("node creation")
+    for size in (10 ** 2, 10 ** 4, 10 ** 6):
+        value = np.linspace(0.1, 1.0, size)
+        x = ad.RD(value)
+        repeat = max(10, 10 ** 6 // size)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            ad.RD(value)
+        created = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            x * 1.0
+            x.reset()
+        operation = (time.perf_counter() - start) / repeat
+        print(
+            f"  size {size:>8}: RD(value) {created * 1e6:9.2f} us, "
+            f"x * 1.0 {operation * 1e6:9.2f} us"
+        )
+
+
+def bench_precision():
+    """Time and compare the reverse pass of a model in float32 and float64."""
+    value = np.linspace(0.1, 1.0, 10 ** 6)
+
+    def run(dtype):
+        x = ad.RD(value, dtype=dtype)
+        f = (x * x).sin() + x.exp() / (x + 1.0)
+        return f, x.get_derivative()
+
+    reference = run(np.float64)[1]
+    print("precision, RD model on 10**6 elements")
+    for dtype in (np.float64, np.float32):
+        start = time.perf_counter()
+        for _ in range(5):
+            f, derivative = run(dtype)
+        seconds = (time.perf_counter() - start) / 5
+        error = np.max(np.abs(derivative - reference) / np.abs(reference))
+        print(
+            f"  {np.dtype(dtype).name}: {seconds * 1e3:7.2f} ms, "
+            f"{derivative.nbytes / 2 ** 20:5.1f} MiB per adjoint, "
+            f"max relative error {error:.1e}"
+        )
+
+
+def bench_unchecked():
+    """Time operations with domain checks in checked and unchecked mode on large arrays."""
+    print("domain checks, log, division and power on 10**6 elements")
+    value = np.linspace(0.1, 1.0, 10 ** 6)
+    x = ad.RD(value)
+    operations = {
+        "log": lambda: x.log(np.e),
+        "1 / x": lambda: 1 / x,
+        "x ** 0.5": lambda: x ** 0.5,
+    }
+    for name, operation in operations.items():
+        timings = []
+        for scope in (contextlib.nullcontext, ad.Unchecked):
+            start = time.perf_counter()
+            for _ in range(10):
+                with ad.Graph(), scope():
+                    operation()
+            timings.append((time.perf_counter() - start) / 10)
+        start = time.perf_counter()
+        any(value <= 0)
+        scan = time.perf_counter() - start
+        print(
+            f"  {name:9} checked {timings[0] * 1e3:6.2f} ms, "
+            f"unchecked {timings[1] * 1e3:6.2f} ms "
+            f"(a check with the builtin any took {scan * 1e3:6.2f} ms)"
+        )
+
+
+def bench_incremental():
+    """Time one changed input of a wide graph, rebuilt or recomputed incrementally."""
+    width = 512
+    values = [np.linspace(0.1, 1.0, 100) + i / width for i in range(width)]
+
+    def wide(*xs):
+        terms = [np.sum((x * 0.5).sin() * x.exp() + x ** 2) for x in xs]
+        while len(terms) > 1:
+            terms = [a + b for a, b in zip(terms[::2], terms[1::2])]
+        return terms[0]
+
+    graph = ad.Incremental(wide, *values)
+    print(f"incremental recomputation, {width} inputs, one input changes per iteration")
+    n = 20
+    start = time.perf_counter()
+    for step in range(n):
+        values[step] = values[step] * 1.01
+        leaves = [ad.RD(value) for value in values]
+        ad.backward(wide(*leaves), None, leaves)
+    rebuild = (time.perf_counter() - start) / n
+    start = time.perf_counter()
+    for step in range(n):
+        graph.update(step, values[step] * 1.01)
+        graph.gradient()
+    incremental = (time.perf_counter() - start) / n
+    print(
+        f"  rebuild {rebuild * 1e3:7.2f} ms, incremental {incremental * 1e3:7.2f} ms "
+        f"({graph.n_forward} values and {graph.n_backward} adjoints of "
+        f"{len(graph.program.nodes)} nodes)"
+    )
+
+
+def bench_static():
+    """Time the same model on new leaf values, rebuilt at every iteration or frozen once."""
+
+    def layers(x, a):
+        for _ in range(20):
+            x = (x * a).tanh() + x * 0.5
+        return np.sum(x)
+
+    print("static graph replay, 20 layers, new leaf values at every iteration")
+    for size in (10, 10 ** 3, 10 ** 5):
+        a = np.linspace(0.5, 1.5, size)
+        graph = ad.StaticGraph(layers, np.ones(size), a)
+        n = max(5, 10 ** 5 // size)
+        values = [np.full(size, 0.01 * i) for i in range(n)]
+        start = time.perf_counter()
+        for value in values:
+            x, leaf = ad.RD(value), ad.RD(a)
+            layers(x, leaf)
+            x.get_derivative(), leaf.get_derivative()
+        rebuild = (time.perf_counter() - start) / n
+        start = time.perf_counter()
+        for value in values:
+            graph(value, a)
+        static = (time.perf_counter() - start) / n
+        print(
+            f"  size {size:>6}: rebuild {rebuild * 1e3:8.3f} ms, "
+            f"static {static * 1e3:8.3f} ms ({rebuild / static:4.1f}x)"
+        )
+
+
+def bench_interleaved():
+    """Time a line search that builds a trial point and queries the gradient at every step."""
+    from lahg_ad import rd
+
+    def search(n, recompute):
+        x = ad.RD(np.linspace(0.0, 1.0, 100))
+        d = np.linspace(1.0, -1.0, 100)
+        start = time.perf_counter()
+        for i in range(n):
+            y = x + d * (0.5 ** (i % 20))
+            np.sum((y * y).sin() + y.exp())
+            if recompute:
+                # the whole downstream graph, as when every operation dropped the cache
+                rd._backward(rd._topological_order(x, cached=False))
+            x.get_derivative()
+        return (time.perf_counter() - start) / n
+
+    print("interleaved build and gradient query, time per line search step")
+    for n in (250, 500, 1000, 2000):
+        full, versioned = search(n, True), search(n, False)
+        print(
+            f"  {n:>5} steps: full recompute {full * 1e3:7.3f} ms, "
+            f"versioned cache {versioned * 1e3:7.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    bench_chain_backward()
+    bench_tape_memory()
+    bench_batched_jacobian()
+    bench_graph_memory()
+    bench_checkpoint()
+    bench_lazy_derivatives()
+    bench_requires_grad()
+    bench_node_creation()
+    bench_precision()
+    bench_unchecked()
+    bench_incremental()
+    bench_static()
+    bench_interleaved()
@@ -1,6 +1,17 @@
-__all__ = ["fd", "rd", "Jacobian"]
+__all__ = ["fd", "rd", "Jacobian", "tape", "graph", "checkpointing", "ufuncs", "dualarray", "tracing", "codegen", "passes", "precision", "checks", "incremental", "static"]
 from .fd import *
-from .rd import RD
+from .rd import RD, backward, jacobian, lazy_derivatives
+from .precision import Precision
+from .checks import Unchecked
+from .tape import Tape
+from .graph import Graph
+from .checkpointing import checkpoint
+from .dualarray import DualArray
+from .tracing import trace, Program
+from .incremental import Incremental
+from .static import StaticGraph
+from .codegen import compile_program, generate_source
+from .passes import simplify
 from .Jacobian import *
 
 # Version of lahg_ad package
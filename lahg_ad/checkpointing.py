@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains gradient checkpointing for long reverse mode computations written as a
+sequence of steps. Only the inputs of some steps are kept during the forward pass. The backward
+pass recomputes the graph of one segment of steps at a time from the stored input of the segment
+and pushes the cotangent through it, so at most one segment is resident in memory.
+"""
+
+import math
+
+import numpy as np
+
+from . import graph as _graph
+from . import tape as _tape
+from .rd import RD, backward
+
+
+def schedule(n_steps, checkpoints=None):
+    """
+    Function to choose the steps whose inputs are stored by checkpoint.
+
+    INPUTS
+    ------
+    n_steps : int
+        number of steps
+    checkpoints : None, int or list of int, optional
+        None stores the input of every round(sqrt(n_steps))-th step, so about sqrt(n_steps)
+        inputs are stored and segments have about sqrt(n_steps) steps. An int k stores the
+        input of every k-th step: a small k keeps more inputs, a large k keeps larger segment
+        graphs, and k >= n_steps is the same as storing the full graph. A list marks the steps
+        whose inputs are stored, the first step is always marked.
+
+    RETURNS
+    -------
+    list of int
+        the sorted indices of the marked steps
+
+    RAISES
+    ------
+    Exception
+        if the number of steps between checkpoints is not positive
+        if a marked step is not the index of a step
+
+    EXAMPLES
+    --------
+    >>> schedule(10)
+    [0, 3, 6, 9]
+    >>> schedule(10, 4)
+    [0, 4, 8]
+    >>> schedule(10, [7, 2])
+    [0, 2, 7]
+    """
+    if n_steps == 0:
+        return []
+    if checkpoints is None:
+        checkpoints = max(1, round(math.sqrt(n_steps)))
+    if isinstance(checkpoints, (int, np.integer)):
+        if checkpoints < 1:
+            raise Exception("The number of steps between checkpoints must be positive!")
+        return list(range(0, n_steps, checkpoints))
+    marks = sorted(set(checkpoints) | {0})
+    if marks[0] < 0 or marks[-1] >= n_steps:
+        raise Exception("Checkpoints must be indices of steps!")
+    return marks
+
+
+def checkpoint(functions, x, cotangent=None, params=(), checkpoints=None):
+    """
+    Function to compute the vector-Jacobian product of a sequence of steps with gradient
+    checkpointing. The forward pass only keeps the inputs of the steps chosen by schedule and
+    the backward pass recomputes one segment at a time. With segments of k steps, about
+    n_steps / k + k step graphs are in memory instead of n_steps, and every step is run twice.
+
+    The forward pass runs the steps on values that do not require gradients, so it records no
+    graph of its own. Every step runs inside a Graph scope, which owns the params the steps use
+    (see Graph.own): their children lists are emptied, including the children recorded before
+    the call, so a graph built on the params beforehand can no longer be differentiated.
+    The function cannot be used while a tape is recording.
+
+    INPUTS
+    ------
+    functions : list of functions
+        the steps, every step maps one RD object to the next one
+    x : RD object
+        input of the first step
+    cotangent : numpy array or None, optional
+        cotangent of the output of the last step, or a 2-D array with one cotangent per row.
+        None seeds ones.
+    params : list of RD objects, optional
+        other RD objects the steps use, e.g. through a closure
+    checkpoints : None, int or list of int, optional
+        the memory/compute tradeoff, see schedule
+
+    RETURNS
+    -------
+    value : numpy array
+        output of the last step
+    adjoints : list of numpy arrays
+        the adjoint of x followed by the adjoint of every param
+
+    RAISES
+    ------
+    Exception
+        if a tape is recording
+        if the cotangent and the output have different lengths
+        if the checkpoints are invalid
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([0.5, 1.0]))
+    >>> a = RD(np.array([2.0, 2.0]))
+    >>> value, (dx, da) = checkpoint([lambda y: (y * a).sin()] * 4, x, params=[a])
+    >>> y = RD(np.array([0.5, 1.0]))
+    >>> b = RD(np.array([2.0, 2.0]))
+    >>> f = ((((y * b).sin() * b).sin() * b).sin() * b).sin()
+    >>> np.allclose(value, f.val)
+    True
+    >>> expected_dx, expected_db = backward(f, None, [y, b])
+    >>> np.allclose(dx, expected_dx) and np.allclose(da, expected_db)
+    True
+    """
+    if _tape.active() is not None:
+        raise Exception("Checkpointing cannot be used while a tape is recording!")
+    functions = list(functions)
+    marks = schedule(len(functions), checkpoints)
+    marked = set(marks)
+    stored = {}
+    value = x.val
+    for i, function in enumerate(functions):
+        if i in marked:
+            stored[i] = value
+        with _graph.Graph():
+            value = function(RD._make(value, requires_grad=False)).val
+
+    if cotangent is None:
+        cotangent = np.ones(len(value))
+    cotangent = np.asarray(cotangent, dtype=float)
+    if cotangent.ndim not in (1, 2) or cotangent.shape[-1] != len(value):
+        raise Exception("The cotangent must have the same length as the output!")
+    adjoint = cotangent
+    totals = [np.zeros(cotangent.shape[:-1] + (len(p.val),)) for p in params]
+    bounds = marks + [len(functions)]
+    for start, stop in reversed(list(zip(bounds[:-1], bounds[1:]))):
+        with _graph.Graph():
+            leaf = RD._make(stored.pop(start))
+            y = leaf
+            for function in functions[start:stop]:
+                y = function(y)
+            adjoint, *adjoints = backward(y, adjoint, [leaf, *params])
+        for total, param_adjoint in zip(totals, adjoints):
+            total += param_adjoint
+    return value, [adjoint] + totals
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
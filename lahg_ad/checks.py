@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the Unchecked scope, which switches off the domain checks of the operations.
+By default, operations such as log, division and power scan their input arrays and raise an
+exception before producing a value outside of the domain of the function. Inside an Unchecked
+scope the scans are skipped, numpy returns nan or inf for such elements, and the floating point
+errors numpy reports while the scope is active are collected and reported once when it exits.
+"""
+
+import warnings
+
+import numpy as np
+
+# Stack of the Unchecked scopes entered, the domain checks are skipped while it is not empty
+_stack = []
+
+
+def enabled():
+    """
+    Function to know if operations check the domain of their array inputs.
+
+    RETURNS
+    -------
+    bool
+
+    EXAMPLES
+    --------
+    >>> enabled()
+    True
+    >>> with Unchecked():
+    ...     enabled()
+    False
+    """
+    return not _stack
+
+
+class Unchecked:
+    """
+    This is the Unchecked class, a scope in which operations do not scan their array inputs for
+    values outside of the domain of the function. The numpy floating point errors of the
+    operations run inside the scope (divide by zero, invalid value and overflow) are collected
+    in the errors attribute instead, and are reported once on exit.
+
+    Scalar inputs are still checked, since the check costs nothing and Python arithmetic would
+    raise anyway.
+
+    EXAMPLES
+    ========
+    >>> from lahg_ad import RD
+    >>> x = RD(np.array([1.0, 0.0, -1.0]))
+    >>> with Unchecked(errors="ignore") as scope:
+    ...     f = x.log(np.e)
+    >>> f.val
+    array([  0., -inf,  nan])
+    >>> scope.errors
+    ['divide by zero', 'invalid value']
+    """
+
+    def __init__(self, errors="warn"):
+        """
+        Unchecked class constructor
+
+        INPUTS
+        ------
+        errors : str, optional
+            what to do on exit if numpy reported floating point errors inside the scope:
+            "warn" issues one RuntimeWarning, "raise" raises a ValueError and "ignore" only
+            keeps them in the errors attribute
+
+        RAISES
+        ------
+        ValueError
+            if errors is not "warn", "raise" or "ignore"
+
+        EXAMPLES
+        --------
+        >>> Unchecked().errors
+        []
+        """
+        if errors not in ("warn", "raise", "ignore"):
+            raise ValueError(
+                f"errors must be 'warn', 'raise' or 'ignore', not {errors!r}"
+            )
+        self.mode = errors
+        self.errors = []
+        self._errstate = None
+
+    def _collect(self, error, flag):
+        """
+        Method called by numpy with the kind of every floating point error.
+        """
+        if error not in self.errors:
+            self.errors.append(error)
+
+    def __enter__(self):
+        self._errstate = np.errstate(
+            divide="call", invalid="call", over="call", call=self._collect
+        )
+        self._errstate.__enter__()
+        _stack.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _stack.remove(self)
+        self._errstate.__exit__(*exc)
+        self._errstate = None
+        if exc[0] is None and self.errors and self.mode != "ignore":
+            message = "Non-finite results in an unchecked scope: " + ", ".join(
+                self.errors
+            )
+            if self.mode == "raise":
+                raise ValueError(message)
+            warnings.warn(message, RuntimeWarning, stacklevel=2)
+        return False
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the generation of numpy source code from the Programs recorded by trace.
+The generated function evaluates the recorded operations as straight-line code, together with
+their forward mode tangents or their reverse mode adjoints. Compiled functions are cached by the
+structure of the program, so that programs recorded from the same function share their code.
+"""
+
+import re
+
+import numpy as np
+
+from . import ufuncs as _ufuncs
+from .fd import Variable
+from .tracing import REDUCTIONS, SOURCES
+
+# Compiled functions, keyed by mode and program structure
+_cache = {}
+
+
+def _substitute(expression, names):
+    """
+    Function to replace the operand names out, x and y of an expression by variable names.
+    Keyword arguments such as out= are left unchanged.
+
+    EXAMPLES
+    --------
+    >>> _substitute("y * x ** (y - 1)", {"x": "v0", "y": "v1"})
+    'v1 * v0 ** (v1 - 1)'
+    """
+    return re.sub(
+        r"\b(out|x|y)\b(?!=)", lambda match: names[match.group(1)], expression
+    )
+
+
+def _constants(program):
+    """
+    Function to get the indices of the constant nodes of a program.
+    """
+    return [i for i, node in enumerate(program.nodes) if node.op == "const"]
+
+
+def structure(program):
+    """
+    Function to get a hashable description of a program that ignores the constant values.
+    Programs with the same structure share their generated code.
+
+    RETURNS
+    -------
+    tuple
+
+    EXAMPLES
+    --------
+    >>> from lahg_ad.tracing import trace
+    >>> p = trace(lambda x: x * 2.0, Variable(1.0, 1.0))
+    >>> q = trace(lambda x: x * 3.0, Variable(5.0, 1.0))
+    >>> structure(p) == structure(q)
+    True
+    """
+    nodes = tuple(
+        (
+            node.op,
+            node.args,
+            () if node.op == "const" else node.params,
+            np.shape(value),
+            directions,
+        )
+        for node, value, directions in zip(
+            program.nodes, program.values, program.directions
+        )
+    )
+    return nodes, tuple(program.inputs), tuple(program.outputs)
+
+
+def _local(program, index, arg, rule):
+    """
+    Function to get the source of a partial derivative of node index with respect to node arg,
+    or None if the partial derivative is the constant 1.
+    """
+    node = program.nodes[index]
+    names = dict(zip("xy", ["v{}".format(a) for a in node.args]))
+    names["out"] = "v{}".format(index)
+    if not isinstance(rule, str):
+        return None if rule == 1 else repr(float(rule))
+    return "({})".format(_substitute(rule, names))
+
+
+def _needs_axis(program, index, rule):
+    """
+    Function to know if a partial derivative is an array that needs a trailing direction axis.
+    The partial derivative is evaluated on the traced sample values.
+    """
+    node = program.nodes[index]
+    operands = [program.values[a] for a in node.args]
+    local = _ufuncs.partial_derivative(
+        _ufuncs.compile_rule(rule, len(operands)), program.values[index], *operands
+    )
+    return np.ndim(local) > 0
+
+
+def _forward_lines(program, tangents):
+    """
+    Function to generate the lines evaluating every operation, and its tangent if tangents.
+    """
+    lines = []
+    for k, index in enumerate(_constants(program)):
+        lines.append("v{} = c[{}]".format(index, k))
+    for index, node in enumerate(program.nodes):
+        if node.op in ("input", "const"):
+            continue
+        if node.op in REDUCTIONS:
+            ufunc = REDUCTIONS[node.op].__name__
+            (arg,), (axis,) = node.args, node.params
+            lines.append(
+                "v{} = np.{}.reduce(v{}, axis={})".format(index, ufunc, arg, axis)
+            )
+            if tangents:
+                axes = _ufuncs.reduction_axes(np.ndim(program.values[arg]), axis)
+                local = "REDUCTIONS[np.{}](v{}, {})".format(ufunc, arg, axis)
+                if program.directions[arg]:
+                    local += "[..., None]"
+                lines.append(
+                    "d{} = ({} * d{}).sum(axis={})".format(index, local, arg, axes)
+                )
+            continue
+        expression, rules = SOURCES[node.op]
+        names = dict(zip("xy", ["v{}".format(a) for a in node.args]))
+        lines.append("v{} = {}".format(index, _substitute(expression, names)))
+        if not tangents:
+            continue
+        terms = []
+        for arg, rule in zip(node.args, rules):
+            if program.nodes[arg].op == "const":
+                continue
+            local = _local(program, index, arg, rule)
+            if local is None:
+                terms.append("d{}".format(arg))
+                continue
+            if (
+                program.directions[arg]
+                and isinstance(rule, str)
+                and _needs_axis(program, index, rule)
+            ):
+                local += "[..., None]"
+            terms.append("{} * d{}".format(local, arg))
+        lines.append("d{} = {}".format(index, " + ".join(terms)))
+    return lines
+
+
+def _unbroadcast(expression, shape, target):
+    """
+    Function to sum an adjoint of the given shape back to the shape of a broadcast operand.
+    """
+    if shape == target:
+        return expression
+    lead = len(shape) - len(target)
+    axes = tuple(range(lead)) + tuple(
+        lead + i for i, n in enumerate(target) if n == 1 and shape[lead + i] != 1
+    )
+    return "np.sum({}, axis={}).reshape({})".format(expression, axes, target)
+
+
+def _reverse_lines(program):
+    """
+    Function to generate the lines accumulating the adjoints of the nodes, outputs first.
+    """
+    lines = []
+    defined = set()
+
+    def accumulate(arg, contribution):
+        if arg in defined:
+            lines.append("g{0} = g{0} + {1}".format(arg, contribution))
+        else:
+            lines.append("g{} = {}".format(arg, contribution))
+            defined.add(arg)
+
+    for k, index in enumerate(program.outputs):
+        if program.nodes[index].op != "const":
+            accumulate(index, "s{}".format(k))
+    for index in range(len(program.nodes) - 1, -1, -1):
+        node = program.nodes[index]
+        if index not in defined or node.op in ("input", "const"):
+            continue
+        # the partial derivatives broadcast to the shape of the node at most
+        shape = np.shape(program.values[index])
+        if node.op in REDUCTIONS:
+            ufunc = REDUCTIONS[node.op].__name__
+            (arg,), (axis,) = node.args, node.params
+            adjoint = "g{}".format(index)
+            if axis is not None:
+                adjoint = "np.expand_dims({}, {})".format(adjoint, axis)
+            accumulate(
+                arg,
+                "REDUCTIONS[np.{}](v{}, {}) * {}".format(ufunc, arg, axis, adjoint),
+            )
+            continue
+        for arg, rule in zip(node.args, SOURCES[node.op][1]):
+            if program.nodes[arg].op == "const":
+                continue
+            local = _local(program, index, arg, rule)
+            contribution = "g{}".format(index)
+            if local is not None:
+                contribution = "{} * {}".format(local, contribution)
+            target = np.shape(program.values[arg])
+            accumulate(arg, _unbroadcast(contribution, shape, target))
+    return lines, defined
+
+
+# Elements per block of the fused evaluation. The value and tangent buffers of a few tens of
+# operations then stay in the cache, while the per-block Python overhead remains small.
+BLOCK = 16384
+
+# Statements of the primitives that are not one ufunc, writing their value into out
+_FUSED = {
+    "logistic": (
+        "np.negative(x, out=out)",
+        "np.exp(out, out=out)",
+        "np.add(out, 1.0, out=out)",
+        "np.reciprocal(out, out=out)",
+    )
+}
+
+
+def _check_fusable(program):
+    """
+    Function to check that a program only applies elementwise operations to values of one
+    shape, with inputs that all have, or all do not have, a direction axis.
+
+    RETURNS
+    -------
+    the shape of the values
+
+    RAISES
+    ------
+    ValueError
+        if the program contains reductions or broadcasts its operands
+    """
+    shape = np.shape(program.values[program.inputs[0]]) if program.inputs else ()
+    for index, node in enumerate(program.nodes):
+        value_shape = np.shape(program.values[index])
+        if node.op in REDUCTIONS:
+            raise ValueError("Only elementwise programs can be fused")
+        if node.op == "const" and value_shape not in ((), shape):
+            raise ValueError("The constants must be scalars or have the input shape")
+        if node.op != "const" and value_shape != shape:
+            raise ValueError("All traced values must have the same shape to be fused")
+    if len({program.directions[index] for index in program.inputs}) > 1:
+        raise ValueError("The inputs must all have tangent directions, or none")
+    return shape
+
+
+def _fused_tangent(program, index, target):
+    """
+    Function to generate the statements writing the tangent of node index into target.
+    """
+    node = program.nodes[index]
+    lines = []
+    for arg, rule in zip(node.args, SOURCES[node.op][1]):
+        if program.nodes[arg].op == "const":
+            continue
+        first = not lines
+        if not isinstance(rule, str) and rule in (1, -1):
+            if first:
+                function = (
+                    "np.copyto({0}, d{1})"
+                    if rule == 1
+                    else "np.negative(d{1}, out={0})"
+                )
+                lines.append(function.format(target, arg))
+            else:
+                lines.append(
+                    "{} {}= d{}".format(target, "+" if rule == 1 else "-", arg)
+                )
+            continue
+        local = _local(program, index, arg, rule)
+        if (
+            program.directions[arg]
+            and isinstance(rule, str)
+            and _needs_axis(program, index, rule)
+        ):
+            local += "[..., None]"
+        if first:
+            lines.append("np.multiply({}, d{}, out={})".format(local, arg, target))
+        else:
+            lines.append("{} += {} * d{}".format(target, local, arg))
+    if not lines:
+        lines.append("{}[...] = 0".format(target))
+    return lines
+
+
+def _fused_lines(program):
+    """
+    Function to generate the body of the fused function: the allocation of one value and one
+    tangent buffer per operation, and the loop evaluating the operations block by block.
+    """
+    constants = _constants(program)
+    outputs = {}
+    for k, index in enumerate(program.outputs):
+        if program.nodes[index].op not in ("input", "const"):
+            outputs.setdefault(index, k)
+    setup = [
+        "tail = D{}.shape[1:]".format(program.inputs[0])
+        if program.inputs
+        else "tail = ()",
+        "dtype = R0.dtype",
+    ]
+    loop = [
+        "stop = min(start + block, n)",
+        "m = stop - start",
+    ]
+    for index in program.inputs:
+        loop.append("v{0} = V{0}[start:stop]".format(index))
+        loop.append("d{0} = D{0}[start:stop]".format(index))
+    for k, index in enumerate(constants):
+        if np.ndim(program.values[index]):
+            loop.append("v{} = c[{}][start:stop]".format(index, k))
+        else:
+            setup.append("v{} = c[{}]".format(index, k))
+    for index, node in enumerate(program.nodes):
+        if node.op in ("input", "const"):
+            continue
+        if index in outputs:
+            value = "R{}[start:stop]".format(outputs[index])
+            tangent = "T{}[start:stop]".format(outputs[index])
+        else:
+            setup.append("b{} = np.empty(block, dtype)".format(index))
+            tail = " + tail" if program.directions[index] else ""
+            setup.append("e{} = np.empty((block,){}, dtype)".format(index, tail))
+            value, tangent = "b{}[:m]".format(index), "e{}[:m]".format(index)
+        loop.append("v{} = {}".format(index, value))
+        loop.append("d{} = {}".format(index, tangent))
+        names = dict(zip("xy", ["v{}".format(a) for a in node.args]))
+        names["out"] = "v{}".format(index)
+        if node.op in _FUSED:
+            loop += [_substitute(line, names) for line in _FUSED[node.op]]
+        elif isinstance(getattr(np, node.op, None), np.ufunc):
+            operands = ", ".join(names[name] for name in "xy"[: len(node.args)])
+            loop.append("np.{}({}, out=v{})".format(node.op, operands, index))
+        else:
+            expression = _substitute(SOURCES[node.op][0], names)
+            loop.append("np.copyto(v{}, {})".format(index, expression))
+        loop += _fused_tangent(program, index, "d{}".format(index))
+    for k, index in enumerate(program.outputs):
+        if outputs.get(index) != k:
+            loop.append("R{}[start:stop] = v{}".format(k, index))
+            derivative = (
+                "0" if program.nodes[index].op == "const" else "d{}".format(index)
+            )
+            loop.append("T{}[start:stop] = {}".format(k, derivative))
+    return (
+        setup + ["for start in range(0, n, block):"] + ["    " + line for line in loop]
+    )
+
+
+def generate_source(program, mode="forward"):
+    """
+    Function to generate the numpy source of a program.
+
+    In forward mode the generated function takes the constants of the program followed by the
+    value and tangent of every input, and returns the values and the tangents of the outputs.
+    In reverse mode it takes the constants, the value of every input and one cotangent per
+    output, and returns the values of the outputs and the gradients of the inputs.
+    In fused mode it takes the constants, the number of elements, the block size, the flattened
+    value and tangent of every input, and the flattened value and tangent arrays of every output,
+    which it fills block by block with ufuncs writing into preallocated buffers of the dtype of
+    the first output.
+
+    INPUTS
+    ------
+    program : Program object
+    mode : str, optional
+        "forward", "reverse" or "fused". The default is "forward".
+
+    RETURNS
+    -------
+    str
+
+    RAISES
+    ------
+    ValueError
+        if mode is not "forward", "reverse" or "fused"
+        if mode is "fused" and the program has reductions or broadcasts its operands
+
+    EXAMPLES
+    --------
+    >>> from lahg_ad.tracing import trace
+    >>> program = trace(lambda x: x.sin() * x, Variable(1.0, 1.0))
+    >>> print(generate_source(program))
+    import numpy as np
+    <BLANKLINE>
+    def forward(c, v0, d0):
+        v1 = np.sin(v0)
+        d1 = (np.cos(v0)) * d0
+        v2 = v1 * v0
+        d2 = (v0) * d1 + (v1) * d0
+        return (v2,), (d2,)
+    <BLANKLINE>
+    >>> print(generate_source(program, "reverse"))
+    import numpy as np
+    <BLANKLINE>
+    def reverse(c, v0, s0):
+        v1 = np.sin(v0)
+        v2 = v1 * v0
+        g2 = s0
+        g1 = (v0) * g2
+        g0 = (v1) * g2
+        g0 = g0 + (np.cos(v0)) * g1
+        return (v2,), (g0,)
+    <BLANKLINE>
+    """
+    if mode not in ("forward", "reverse", "fused"):
+        raise ValueError("The mode must be 'forward', 'reverse' or 'fused'")
+    if mode == "fused":
+        _check_fusable(program)
+        params = ["n", "block"]
+        params += ["V{0}, D{0}".format(index) for index in program.inputs]
+        params += ["R{0}, T{0}".format(k) for k in range(len(program.outputs))]
+        body = _fused_lines(program)
+    elif mode == "forward":
+        params = ["v{0}, d{0}".format(index) for index in program.inputs]
+        body = _forward_lines(program, tangents=True)
+        results = ["d{}".format(index) for index in program.outputs]
+        results = [
+            "0" if program.nodes[index].op == "const" else name
+            for index, name in zip(program.outputs, results)
+        ]
+    else:
+        params = ["v{}".format(index) for index in program.inputs]
+        params += ["s{}".format(k) for k in range(len(program.outputs))]
+        body = _forward_lines(program, tangents=False)
+        adjoints, defined = _reverse_lines(program)
+        body += adjoints
+        results = [
+            "g{}".format(index)
+            if index in defined
+            else "np.zeros({})".format(np.shape(program.values[index]))
+            for index in program.inputs
+        ]
+    header = ["import numpy as np"]
+    if any(node.op in REDUCTIONS for node in program.nodes):
+        header.append("from lahg_ad.ufuncs import REDUCTIONS")
+    lines = header + ["", "def {}({}):".format(mode, ", ".join(["c"] + params))]
+    lines += ["    " + line for line in body]
+    if mode != "fused":
+        values = ["v{}".format(index) for index in program.outputs]
+        lines.append(
+            "    return ({},), ({},)".format(", ".join(values), ", ".join(results))
+        )
+    return "\n".join(lines) + "\n"
+
+
+def compile_program(program, mode="forward", block=BLOCK):
+    """
+    Function to compile the generated source of a program into a Python function.
+    The compiled code is cached by the structure of the program and shared between programs
+    that differ in their constant values only.
+
+    In forward mode the returned function takes Variable objects like the program and returns
+    a Variable object, or a tuple of them. In reverse mode it takes the input values (or
+    Variable objects) and an optional keyword argument cotangents, one per output with ones as
+    default, and returns the output value(s) and a tuple with the gradient of every input.
+    Fused mode takes and returns Variable objects like forward mode, evaluates the program
+    block by block and only allocates the results and one block of every intermediate value,
+    which lowers the peak memory and the memory traffic on large arrays. It computes in the
+    floating point dtype of the input values and tangents, so float32 inputs stay float32.
+    The compiled code is specialized on the shapes of the traced inputs and on whether their
+    tangents have a direction axis, and the returned function checks its inputs against them.
+
+    INPUTS
+    ------
+    program : Program object
+    mode : str, optional
+        "forward", "reverse" or "fused". The default is "forward".
+    block : int, optional
+        number of elements evaluated at once in fused mode. The default is BLOCK.
+
+    RETURNS
+    -------
+    function, raising an Exception if its inputs do not match the traced inputs
+
+    EXAMPLES
+    --------
+    >>> from lahg_ad.tracing import trace
+    >>> program = trace(lambda x, y: x * y + x.sin(), Variable(1.0, 1.0), Variable(2.0, 0.0))
+    >>> print(compile_program(program)(Variable(np.pi, 1.0), Variable(3.0, 0.0)))
+    value = 9.42477796076938, derivative = 2.0
+    >>> value, gradients = compile_program(program, "reverse")(np.pi, 3.0)
+    >>> print(value, *gradients)
+    9.42477796076938 2.0 3.141592653589793
+    >>> program = trace(lambda x: (x * 2.0).logistic(), Variable(np.zeros(3), np.ones(3)))
+    >>> fused = compile_program(program, "fused", block=2)
+    >>> print(fused(Variable(np.array([0.0, 1.0, -1.0]), np.ones(3))))
+    value = [0.5        0.88079708 0.11920292], derivative = [0.5        0.20998717 0.20998717]
+    """
+    key = (mode, structure(program))
+    function = _cache.get(key)
+    if function is None:
+        namespace = {}
+        code = compile(
+            generate_source(program, mode), "<lahg_ad {}>".format(mode), "exec"
+        )
+        exec(code, namespace)
+        function = _cache[key] = namespace[mode]
+    constants = tuple(program.values[index] for index in _constants(program))
+    n_inputs = len(program.inputs)
+    single = program.single
+    seeds = [np.ones(np.shape(program.values[index])) for index in program.outputs]
+    check = program.check
+
+    if mode == "forward":
+
+        def run(*inputs):
+            check(inputs)
+            arguments = []
+            for x in inputs:
+                arguments += [x.val, x.der]
+            values, tangents = function(constants, *arguments)
+            outputs = tuple(map(Variable._make, values, tangents))
+            return outputs[0] if single else outputs
+
+    elif mode == "fused":
+        shape = np.shape(program.values[program.inputs[0]]) if n_inputs else ()
+        size = int(np.prod(shape))
+        constants = tuple(np.ravel(c) if np.ndim(c) else c for c in constants)
+
+        def run(*inputs):
+            check(inputs)
+            dtype = np.result_type(*[x.val for x in inputs], *[x.der for x in inputs])
+            if dtype.kind != "f":
+                dtype = np.dtype(float)
+            arguments = []
+            for x in inputs:
+                tail = np.shape(x.der)[len(shape) :]
+                arguments.append(np.ravel(np.asarray(x.val, dtype=dtype)))
+                arguments.append(
+                    np.broadcast_to(
+                        np.asarray(x.der, dtype=dtype), shape + tail
+                    ).reshape((size,) + tail)
+                )
+            tail = arguments[1].shape[1:] if arguments else ()
+            results = []
+            for _ in program.outputs:
+                results += [np.empty(size, dtype), np.empty((size,) + tail, dtype)]
+            function(constants, size, block, *arguments, *results)
+            outputs = tuple(
+                Variable._make(value.reshape(shape), tangent.reshape(shape + tail))
+                for value, tangent in zip(results[::2], results[1::2])
+            )
+            return outputs[0] if single else outputs
+
+    else:
+
+        def run(*inputs, cotangents=None):
+            check(inputs, tangents=False)
+            values = [x.val if isinstance(x, Variable) else x for x in inputs]
+            if cotangents is None:
+                cotangents = seeds
+            elif single:
+                cotangents = [cotangents]
+            outputs, gradients = function(constants, *values, *cotangents)
+            return (outputs[0] if single else outputs), gradients
+
+    return run
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
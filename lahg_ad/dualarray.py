@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the DualArray class, an array of forward mode dual numbers stored as one value
+array and one tangent array instead of a numpy object array of Variable objects.
+"""
+
+import numpy as np
+
+from . import precision as _precision
+from .fd import Variable
+
+
+class DualArray(Variable):
+    """
+    This is the DualArray class, a Variable holding an n-dimensional array of values with their
+    tangents. It supports indexing, slicing, reshaping and broadcasting, and every operation
+    runs one numpy call on the whole value and tangent arrays.
+
+    The tangent has the shape of the value, or the shape of the value followed by one axis of
+    tangent directions. Binary operations broadcast their operands like numpy arrays and follow
+    the numpy ufunc semantics, returning nan outside of the domain of a function.
+
+    EXAMPLES
+    ========
+    >>> x = DualArray(np.array([[1., 2.], [3., 4.]]))
+    >>> y = x[:, 0] * x[1]
+    >>> print(y)
+    value = [ 3. 12.], derivative = [4. 7.]
+
+    >>> f = (x.reshape(4) + np.arange(4.)).sin()
+    >>> f.shape
+    (4,)
+    """
+
+    __slots__ = ()
+
+    def __init__(self, value, derivative_seed=None, dtype=None):
+        """
+        DualArray class constructor
+
+        INPUTS
+        ------
+        value : array_like of int or float
+            values of the dual numbers
+        derivative_seed : array_like of int or float, optional
+            tangents with the shape of value, optionally followed by one axis of directions.
+            The default is an array of ones.
+        dtype : numpy floating point dtype, optional
+            dtype of the values and tangents. The default is the dtype of the active precision
+            block, or float64.
+
+        RAISES
+        ------
+        ValueError
+            if the values or tangents are not numbers
+        Exception
+            if the tangent shape does not start with the value shape
+
+        EXAMPLES
+        --------
+        >>> x = DualArray([1, 2, 3])
+        >>> print(x)
+        value = [1. 2. 3.], derivative = [1. 1. 1.]
+
+        >>> x = DualArray([1, 2], np.eye(2))
+        >>> x.der.shape
+        (2, 2)
+
+        >>> DualArray([1, 2], dtype=np.float32).sin().der.dtype
+        dtype('float32')
+        """
+        dtype = _precision.resolve(dtype) or np.dtype(float)
+        try:
+            value = np.asarray(value, dtype=dtype)
+            if derivative_seed is None:
+                derivative_seed = np.ones(value.shape, dtype)
+            derivative_seed = np.asarray(derivative_seed, dtype=dtype)
+        except (TypeError, ValueError):
+            raise ValueError(
+                "Not all elements in the value or derivative array are int or float"
+            )
+        if (
+            derivative_seed.shape[: value.ndim] != value.shape
+            or derivative_seed.ndim > value.ndim + 1
+        ):
+            raise Exception("value array has different shape with derivative array")
+        self.val = value
+        self.der = derivative_seed
+
+    @classmethod
+    def from_variables(cls, variables):
+        """
+        Method to convert a list or a numpy object array of Variable objects to a DualArray.
+
+        INPUTS
+        ------
+        variables : list, nested list or numpy array of Variable objects
+            Variable objects with scalar values and derivatives of the same shape
+
+        RETURNS
+        -------
+        A DualArray object with the shape of variables
+
+        RAISES
+        ------
+        Exception
+            if an element is not a Variable object, or has an array value
+            if the derivatives have different shapes
+
+        EXAMPLES
+        --------
+        >>> from lahg_ad import make_variables
+        >>> x, y = make_variables([2, 1], np.eye(2))
+        >>> f = DualArray.from_variables([x * y, x + y])
+        >>> f.der
+        array([[1., 2.],
+               [1., 1.]])
+        """
+        variables = np.asarray(variables, dtype=object)
+        flat = variables.ravel()
+        for variable in flat:
+            if not isinstance(variable, Variable) or np.ndim(variable.val) != 0:
+                raise Exception(
+                    "The input must contain Variable objects with scalar values"
+                )
+        shapes = {np.shape(variable.der) for variable in flat}
+        if len(shapes) > 1:
+            raise Exception(
+                "The input Variable objects have derivatives of different shapes!"
+            )
+        direction = shapes.pop() if shapes else ()
+        value = np.array([variable.val for variable in flat], dtype=float)
+        derivative = np.array([variable.der for variable in flat], dtype=float)
+        return cls._make(
+            value.reshape(variables.shape),
+            derivative.reshape(variables.shape + direction),
+        )
+
+    def to_variables(self):
+        """
+        Method to convert a DualArray to a numpy object array of Variable objects.
+
+        RETURNS
+        -------
+        numpy array of Variable objects with the shape of the DualArray
+
+        EXAMPLES
+        --------
+        >>> x = DualArray([1., 2.], [3., 4.])
+        >>> print(x.to_variables()[1])
+        value = 2.0, derivative = 4.0
+        """
+        variables = np.empty(self.shape, dtype=object)
+        for index in np.ndindex(self.shape):
+            variables[index] = Variable._make(self.val[index], self.der[index])
+        return variables
+
+    @property
+    def shape(self):
+        return self.val.shape
+
+    @property
+    def ndim(self):
+        return self.val.ndim
+
+    @property
+    def size(self):
+        return self.val.size
+
+    def __len__(self):
+        return len(self.val)
+
+    def _directions(self):
+        """
+        Method to get the shape of the trailing tangent direction axis, empty for one direction.
+        """
+        return self.der.shape[self.val.ndim :]
+
+    def __getitem__(self, index):
+        """
+        Method to index or slice a DualArray like a numpy array.
+
+        RETURNS
+        -------
+        A DualArray object
+
+        EXAMPLES
+        --------
+        >>> x = DualArray([[1., 2.], [3., 4.]], np.ones((2, 2, 3)))
+        >>> x[..., 1].der.shape
+        (2, 3)
+        """
+        if self._directions():
+            # keep the direction axis out of the index
+            if not isinstance(index, tuple):
+                index = (index,)
+            return self._make(self.val[index], self.der[index + (slice(None),)])
+        return self._make(self.val[index], self.der[index])
+
+    def reshape(self, *shape):
+        """
+        Method to give a new shape to a DualArray without changing its data.
+
+        RETURNS
+        -------
+        A DualArray object
+
+        EXAMPLES
+        --------
+        >>> DualArray(np.arange(6.)).reshape(2, 3).der.shape
+        (2, 3)
+        """
+        value = self.val.reshape(*shape)
+        return self._make(value, self.der.reshape(value.shape + self._directions()))
+
+    def broadcast_to(self, shape):
+        """
+        Method to broadcast a DualArray to a new shape.
+
+        RETURNS
+        -------
+        A read-only DualArray object
+
+        EXAMPLES
+        --------
+        >>> print(DualArray([1., 2.]).broadcast_to((2, 2)))
+        value = [[1. 2.]
+         [1. 2.]], derivative = [[1. 1.]
+         [1. 1.]]
+        """
+        shape = tuple(np.atleast_1d(shape))
+        return self._make(
+            np.broadcast_to(self.val, shape),
+            np.broadcast_to(self.der, shape + self._directions()),
+        )
+
+    def __array_function__(self, func, types, args, kwargs):
+        """
+        Method to support np.reshape and np.broadcast_to in addition to the reductions of Variable.
+        """
+        if func is np.reshape:
+            return args[0].reshape(*args[1:], **kwargs)
+        if func is np.broadcast_to:
+            return args[0].broadcast_to(*args[1:], **kwargs)
+        return super().__array_function__(func, types, args, kwargs)
+
+    def __add__(self, other):
+        return np.add(self, other)
+
+    def __radd__(self, other):
+        return np.add(other, self)
+
+    def __sub__(self, other):
+        return np.subtract(self, other)
+
+    def __rsub__(self, other):
+        return np.subtract(other, self)
+
+    def __mul__(self, other):
+        return np.multiply(self, other)
+
+    def __rmul__(self, other):
+        return np.multiply(other, self)
+
+    def __truediv__(self, other):
+        return np.divide(self, other)
+
+    def __rtruediv__(self, other):
+        return np.divide(other, self)
+
+    def __pow__(self, other):
+        return np.power(self, other)
+
+    def __rpow__(self, other):
+        return np.power(other, self)
+
+    def __neg__(self):
+        return np.negative(self)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
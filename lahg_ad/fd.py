@@ -5,8 +5,81 @@ This file contains the Variable class for performing forward mode automatic diff
 It also contains function for making scalar/vector inputs.
 """
 
+import math
+
 import numpy as np
 
+from . import checks as _checks
+from . import precision as _precision
+from . import primitives as _primitives
+from . import ufuncs as _ufuncs
+
+
+# Values of these types take a scalar fast path through the math module, which skips the ufunc
+# dispatch of numpy. Only functions where math and numpy agree bit for bit (sin, cos, sqrt and
+# arithmetic) are evaluated with math, so both paths give identical results.
+_SCALARS = (int, float)
+
+# Scalar types accepted as values and derivative seeds, numpy scalars keep their precision
+_NUMBERS = (int, float, np.integer, np.floating)
+
+
+def _expand(local, der):
+    """
+    Function to align a local derivative with a tangent carrying several directions.
+
+    INPUTS
+    ------
+    local : int, float or numpy array
+        local derivative with the shape of the value
+    der : int, float or numpy array
+        tangent with the shape of the value, optionally followed by one axis of directions
+
+    RETURNS
+    -------
+    local with a trailing axis added when der has one more dimension than local
+
+    EXAMPLES
+    --------
+    >>> import numpy as np
+    >>> _expand(np.array([1., 2.]), np.ones((2, 3))).shape
+    (2, 1)
+    >>> _expand(np.array([1., 2.]), np.ones(2)).shape
+    (2,)
+    """
+    if (
+        isinstance(local, np.ndarray)
+        and isinstance(der, np.ndarray)
+        and 0 < local.ndim < der.ndim
+    ):
+        return local[..., np.newaxis]
+    return local
+
+
+def _tangent(local, der):
+    """
+    Function to apply the chain rule to a tangent with one or several directions.
+
+    INPUTS
+    ------
+    local : int, float or numpy array
+        local derivative with the shape of the value
+    der : int, float or numpy array
+        tangent with the shape of the value, optionally followed by one axis of directions
+
+    RETURNS
+    -------
+    the product of local and der, broadcast over the directions of der
+
+    EXAMPLES
+    --------
+    >>> import numpy as np
+    >>> _tangent(np.array([1., 2.]), np.array([[1., 0.], [0., 1.]]))
+    array([[1., 0.],
+           [0., 2.]])
+    """
+    return _expand(local, der) * der
+
 
 class Variable:
     """
@@ -27,10 +100,12 @@ class Variable:
     >>> y = Variable(7, np.array([3, 1]))
     >>> f = np.cos(x*y) + x * y + 3*np.log(x)
     >>> print(f)
-    value = 36.19321780791655, derivative = [31.68059542 48.17233485]
+    value = 38.92462153221079, derivative = [32.02001873 49.53002809]
     """
 
-    def __init__(self, value, derivative_seed=1):
+    __slots__ = ("val", "der")
+
+    def __init__(self, value, derivative_seed=1, dtype=None):
         """
         Variable class constructor
 
@@ -40,6 +115,11 @@ class Variable:
             Give the value of the variable
         derivative_seed : int or float, optional
             Give the derivative seed of the variable. The default is 1.
+            For an array value, the seed is an array of the same shape, or an array with one
+            more axis holding several tangent directions that are propagated together.
+        dtype : numpy floating point dtype, optional
+            Convert the value and the derivative seed to dtype. The default is the dtype of
+            the active Precision scope, or no conversion outside of one.
 
         EXAMPLES
         --------
@@ -51,16 +131,25 @@ class Variable:
         >>> x = Variable(np.array([5, 6]), np.array([6, 2]))
         >>> print(x)
         value = [5 6], derivative = [6 2]
+
+        >>> x = Variable(np.array([5, 6]), np.array([[1, 0, 2], [0, 1, 2]]))
+        >>> print(x.sin().der)
+        [[0.28366219 0.         0.56732437]
+         [0.         0.96017029 1.92034057]]
+
+        >>> x = Variable(np.array([5, 6]), np.array([1, 1]), dtype=np.float32)
+        >>> x.sin().der.dtype
+        dtype('float32')
         """
         # check type for value and derivative_seed
-        if not isinstance(value, (int, float, np.ndarray)) or not isinstance(derivative_seed, (int, float, np.ndarray)):
+        if not isinstance(value, _NUMBERS + (np.ndarray,)) or not isinstance(derivative_seed, _NUMBERS + (np.ndarray,)):
             raise Exception("The value and derivative seed must be int, float, or np.ndarray")
         
         # if value is numpy array, the derivative seed must be a numpy array as well
         if isinstance(value, np.ndarray):
             if not isinstance(derivative_seed, np.ndarray):
                 raise Exception("value array has different length with derivative array")
-            elif len(value) != len(derivative_seed):
+            elif derivative_seed.shape[: value.ndim] != value.shape:
                 raise Exception("value array has different length with derivative array")
 
         if isinstance(value, np.ndarray) or isinstance(derivative_seed, np.ndarray):
@@ -77,8 +166,8 @@ class Variable:
                 raise ValueError(
                     "Not all elements in the value numpy array are int or float"
                 )
-        elif isinstance(value, (int, float)) and isinstance(
-            derivative_seed, (int, float)
+        elif isinstance(value, _NUMBERS) and isinstance(
+            derivative_seed, _NUMBERS
         ):
             try:
                 self.val = value
@@ -90,6 +179,38 @@ class Variable:
         else:
             raise TypeError("Type of value and derivative seed must be int or float!")
 
+        dtype = _precision.resolve(dtype)
+        if dtype is not None:
+            self.val = _precision.cast(self.val, dtype)
+            self.der = _precision.cast(self.der, dtype)
+
+    @classmethod
+    def _make(cls, value, derivative):
+        """
+        Trusted constructor for the results of operations
+
+        The operands of an operation were validated when they were created, so the value and
+        derivative of the result are stored without checking them again.
+
+        INPUTS
+        ------
+        value : int, float or numpy array
+        derivative : int, float or numpy array
+
+        RETURNS
+        -------
+        A Variable object
+
+        EXAMPLES
+        --------
+        >>> print(Variable._make(2.0, 3.0))
+        value = 2.0, derivative = 3.0
+        """
+        variable = object.__new__(cls)
+        variable.val = value
+        variable.der = derivative
+        return variable
+
     def __repr__(self):
         """
         Dunder method for printing output
@@ -196,7 +317,7 @@ class Variable:
 
         value = -self.val
         derivative = -self.der
-        return Variable(value, derivative)
+        return self._make(value, derivative)
 
     def sin(self):
         """
@@ -226,9 +347,11 @@ class Variable:
         value = [1. 1.], derivative = [0. 0.]
         """
 
+        if isinstance(self.val, _SCALARS):
+            return self._make(math.sin(self.val), math.cos(self.val) * self.der)
         value = np.sin(self.val)
-        derivative = np.cos(self.val) * self.der
-        return Variable(value, derivative)
+        derivative = _tangent(np.cos(self.val), self.der)
+        return self._make(value, derivative)
 
     def cos(self):
         """
@@ -257,9 +380,11 @@ class Variable:
         value = [1. 1.], derivative = [-0. -0.]
         """
 
+        if isinstance(self.val, _SCALARS):
+            return self._make(math.cos(self.val), -math.sin(self.val) * self.der)
         value = np.cos(self.val)
-        derivative = (-1) * np.sin(self.val) * self.der
-        return Variable(value, derivative)
+        derivative = _tangent((-1) * np.sin(self.val), self.der)
+        return self._make(value, derivative)
 
     def tan(self):
         """
@@ -294,9 +419,12 @@ class Variable:
         value = [1. 0.], derivative = [0. 1.]
         """
 
+        if isinstance(self.val, _SCALARS):
+            cos = math.cos(self.val)
+            return self._make(np.tan(self.val), 1 / (cos * cos) * self.der)
         value = np.tan(self.val)
-        derivative = (1 / (np.cos(self.val) ** 2)) * self.der
-        return Variable(value, derivative)
+        derivative = _tangent(1 / (np.cos(self.val) ** 2), self.der)
+        return self._make(value, derivative)
 
     def arcsin(self):
         """
@@ -332,13 +460,16 @@ class Variable:
         """
 
         if isinstance(self.val, np.ndarray):
-            if not (np.absolute(self.val) < 1).all():
+            if _checks.enabled() and not (np.absolute(self.val) < 1).all():
                 raise ValueError(f"arcsin doesn't exist at {self.val}")
         elif abs(self.val) >= 1:
             raise ValueError(f"arcsin doesn't exist at {self.val}")
+        if isinstance(self.val, _SCALARS):
+            local = 1 / math.sqrt(1 - self.val * self.val)
+            return self._make(np.arcsin(self.val), local * self.der)
         value = np.arcsin(self.val)
-        derivative = 1 / np.sqrt(1 - self.val ** 2) * self.der
-        return Variable(value, derivative)
+        derivative = _tangent(1 / np.sqrt(1 - self.val ** 2), self.der)
+        return self._make(value, derivative)
 
     def arccos(self):
         """
@@ -374,13 +505,16 @@ class Variable:
         """
 
         if isinstance(self.val, np.ndarray):
-            if not (abs(self.val) < 1).all():
+            if _checks.enabled() and not (abs(self.val) < 1).all():
                 raise ValueError(f"arccos doesn't exist at {self.val}")
         elif abs(self.val) >= 1:
             raise ValueError(f"arccos doesn't exist at {self.val}")
+        if isinstance(self.val, _SCALARS):
+            local = -1 / math.sqrt(1 - self.val * self.val)
+            return self._make(np.arccos(self.val), local * self.der)
         value = np.arccos(self.val)
-        derivative = -1 / np.sqrt(1 - self.val ** 2) * self.der
-        return Variable(value, derivative)
+        derivative = _tangent(-1 / np.sqrt(1 - self.val ** 2), self.der)
+        return self._make(value, derivative)
 
     def arctan(self):
         """
@@ -410,9 +544,12 @@ class Variable:
         value = [0.74817929 0.30548834], derivative = [0.06370566 0.31261359]
         """
 
+        if isinstance(self.val, _SCALARS):
+            local = 1 / (1 + self.val * self.val)
+            return self._make(np.arctan(self.val), local * self.der)
         value = np.arctan(self.val)
-        derivative = 1 / (1 + self.val ** 2) * self.der
-        return Variable(value, derivative)
+        derivative = _tangent(1 / (1 + self.val ** 2), self.der)
+        return self._make(value, derivative)
 
     def sinh(self):
         """
@@ -437,8 +574,8 @@ class Variable:
         """
 
         val = np.sinh(self.val)
-        der = np.cosh(self.val) * self.der
-        return Variable(val, der)
+        der = _tangent(np.cosh(self.val), self.der)
+        return self._make(val, der)
 
     def cosh(self):
         """
@@ -463,8 +600,8 @@ class Variable:
         """
 
         val = np.cosh(self.val)
-        der = np.sinh(self.val) * self.der
-        return Variable(val, der)
+        der = _tangent(np.sinh(self.val), self.der)
+        return self._make(val, der)
 
     def tanh(self):
         """
@@ -479,7 +616,7 @@ class Variable:
         >>> x = Variable(2, 1)
         >>> f = x.tanh()
         >>> print(f)
-        value = 0.9640275800758169, derivative = 0.07065082485316447
+        value = 0.9640275800758169, derivative = 0.07065082485316443
 
         >>> import numpy as np
         >>> x = Variable(np.array([1, 2]), np.array([3, 4]))
@@ -489,8 +626,8 @@ class Variable:
         """
 
         val = np.tanh(self.val)
-        der = (1 / (np.cosh(self.val) ** 2)) * self.der
-        return Variable(val, der)
+        der = _tangent(1 - val ** 2, self.der)
+        return self._make(val, der)
 
     def exp(self, base=None):
         """
@@ -527,8 +664,8 @@ class Variable:
         """
         if base == None:
             value = np.exp(self.val)
-            derivative = np.exp(self.val) * self.der
-            return Variable(value, derivative)
+            derivative = _tangent(value, self.der)
+            return self._make(value, derivative)
         elif isinstance(base, (int, float)):
             return self.__rpow__(base)
         else:
@@ -571,6 +708,8 @@ class Variable:
         >>> x == y
         False
         """
+        if not isinstance(other, Variable):
+            return False
         try:
             val_equal = False
             der_equal = False
@@ -630,6 +769,8 @@ class Variable:
         True
         """
 
+        if not isinstance(other, Variable):
+            return True
         try:
             if (self.val == other.val) and (self.der == other.der):
                 return False
@@ -684,14 +825,9 @@ class Variable:
         value = [2 3], derivative = [1 2]
         """
 
-        try:
-            new_val = self.val + other.val
-            new_der = self.der + other.der
-            return Variable(new_val, new_der)
-        except AttributeError:
-            new_val = self.val + other
-            new_der = self.der
-            return Variable(new_val, new_der)
+        if isinstance(other, Variable):
+            return self._make(self.val + other.val, self.der + other.der)
+        return self._make(self.val + other, self.der)
 
     def __sub__(self, other):
         """
@@ -739,14 +875,9 @@ class Variable:
         value = [0 1], derivative = [1 2]
         """
 
-        try:
-            new_val = self.val - other.val
-            new_der = self.der - other.der
-            return Variable(new_val, new_der)
-        except AttributeError:
-            new_val = self.val - other
-            new_der = self.der
-            return Variable(new_val, new_der)
+        if isinstance(other, Variable):
+            return self._make(self.val - other.val, self.der - other.der)
+        return self._make(self.val - other, self.der)
 
     def __mul__(self, other):
         """
@@ -794,14 +925,11 @@ class Variable:
         value = [2 4], derivative = [12 16]
         """
 
-        try:
+        if isinstance(other, Variable):
             new_val = self.val * other.val
-            new_der = self.val * other.der + other.val * self.der
-            return Variable(new_val, new_der)
-        except AttributeError:
-            new_val = self.val * other
-            new_der = self.der * other
-            return Variable(new_val, new_der)
+            new_der = _tangent(self.val, other.der) + _tangent(other.val, self.der)
+            return self._make(new_val, new_der)
+        return self._make(self.val * other, _tangent(other, self.der))
 
     def __truediv__(self, other):
         """
@@ -851,21 +979,22 @@ class Variable:
         value = [0.5 1. ], derivative = [1.5 2. ]
         """
 
-        try:
+        if isinstance(other, Variable):
             if isinstance(other.val, np.ndarray):
-                if (other.val == 0).any():
+                if _checks.enabled() and (other.val == 0).any():
                     raise ZeroDivisionError("Cannot divide by zero!")
             elif other.val == 0:
                 raise ZeroDivisionError("Cannot divide by zero!")
             new_val = self.val / other.val
-            new_der = (self.der * other.val - self.val * other.der) / (other.val ** 2)
-            return Variable(new_val, new_der)
-        except AttributeError:
-            if other == 0:
+            new_der = _tangent(other.val, self.der) - _tangent(self.val, other.der)
+            new_der = new_der / _expand(other.val ** 2, new_der)
+            return self._make(new_val, new_der)
+        if isinstance(other, np.ndarray):
+            if _checks.enabled() and (other == 0).any():
                 raise ZeroDivisionError("Cannot divide by zero!")
-            new_val = self.val / other
-            new_der = self.der / other
-            return Variable(new_val, new_der)
+        elif other == 0:
+            raise ZeroDivisionError("Cannot divide by zero!")
+        return self._make(self.val / other, self.der / _expand(other, self.der))
 
     def __pow__(self, other):
 
@@ -930,49 +1059,42 @@ class Variable:
         value = [9 2], derivative = [39.8875106   8.77258872]
         """
 
-        if not (isinstance(other, (int, float)) or isinstance(other, Variable)):
-            raise TypeError("Can only raise to the power of a real number or variable!")
-
-        try:
+        if isinstance(other, Variable):
             value = self.val ** other.val
-            if isinstance(self.val, np.ndarray):
-                if (self.val <= 0).any():
-                    derivative = other.val * self.val ** (other.val - 1) * self.der
-                else:
-                    derivative = (
-                        other.val * self.val ** (other.val - 1) * self.der
-                        + np.log(self.val) * self.val ** other.val * other.der
-                    )
-            else:
-                if self.val <= 0:
-                    derivative = other.val * self.val ** (other.val - 1) * self.der
-                else:
-                    derivative = (
-                        other.val * self.val ** (other.val - 1) * self.der
-                        + np.log(self.val) * self.val ** other.val * other.der
-                    )
-            return Variable(value, derivative)
-        # If multiplying Variable object with real number
-        except AttributeError:
-            if isinstance(self.val, np.ndarray):
-                if (self.val <= 0).any() and ((other - int(other)) != 0):
-                    raise ValueError(
-                        "Cannot take derivative of the root of a non-positive number"
-                    )
-            elif (self.val <= 0) and ((other - int(other)) != 0):
+            # the rule of np.power drops the log term where the base is not positive
+            log_term = _ufuncs.partial_derivative(
+                _ufuncs.DERIVATIVES[np.power][1], value, self.val, other.val
+            )
+            derivative = _tangent(
+                other.val * self.val ** (other.val - 1), self.der
+            ) + _tangent(log_term, other.der)
+            return self._make(value, derivative)
+        # If raising a Variable object to the power of a real number
+        if not isinstance(other, (int, float, np.integer, np.floating)):
+            raise TypeError("Can only raise to the power of a real number or variable!")
+        if isinstance(self.val, np.ndarray):
+            if (
+                _checks.enabled()
+                and ((other - int(other)) != 0)
+                and (self.val <= 0).any()
+            ):
                 raise ValueError(
                     "Cannot take derivative of the root of a non-positive number"
                 )
+        elif (self.val <= 0) and ((other - int(other)) != 0):
+            raise ValueError(
+                "Cannot take derivative of the root of a non-positive number"
+            )
 
-            if isinstance(self.val, np.ndarray):
-                if (self.val == 0).any() and other < 0:
-                    raise ValueError("Cannot raise the negative power of 0")
-            elif self.val == 0 and other < 0:
+        if isinstance(self.val, np.ndarray):
+            if _checks.enabled() and other < 0 and (self.val == 0).any():
                 raise ValueError("Cannot raise the negative power of 0")
+        elif self.val == 0 and other < 0:
+            raise ValueError("Cannot raise the negative power of 0")
 
-            value = self.val ** other
-            derivative = other * self.val ** (other - 1) * self.der
-            return Variable(value, derivative)
+        value = self.val ** other
+        derivative = _tangent(other * self.val ** (other - 1), self.der)
+        return self._make(value, derivative)
 
     def __rpow__(self, other):
         """
@@ -999,8 +1121,8 @@ class Variable:
         """
 
         value = other ** self.val
-        derivative = np.log(other) * other ** self.val * self.der
-        return Variable(value, derivative)
+        derivative = _tangent(float(np.log(other)) * value, self.der)
+        return self._make(value, derivative)
 
     def log(self, base=10):
         """
@@ -1047,14 +1169,18 @@ class Variable:
             raise ValueError("The log base must be a positive number (int or float)")
 
         if isinstance(self.val, np.ndarray):
-            if (self.val <= 0).any():
+            if _checks.enabled() and (self.val <= 0).any():
                 raise ValueError("Cannot take the log of a non-positive number")
         elif self.val <= 0:
             raise ValueError("Cannot take the log of a non-positive number")
 
-        value = np.log(self.val) / np.log(base)
-        derivative = 1 / (self.val * np.log(base)) * self.der
-        return Variable(value, derivative)
+        # a Python float keeps the precision of the value
+        log_base = float(np.log(base))
+        value = np.log(self.val) / log_base
+        if isinstance(self.val, _SCALARS):
+            return self._make(value, 1 / (self.val * log_base) * self.der)
+        derivative = _tangent(1 / (self.val * log_base), self.der)
+        return self._make(value, derivative)
 
     def sqrt(self):
         """
@@ -1177,7 +1303,7 @@ class Variable:
         value = [ 0 -1], derivative = [-1 -2]
         """
 
-        return other + (-self)
+        return self._make(other - self.val, -self.der)
 
     def __rmul__(self, other):
         """
@@ -1279,18 +1405,17 @@ class Variable:
         """
 
         if isinstance(self.val, np.ndarray):
-            if (self.val == 0).any():
+            if _checks.enabled() and (self.val == 0).any():
                 raise ZeroDivisionError("Cannot divide by zero!")
         elif self.val == 0:
             raise ZeroDivisionError("Cannot divide by zero!")
-        try:
+        if isinstance(other, Variable):
             new_val = other.val / self.val
-            new_der = (other.der * self.val - other.val * self.der) / (self.val ** 2)
-            return Variable(new_val, new_der)
-        except AttributeError:
-            new_val = other / self.val
-            new_der = -other / (self.val ** 2) * self.der
-            return Variable(new_val, new_der)
+            new_der = _tangent(self.val, other.der) - _tangent(other.val, self.der)
+            new_der = new_der / _expand(self.val ** 2, new_der)
+            return self._make(new_val, new_der)
+        new_val = other / self.val
+        return self._make(new_val, _tangent(-other / (self.val ** 2), self.der))
 
     def logistic(self):
         """
@@ -1312,13 +1437,193 @@ class Variable:
         >>> print(f)
         value = [0.73105858 0.88079708 0.95257413], derivative = [0.19661193 0.10499359 0.04517666]
         """
-        new_val = 1 / (1 + np.exp(-self.val))
-        new_der = np.exp(-self.val) / ((1 + np.exp(-self.val)) ** 2) * self.der
-        return Variable(new_val, new_der)
+        new_val, local = _primitives.logistic(self.val)
+        return self._make(new_val, _tangent(local, self.der))
+
+    def softplus(self):
+        """
+        Method to perform the softplus operation log(1 + exp(x)). The exponential is computed
+        once for the value and the derivative, and large inputs do not overflow.
+
+        RETURNS
+        -------
+        A Variable object
+
+        EXAMPLES
+        --------
+        >>> x = Variable(np.array([-1000., 0., 1000.]), np.array([1., 2., 3.]))
+        >>> print(x.softplus())
+        value = [0.00000000e+00 6.93147181e-01 1.00000000e+03], derivative = [0. 1. 3.]
+        """
+        value, local = _primitives.softplus(self.val)
+        return self._make(value, _tangent(local, self.der))
+
+    def logaddexp(self, other):
+        """
+        Method to compute log(exp(self) + exp(other)) without overflow.
+
+        INPUTS
+        ------
+        other : A Variable object or a real number
+
+        RAISES
+        ------
+        ValueError
+            if other is not a Variable object or a real number
+
+        RETURNS
+        -------
+        A Variable object
+
+        EXAMPLES
+        --------
+        >>> x, y = make_variables([1000., 1000.], [1., 3.])
+        >>> print(x.logaddexp(y))
+        value = 1000.6931471805599, derivative = 2.0
+        """
+        if isinstance(other, Variable):
+            value, (dx, dy) = _primitives.logaddexp(self.val, other.val)
+            derivative = _tangent(dx, self.der) + _tangent(dy, other.der)
+        elif isinstance(other, (int, float, np.ndarray)):
+            value, (dx, _) = _primitives.logaddexp(self.val, other)
+            derivative = _tangent(dx, self.der)
+        else:
+            raise ValueError("The other operand must be a Variable or a real number")
+        return self._make(value, derivative)
+
+    def logsumexp(self):
+        """
+        Method to compute log(sum(exp(x))) over all elements of the value without overflow.
+
+        RETURNS
+        -------
+        A Variable object with a scalar value
+
+        EXAMPLES
+        --------
+        >>> x = Variable(np.array([1., 2., 3.]), np.eye(3))
+        >>> print(x.logsumexp())
+        value = 3.4076059644443806, derivative = [0.09003057 0.24472847 0.66524096]
+        """
+        value, gradient = _primitives.logsumexp(self.val)
+        axes = tuple(range(np.ndim(self.val)))
+        return self._make(value, np.sum(_tangent(gradient, self.der), axis=axes))
+
+    def sigmoid_cross_entropy(self, labels):
+        """
+        Method to compute the binary cross-entropy of the logistic function of self with the
+        labels, elementwise and without overflow. The labels are not differentiated.
+
+        INPUTS
+        ------
+        labels : int, float or numpy array
+            target probabilities, usually 0 or 1
+
+        RETURNS
+        -------
+        A Variable object
+
+        EXAMPLES
+        --------
+        >>> x = Variable(np.array([-2., 0., 2.]), np.ones(3))
+        >>> print(x.sigmoid_cross_entropy(np.array([0., 1., 1.])))
+        value = [0.12692801 0.69314718 0.12692801], derivative = [ 0.11920292 -0.5        -0.11920292]
+        """
+        value, local = _primitives.sigmoid_cross_entropy(self.val, labels)
+        return self._make(value, _tangent(local, self.der))
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """
+        Method to apply a numpy ufunc to Variable objects.
+        The ufunc runs once on the values and the derivative rule of the ufunc is applied to the
+        tangents of the Variable inputs, so numpy code runs on Variables without object arrays.
+        Calls to ufuncs without a derivative rule, or with out/where/dtype arguments, return
+        NotImplemented and numpy raises a TypeError.
+
+        RETURNS
+        -------
+        A Variable object
+
+        EXAMPLES
+        --------
+        >>> x = Variable(np.array([3., 5.]), np.array([1., 0.]))
+        >>> print(np.hypot(x, 4.))
+        value = [5.         6.40312424], derivative = [0.6 0. ]
+
+        >>> print(np.maximum(x, np.array([4., 4.])))
+        value = [4. 5.], derivative = [0. 0.]
+
+        >>> print(np.add.reduce(x))
+        value = 8.0, derivative = 1.0
+        """
+        if method == "__call__" and ufunc in _ufuncs.COMPARISONS and not kwargs:
+            left, right = inputs
+            if not isinstance(left, Variable):
+                left, right = right, left
+            return _ufuncs.COMPARISONS[ufunc](left, right)
+        if method == "__call__" and ufunc in _ufuncs.DERIVATIVES and not kwargs:
+            values = [x.val if isinstance(x, Variable) else x for x in inputs]
+            value = ufunc(*values)
+            # the sum starts from the first term, numpy 1 promotes 0 + a float32 scalar
+            derivative = None
+            for x, rule in zip(inputs, _ufuncs.DERIVATIVES[ufunc]):
+                if isinstance(x, Variable):
+                    local = _ufuncs.partial_derivative(rule, value, *values)
+                    if getattr(local, "ndim", 0) and np.ndim(x.der) > np.ndim(x.val):
+                        # the tangent carries several directions along its last axis
+                        local = local[..., np.newaxis]
+                    term = local * x.der
+                    derivative = term if derivative is None else derivative + term
+            return self._make(value, derivative)
+        if (
+            method == "reduce"
+            and ufunc in _ufuncs.REDUCTIONS
+            and set(kwargs) <= {"axis"}
+            and isinstance(self.val, np.ndarray)
+        ):
+            axis = kwargs.get("axis", 0)
+            value = ufunc.reduce(self.val, axis=axis)
+            local = _expand(_ufuncs.REDUCTIONS[ufunc](self.val, axis), self.der)
+            axes = _ufuncs.reduction_axes(self.val.ndim, axis)
+            derivative = (local * self.der).sum(axis=axes)
+            return self._make(value, derivative)
+        return NotImplemented
+
+    def __array_function__(self, func, types, args, kwargs):
+        """
+        Method to apply the numpy reductions np.sum, np.mean, np.max and np.min to a Variable
+        object, with an optional axis argument. Other numpy functions return NotImplemented.
+
+        RETURNS
+        -------
+        A Variable object
+
+        EXAMPLES
+        --------
+        >>> x = Variable(np.array([[1., 2.], [3., 4.]]), np.eye(2))
+        >>> print(np.sum(x, axis=0))
+        value = [4. 6.], derivative = [1. 1.]
+
+        >>> print(np.mean(x))
+        value = 2.5, derivative = 0.5
+        """
+        if len(args) != 1 or set(kwargs) - {"axis"}:
+            return NotImplemented
+        if func is np.mean:
+            value = np.shape(self.val)
+            axis = kwargs.get("axis")
+            count = int(np.prod(value)) if axis is None else value[axis]
+            # the count in the dtype of the value, so a float32 mean stays float32
+            return np.sum(self, **kwargs) / np.asarray(count, dtype=np.asarray(self.val).dtype)
+        if func in _ufuncs.ARRAY_FUNCTIONS:
+            return self.__array_ufunc__(
+                _ufuncs.ARRAY_FUNCTIONS[func], "reduce", self, axis=kwargs.get("axis")
+            )
+        return NotImplemented
 
 
       
-def make_variables(var_list, der_list=None):
+def make_variables(var_list, der_list=None, dtype=None):
     """
     Function to create a list of Variable objects
 
@@ -1326,8 +1631,13 @@ def make_variables(var_list, der_list=None):
     ------
     var_list : list of int or float
         input values of these new Variable objects.
-    der_list : list of int or float
+    der_list : list of int or float, optional
         input derivative seeds of these new Variable objects. 
+        By default the i-th variable is seeded with the i-th unit vector, repeated for every
+        element of an array value, so that the derivative of a function of these variables
+        holds its gradient (one column per variable).
+    dtype : numpy floating point dtype, optional
+        precision of the new Variable objects, see the Variable constructor
 
     RAISES
     ------
@@ -1352,8 +1662,19 @@ def make_variables(var_list, der_list=None):
     value = [3 4], derivative = [1 2]
     >>> print(x[1])
     value = [1 5], derivative = [1 5]
+
+    >>> x, y = make_variables([np.array([1., 2., 3.]), np.array([4., 5., 6.])])
+    >>> print((x * y).der)
+    [[4. 1.]
+     [5. 2.]
+     [6. 3.]]
     """
-        
+    if der_list is None:
+        der_list = [
+            np.tile(direction, (len(val), 1)) if isinstance(val, np.ndarray) else direction
+            for val, direction in zip(var_list, np.eye(len(var_list)))
+        ]
+
     if len(var_list) != len(der_list):
         raise ValueError(
             "The value list and derivative list should be of the same length"
@@ -1361,12 +1682,12 @@ def make_variables(var_list, der_list=None):
 
     variables = []
     for val, der in zip(var_list, der_list):
-        variables.append(Variable(val, der))
+        variables.append(Variable(val, der, dtype))
 
     return variables
 
 
-def make_variable(var, der):
+def make_variable(var, der, dtype=None):
     """
     Function to create a Variable object
 
@@ -1376,6 +1697,8 @@ def make_variable(var, der):
         input value of the Variable object.
     der : int or float
         input derivative seed of the Variable object.
+    dtype : numpy floating point dtype, optional
+        precision of the new Variable object, see the Variable constructor
 
     RETURNS
     -------
@@ -1392,7 +1715,7 @@ def make_variable(var, der):
     >>> print(x)
     value = [1 2], derivative = [3 3]
     """
-    return Variable(var, der)
+    return Variable(var, der, dtype)
 
 
 exp = Variable.exp
@@ -1408,6 +1731,10 @@ arctan = Variable.arctan
 sinh = Variable.sinh
 cosh = Variable.cosh
 tanh = Variable.tanh
+softplus = Variable.softplus
+logaddexp = Variable.logaddexp
+logsumexp = Variable.logsumexp
+sigmoid_cross_entropy = Variable.sigmoid_cross_entropy
 
 
 
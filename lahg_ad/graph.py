@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the Graph class, an arena that owns the reverse mode nodes created inside a
+with statement. Outside of a graph, every operand keeps its results in its children list, so
+input leaves reused across iterations keep all graphs built from them alive until reset is
+called on each leaf. Inside a graph, the children of the operands belong to the graph, and all
+of them are released together when the with statement exits.
+"""
+
+import itertools
+
+# Stack of the graphs entered with a with statement, the last one owns new nodes
+_stack = []
+
+# Keys of the graphs on the stack. A node belongs to the graph whose key is in its arena
+# attribute, so nodes do not hold references to their graph.
+_open = set()
+_keys = itertools.count(1)
+
+
+def active():
+    """
+    Function to get the graph that owns new nodes.
+
+    RETURNS
+    -------
+    Graph object or None if no graph is active
+
+    EXAMPLES
+    --------
+    >>> active() is None
+    True
+    >>> with Graph() as graph:
+    ...     active() is graph
+    True
+    """
+    return _stack[-1] if _stack else None
+
+
+class Graph:
+    """
+    This is the Graph class, a scope owning the RD nodes created inside it.
+    An operand that does not belong to an open graph yet, such as an input leaf or a node of a
+    graph that was closed, starts with an empty children list when it is first used inside the
+    graph. On exit, the children lists of these operands are emptied, which releases every node
+    of the graph that is not referenced elsewhere at once. The cost of the teardown depends on
+    the number of operands from outside the graph, not on the number of nodes.
+
+    Derivatives should be read inside the with statement. Derivatives that were computed there
+    stay cached on the nodes after the exit.
+
+    EXAMPLES
+    ========
+    >>> import numpy as np
+    >>> from lahg_ad import RD
+    >>> x = RD(np.array([1.0, 2.0]))
+    >>> for _ in range(3):
+    ...     with Graph() as graph:
+    ...         f = x * x + x.sin()
+    ...         derivative = x.get_derivative()
+    >>> derivative
+    array([2.54030231, 3.58385316])
+    >>> len(graph)
+    3
+    >>> x.children
+    []
+    """
+
+    def __init__(self):
+        """
+        Graph class constructor
+
+        EXAMPLES
+        --------
+        >>> graph = Graph()
+        >>> len(graph)
+        0
+        """
+        self.key = next(_keys)
+        self.n_nodes = 0
+        self.leaves = []
+
+    def __enter__(self):
+        _stack.append(self)
+        _open.add(self.key)
+        return self
+
+    def __exit__(self, *exc):
+        _stack.remove(self)
+        _open.discard(self.key)
+        for leaf in self.leaves:
+            leaf.children = []
+            leaf.arena = None
+            leaf.stamp = leaf.stamp.renew()
+        self.leaves = []
+        return False
+
+    def __len__(self):
+        return self.n_nodes
+
+    def own(self, node):
+        """
+        Method to make the graph own the children of an operand that does not belong to an open
+        graph. Children the operand had before are dropped.
+
+        INPUTS
+        ------
+        node : RD object
+
+        RETURNS
+        -------
+        None
+
+        EXAMPLES
+        --------
+        >>> import numpy as np
+        >>> from lahg_ad import RD
+        >>> x = RD(np.array([1.0]))
+        >>> f = x * 2
+        >>> graph = Graph()
+        >>> graph.own(x)
+        >>> x.children, x.arena == graph.key
+        ([], True)
+        """
+        node.children = []
+        node.arena = self.key
+        node.stamp = node.stamp.renew()
+        self.leaves.append(node)
+
+
+def is_open(key):
+    """
+    Function to check whether the graph with a key is still open.
+
+    INPUTS
+    ------
+    key : int or None
+        key of a graph, the arena attribute of a RD object
+
+    RETURNS
+    -------
+    bool
+
+    EXAMPLES
+    --------
+    >>> with Graph() as graph:
+    ...     is_open(graph.key)
+    True
+    >>> is_open(graph.key), is_open(None)
+    (False, False)
+    """
+    return key in _open
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
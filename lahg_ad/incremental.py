@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the Incremental class, a persistent reverse mode graph of a function whose
+inputs can be updated without building the graph again. The function is traced once. When a few
+inputs change, only the nodes that depend on them are recomputed in the forward pass, and only
+the adjoints that depend on a changed local derivative are recomputed in the backward pass.
+Nodes whose value or adjoint did not change stop the propagation, so the cost follows the part
+of the graph that changed instead of the size of the graph.
+"""
+
+import heapq
+
+import numpy as np
+
+from . import precision as _precision
+from . import ufuncs as _ufuncs
+from .fd import Variable
+from .rd import RD
+from .tracing import PRIMITIVES, REDUCTIONS, trace
+
+
+def _unbroadcast(adjoint, shape):
+    """
+    Function to sum an adjoint back to the shape of an operand that was broadcast.
+
+    EXAMPLES
+    --------
+    >>> _unbroadcast(np.ones((2, 3)), (3,))
+    array([2., 2., 2.])
+    >>> print(_unbroadcast(np.ones(3), ()))
+    3.0
+    """
+    if np.shape(adjoint) == shape:
+        return adjoint
+    lead = np.ndim(adjoint) - len(shape)
+    axes = tuple(range(lead)) + tuple(
+        lead + i for i, n in enumerate(shape) if n == 1 and adjoint.shape[lead + i] != 1
+    )
+    return np.sum(adjoint, axis=axes).reshape(shape)
+
+
+class Incremental:
+    """
+    This is the Incremental class, a persistent graph of a function of RD objects or arrays.
+    The function is traced once on the sample inputs, so it must apply the same operations to
+    inputs of the same shapes, as for trace. update replaces the value of an input in place and
+    marks it dirty. value and gradient then recompute the nodes downstream of the dirty inputs,
+    and the adjoints of the nodes upstream of a changed local derivative, in topological order.
+
+    The gradient is the derivative of the sum of all elements of the outputs, as for
+    get_derivative, with respect to every input. The number of values and adjoints evaluated
+    since the last update are kept in n_forward and n_backward.
+
+    EXAMPLES
+    ========
+    >>> def model(x, y, z):
+    ...     return np.sum((x * y).sin()) + np.sum(z.exp())
+    >>> graph = Incremental(model, RD(np.array([1.0, 2.0])), np.ones(2), np.zeros(2))
+    >>> print(graph.value())
+    3.750768411633578
+    >>> graph.update(2, np.array([1.0, 0.0]))
+    >>> print(graph.value())
+    5.469050240092623
+    >>> graph.n_forward
+    3
+    >>> graph.gradient()[2]
+    array([2.71828183, 1.        ])
+    """
+
+    def __init__(self, function, *inputs):
+        """
+        Incremental class constructor
+
+        INPUTS
+        ------
+        function : callable
+            function of RD objects returning one RD object or a list of RD objects
+        inputs : RD objects or numpy arrays
+            values of the inputs, they are copied
+
+        RAISES
+        ------
+        Exception
+            if an output is a RD object that is not computed from the inputs
+        """
+        values = []
+        for x in inputs:
+            value = np.asarray(x.val if isinstance(x, RD) else x)
+            values.append(np.array(value, _precision.floating([value.dtype])))
+        self.program = trace(
+            function, *[Variable._make(value, np.zeros_like(value)) for value in values]
+        )
+        nodes = self.program.nodes
+        for index in self.program.outputs:
+            if isinstance(self.program.values[index], RD):
+                raise Exception("The outputs must be computed from the inputs")
+        self.values = list(self.program.values)
+        for index, value in zip(self.program.inputs, values):
+            self.values[index] = value
+        # the nodes using each node, with the position of the operand
+        self.children = [[] for _ in nodes]
+        for index, node in enumerate(nodes):
+            for k, arg in enumerate(node.args):
+                if nodes[arg].op != "const":
+                    self.children[arg].append((index, k))
+        self.locals = [None] * len(nodes)
+        self.adjoints = [None] * len(nodes)
+        self.seeds = {}
+        for index in self.program.outputs:
+            if nodes[index].op != "const":
+                seed = np.ones(np.shape(self.values[index]), self._dtype(index))
+                self.seeds[index] = self.seeds.get(index, 0) + seed
+        self.n_forward = 0
+        self.n_backward = 0
+        self._dirty = set()
+        self._stale = set()
+        variables = [i for i, node in enumerate(nodes) if node.op != "const"]
+        for index in variables:
+            if nodes[index].op != "input":
+                self.locals[index] = self._local(index)
+        self._backward(variables)
+
+    def _dtype(self, index):
+        return _precision.floating([np.asarray(self.values[index]).dtype])
+
+    def _local(self, index):
+        """
+        Method to compute the local derivatives of a node with respect to its operands, None
+        for constant operands.
+        """
+        node = self.program.nodes[index]
+        operands = [self.values[arg] for arg in node.args]
+        if node.op in REDUCTIONS:
+            ufunc = REDUCTIONS[node.op]
+            return [_ufuncs.REDUCTIONS[ufunc](operands[0], node.params[0])]
+        out = self.values[index]
+        return [
+            None
+            if self.program.nodes[arg].op == "const"
+            else _ufuncs.partial_derivative(rule, out, *operands)
+            for arg, rule in zip(node.args, PRIMITIVES[node.op][1])
+        ]
+
+    def _evaluate(self, index):
+        """
+        Method to compute the value of a node from the values of its operands.
+        """
+        node = self.program.nodes[index]
+        operands = [self.values[arg] for arg in node.args]
+        if node.op in REDUCTIONS:
+            return REDUCTIONS[node.op].reduce(operands[0], axis=node.params[0])
+        return PRIMITIVES[node.op][0](*operands)
+
+    def _contribution(self, child, k, shape):
+        """
+        Method to compute the part of the adjoint of an operand that comes from one child.
+        """
+        node = self.program.nodes[child]
+        adjoint = self.adjoints[child]
+        local = self.locals[child][k]
+        if node.op in REDUCTIONS:
+            axis = node.params[0]
+            if axis is not None:
+                adjoint = np.expand_dims(adjoint, axis)
+            return local * adjoint
+        return _unbroadcast(local * adjoint, shape)
+
+    def update(self, index, value):
+        """
+        Method to replace the value of an input. Only the input is marked dirty, the graph is
+        recomputed when its value or gradient is requested next.
+
+        INPUTS
+        ------
+        index : int
+            position of the input in the arguments of the function
+        value : numpy array
+            new value, with the shape of the input
+
+        RAISES
+        ------
+        Exception
+            if there is no input at index
+            if the shape of value is not the shape of the input
+
+        EXAMPLES
+        --------
+        >>> graph = Incremental(lambda x: x * 2, np.array([1.0, 2.0]))
+        >>> graph.update(0, np.array([3.0, 4.0]))
+        >>> graph.value()
+        array([6., 8.])
+        """
+        if not 0 <= index < len(self.program.inputs):
+            raise Exception(
+                "The function has {} inputs".format(len(self.program.inputs))
+            )
+        node = self.program.inputs[index]
+        if np.shape(value) != self.values[node].shape:
+            raise Exception("The new value must have the shape of the input!")
+        self.n_forward = 0
+        self.n_backward = 0
+        if not np.array_equal(self.values[node], value):
+            # a new array, local derivatives may share the memory of the old value
+            self.values[node] = np.array(value, self.values[node].dtype)
+            self._dirty.add(node)
+
+    def _forward(self):
+        """
+        Method to recompute the values and local derivatives of the nodes downstream of the
+        dirty inputs, in topological order.
+        """
+        heap = []
+        for index in self._dirty:
+            for child, _ in self.children[index]:
+                heapq.heappush(heap, child)
+        self._dirty = set()
+        done = set()
+        count = 0
+        while heap:
+            index = heapq.heappop(heap)
+            if index in done:
+                continue
+            done.add(index)
+            count += 1
+            value = self._evaluate(index)
+            changed = not np.array_equal(value, self.values[index])
+            self.values[index] = value
+            local = self._local(index)
+            if any(
+                new is not None and not np.array_equal(new, old)
+                for new, old in zip(local, self.locals[index])
+            ):
+                self._stale.add(index)
+            self.locals[index] = local
+            if changed:
+                for child, _ in self.children[index]:
+                    heapq.heappush(heap, child)
+        self.n_forward = count
+
+    def _backward(self, roots=()):
+        """
+        Method to recompute the adjoints of the roots and of the nodes upstream of a changed
+        local derivative, in reverse topological order.
+        """
+        nodes = self.program.nodes
+        heap = [-index for index in roots]
+        for index in self._stale:
+            for arg in nodes[index].args:
+                if nodes[arg].op != "const":
+                    heap.append(-arg)
+        heapq.heapify(heap)
+        self._stale = set()
+        done = set()
+        count = 0
+        while heap:
+            index = -heapq.heappop(heap)
+            if index in done:
+                continue
+            done.add(index)
+            count += 1
+            shape = np.shape(self.values[index])
+            adjoint = self.seeds.get(index)
+            if adjoint is None:
+                adjoint = np.zeros(shape, self._dtype(index))
+            for child, k in self.children[index]:
+                adjoint = adjoint + self._contribution(child, k, shape)
+            if self.adjoints[index] is None or not np.array_equal(
+                adjoint, self.adjoints[index]
+            ):
+                self.adjoints[index] = adjoint
+                for arg in nodes[index].args:
+                    if nodes[arg].op != "const":
+                        heapq.heappush(heap, -arg)
+        self.n_backward = count
+
+    def value(self):
+        """
+        Method to get the outputs of the function at the current inputs.
+
+        RETURNS
+        -------
+        numpy array, or a tuple of numpy arrays if the function returned several
+        """
+        if self._dirty:
+            self._forward()
+        outputs = tuple(self.values[index] for index in self.program.outputs)
+        return outputs[0] if self.program.single else outputs
+
+    def gradient(self):
+        """
+        Method to get the derivative of the sum of the outputs with respect to every input.
+
+        RETURNS
+        -------
+        list of numpy arrays, one per input
+
+        EXAMPLES
+        --------
+        >>> graph = Incremental(lambda x, y: x * y, np.array([1.0, 2.0]), np.array([3.0, 4.0]))
+        >>> graph.gradient()
+        [array([3., 4.]), array([1., 2.])]
+        >>> graph.update(1, np.array([5.0, 4.0]))
+        >>> graph.gradient()[0], graph.n_backward
+        (array([5., 4.]), 2)
+        """
+        if self._dirty:
+            self._forward()
+        if self._stale:
+            self._backward()
+        return [self.adjoints[index] for index in self.program.inputs]
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
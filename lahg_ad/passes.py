@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the optimization passes over the Programs recorded by trace: constant
+folding, common subexpression elimination and dead node elimination. Every pass returns a new
+Program, which replays and compiles like the original one, with the number of operations it
+removed.
+"""
+
+import numpy as np
+
+from .tracing import Program
+
+# Ufuncs whose result does not depend on the order of their operands
+COMMUTATIVE = {"add", "multiply", "maximum", "minimum", "hypot", "logaddexp"}
+
+# Operations returning one operand unchanged when the other one is a constant of the given
+# value: op -> {position of the constant: value}
+IDENTITIES = {
+    "add": {0: 0, 1: 0},
+    "subtract": {1: 0},
+    "multiply": {0: 1, 1: 1},
+    "divide": {1: 1},
+    "power": {1: 1},
+}
+
+
+def _start(program):
+    """
+    Function to create an empty Program returning the same kind of result as program.
+    """
+    result = Program()
+    result.single = program.single
+    return result
+
+
+def _copy(result, program, index, args):
+    """
+    Function to append node index of program to result with new operand indices.
+    """
+    node = program.nodes[index]
+    if node.op == "const":
+        new = result.constant(node.params[0])
+    else:
+        new = result._append(
+            node.op,
+            args,
+            node.params,
+            program.values[index],
+            program.directions[index],
+        )
+    if node.op == "input":
+        result.inputs.append(new)
+    return new
+
+
+def _finish(result, program, mapping):
+    """
+    Function to set the outputs of result from the outputs of program.
+    """
+    result.outputs = [mapping[index] for index in program.outputs]
+    return result, len(program) - len(result)
+
+
+def _same_array(a, b):
+    return np.shape(a) == np.shape(b) and np.result_type(a) == np.result_type(b)
+
+
+def fold_constants(program):
+    """
+    Function to replace the operations on constants by their values, and the operations with a
+    neutral constant operand, like x * 1 or x + 0, by the other operand.
+
+    INPUTS
+    ------
+    program : Program object
+
+    RETURNS
+    -------
+    A new Program object, and the number of operations removed
+
+    EXAMPLES
+    --------
+    >>> from lahg_ad import Variable, trace
+    >>> program = trace(lambda x: (x + 0) * 1 + x, Variable(2.0, 1.0))
+    >>> folded, removed = fold_constants(program)
+    >>> removed, len(folded)
+    (2, 1)
+    """
+    result = _start(program)
+    mapping = {}
+    for index, node in enumerate(program.nodes):
+        args = [mapping[arg] for arg in node.args]
+        constant = [result.nodes[arg].op == "const" for arg in args]
+        value = program.values[index]
+        if node.op in ("input", "const") or not all(constant):
+            identity = IDENTITIES.get(node.op, {})
+            for position, neutral in identity.items():
+                arg = args[1 - position]
+                if (
+                    constant[position]
+                    and not constant[1 - position]
+                    and np.all(result.values[args[position]] == neutral)
+                    and _same_array(value, result.values[arg])
+                    and program.directions[index] == result.directions[arg]
+                ):
+                    mapping[index] = arg
+                    break
+            else:
+                mapping[index] = _copy(result, program, index, args)
+        else:
+            # the operands are the same at every call, so is the traced value
+            mapping[index] = result.constant(value)
+    return _finish(result, program, mapping)
+
+
+def _key(program, index):
+    """
+    Function to get a hashable key of a node, equal for nodes computing the same value.
+    """
+    node = program.nodes[index]
+    if node.op == "const":
+        value = np.asarray(node.params[0])
+        return "const", value.dtype.str, value.shape, value.tobytes()
+    if node.op in COMMUTATIVE:
+        return node.op, tuple(sorted(node.args)), node.params
+    return node.op, node.args, node.params
+
+
+def eliminate_common_subexpressions(program):
+    """
+    Function to merge the nodes that apply the same operation to the same operands, and the
+    constants of equal values.
+
+    INPUTS
+    ------
+    program : Program object
+
+    RETURNS
+    -------
+    A new Program object, and the number of operations removed
+
+    EXAMPLES
+    --------
+    >>> import numpy as np
+    >>> from lahg_ad import make_variables, trace
+    >>> f = lambda x, y: np.cos(x * y) + x * y + 3 * np.log(x)
+    >>> program = trace(f, *make_variables([5.0, 7.0], np.eye(2)))
+    >>> merged, removed = eliminate_common_subexpressions(program)
+    >>> removed, len(merged)
+    (1, 6)
+    """
+    result = _start(program)
+    mapping = {}
+    seen = {}
+    for index, node in enumerate(program.nodes):
+        args = tuple(mapping[arg] for arg in node.args)
+        if node.op == "input":
+            mapping[index] = _copy(result, program, index, args)
+            continue
+        new = _copy(result, program, index, args)
+        key = _key(result, new)
+        if key in seen:
+            # drop the node just appended and reuse the first one
+            result.nodes.pop()
+            result.values.pop()
+            result.directions.pop()
+            mapping[index] = seen[key]
+        else:
+            mapping[index] = seen[key] = new
+    return _finish(result, program, mapping)
+
+
+def eliminate_dead_nodes(program):
+    """
+    Function to remove the nodes that no output depends on. The inputs are always kept.
+
+    INPUTS
+    ------
+    program : Program object
+
+    RETURNS
+    -------
+    A new Program object, and the number of operations removed
+    """
+    live = set(program.outputs) | set(program.inputs)
+    for index in range(len(program.nodes) - 1, -1, -1):
+        if index in live:
+            live.update(program.nodes[index].args)
+    result = _start(program)
+    mapping = {}
+    for index, node in enumerate(program.nodes):
+        if index in live:
+            args = [mapping[arg] for arg in node.args]
+            mapping[index] = _copy(result, program, index, args)
+    return _finish(result, program, mapping)
+
+
+# The passes of simplify, in order
+PASSES = (
+    ("fold", fold_constants),
+    ("cse", eliminate_common_subexpressions),
+    ("dead", eliminate_dead_nodes),
+)
+
+
+def simplify(program):
+    """
+    Function to run constant folding, common subexpression elimination and dead node
+    elimination on a Program. The simplified Program gives the same values and derivatives,
+    and can be replayed or compiled in forward or reverse mode like the original one.
+
+    INPUTS
+    ------
+    program : Program object
+
+    RETURNS
+    -------
+    A new Program object, and a dictionary with the number of operations removed by each pass
+
+    EXAMPLES
+    --------
+    >>> import numpy as np
+    >>> from lahg_ad import make_variables, trace
+    >>> f = lambda x, y: np.cos(x * y) + x * y + 3 * np.log(x)
+    >>> program = trace(f, *make_variables([5.0, 7.0], np.eye(2)))
+    >>> simple, removed = simplify(program)
+    >>> removed
+    {'fold': 0, 'cse': 1, 'dead': 0}
+    >>> print(simple(*make_variables([1.0, 2.0], np.eye(2))))
+    value = 1.5838531634528576, derivative = [3.18140515 0.09070257]
+    """
+    removed = {}
+    for name, function in PASSES:
+        program, removed[name] = function(program)
+    return program, removed
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the precision policy of the package. By default, values and derivatives keep
+the dtype of the inputs. Inside a Precision scope, or with the dtype argument of a constructor,
+the values and derivative seeds of new Variable, DualArray and RD objects are converted to one
+floating point dtype, once. Operations then keep that dtype, so e.g. float32 halves the memory
+and bandwidth of large vectors without a conversion per operation.
+"""
+
+import numpy as np
+
+# Stack of the dtypes of the Precision scopes entered, the last one is active
+_stack = []
+
+
+def check(dtype):
+    """
+    Function to validate a dtype of the precision policy.
+
+    INPUTS
+    ------
+    dtype : numpy dtype, type or str
+
+    RETURNS
+    -------
+    numpy dtype
+
+    RAISES
+    ------
+    ValueError
+        if dtype is not a floating point dtype
+
+    EXAMPLES
+    --------
+    >>> check("float32")
+    dtype('float32')
+    >>> check(int)
+    Traceback (most recent call last):
+    ...
+    ValueError: The precision must be a floating point dtype, not int64
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind != "f":
+        raise ValueError(f"The precision must be a floating point dtype, not {dtype}")
+    return dtype
+
+
+class Precision:
+    """
+    This is the Precision class, a scope making a floating point dtype the precision of the
+    Variable, DualArray, RD and Tape objects created inside it. The dtype argument of a
+    constructor overrides the scope.
+
+    EXAMPLES
+    ========
+    >>> with Precision(np.float32):
+    ...     current()
+    dtype('float32')
+    >>> current() is None
+    True
+    """
+
+    def __init__(self, dtype):
+        """
+        Precision class constructor
+
+        INPUTS
+        ------
+        dtype : numpy floating point dtype, type or str
+
+        RAISES
+        ------
+        ValueError
+            if dtype is not a floating point dtype
+
+        EXAMPLES
+        --------
+        >>> Precision("float32").dtype
+        dtype('float32')
+        """
+        self.dtype = check(dtype)
+
+    def __enter__(self):
+        _stack.append(self.dtype)
+        return self
+
+    def __exit__(self, *exc):
+        _stack.pop()
+        return False
+
+
+def current():
+    """
+    Function to get the dtype of the active Precision scope.
+
+    RETURNS
+    -------
+    numpy dtype or None if no Precision scope is active
+    """
+    return _stack[-1] if _stack else None
+
+
+def resolve(dtype=None):
+    """
+    Function to get the dtype of a new object, the dtype given to its constructor or else the
+    dtype of the active Precision scope.
+
+    INPUTS
+    ------
+    dtype : numpy dtype, type, str or None
+
+    RETURNS
+    -------
+    numpy dtype or None if the values keep their own dtype
+
+    EXAMPLES
+    --------
+    >>> resolve() is None
+    True
+    >>> with Precision(np.float32):
+    ...     resolve(), resolve(np.float64)
+    (dtype('float32'), dtype('float64'))
+    """
+    if dtype is None:
+        return current()
+    return check(dtype)
+
+
+def cast(x, dtype):
+    """
+    Function to convert a value or derivative seed to a dtype.
+
+    INPUTS
+    ------
+    x : int, float or numpy array
+    dtype : numpy dtype or None
+        None returns x unchanged
+
+    RETURNS
+    -------
+    numpy array or numpy scalar of dtype
+
+    EXAMPLES
+    --------
+    >>> cast(np.array([1, 2]), np.dtype(np.float32))
+    array([1., 2.], dtype=float32)
+    >>> type(cast(1, np.dtype(np.float32)))
+    <class 'numpy.float32'>
+    """
+    if dtype is None:
+        return x
+    if isinstance(x, np.ndarray):
+        return x.astype(dtype, copy=False)
+    return dtype.type(x)
+
+
+def floating(dtypes):
+    """
+    Function to get the floating point dtype holding the derivatives of values of some dtypes,
+    the narrowest floating dtype that all of them are converted to without loss. Integer values
+    get float64 derivatives.
+
+    INPUTS
+    ------
+    dtypes : iterable of numpy dtypes
+
+    RETURNS
+    -------
+    numpy dtype
+
+    EXAMPLES
+    --------
+    >>> floating([np.dtype(np.float32)])
+    dtype('float32')
+    >>> floating([np.dtype(np.float32), np.dtype(np.int64)])
+    dtype('float64')
+    >>> floating([])
+    dtype('float64')
+    """
+    dtypes = set(dtypes)
+    if not dtypes:
+        return np.dtype(float)
+    return np.result_type(np.float16, *dtypes)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
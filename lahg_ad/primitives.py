@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the fused primitives shared by Variable and RD objects. Every function returns
+the value of a primitive together with its local derivatives, and computes one exponential for
+both. Written in terms of exp(-|x|), or of exp(-x) when it cannot overflow, the results stay
+finite for inputs of any magnitude, without branching on the sign of each input.
+"""
+
+import numpy as np
+
+
+def _sigmoid(x, e):
+    """
+    Function to compute the logistic function of x from e = exp(-|x|). The value is
+    1 / (1 + e) for x >= 0 and e / (1 + e) otherwise, and since e <= 1 both are
+    max(e, x >= 0) / (1 + e), which selects without branching and without a second exponential.
+    """
+    return np.maximum(e, x >= 0) / (1 + e)
+
+
+def logistic(x):
+    """
+    Function to compute the logistic function 1 / (1 + exp(-x)) and its derivative.
+
+    When exp(-x) does not overflow, the value and the derivative are computed from it directly.
+    Otherwise they are computed from exp(-|x|), which is finite for all inputs.
+
+    INPUTS
+    ------
+    x : int, float or numpy array
+
+    RETURNS
+    -------
+    the value and the derivative
+
+    EXAMPLES
+    --------
+    >>> logistic(np.array([-800., 0., 2.]))
+    (array([0.        , 0.5       , 0.88079708]), array([0.        , 0.25      , 0.10499359]))
+    >>> logistic(np.array([-2., 0., 2.]))
+    (array([0.11920292, 0.5       , 0.88079708]), array([0.10499359, 0.25      , 0.10499359]))
+    """
+    limit = np.log(np.finfo(np.result_type(np.asarray(x).dtype, np.float16)).max)
+    if np.all(x > -limit):
+        e = np.exp(-x)
+        value = 1 / (1 + e)
+        return value, e * value * value
+    e = np.exp(-np.abs(x))
+    return _sigmoid(x, e), e / (1 + e) ** 2
+
+
+def softplus(x):
+    """
+    Function to compute softplus, log(1 + exp(x)), and its derivative, the logistic function.
+
+    INPUTS
+    ------
+    x : int, float or numpy array
+
+    RETURNS
+    -------
+    the value and the derivative
+
+    EXAMPLES
+    --------
+    >>> softplus(np.array([-800., 0., 40.]))
+    (array([ 0.        ,  0.69314718, 40.        ]), array([0. , 0.5, 1. ]))
+    """
+    e = np.exp(-np.abs(x))
+    return np.maximum(x, 0) + np.log1p(e), _sigmoid(x, e)
+
+
+def logaddexp(x, y):
+    """
+    Function to compute log(exp(x) + exp(y)) and its partial derivatives.
+
+    INPUTS
+    ------
+    x, y : int, float or numpy array
+
+    RETURNS
+    -------
+    the value, and a tuple of the partial derivatives with respect to x and y
+
+    EXAMPLES
+    --------
+    >>> value, (dx, dy) = logaddexp(1000., 1000.)
+    >>> print(value, dx, dy)
+    1000.6931471805599 0.5 0.5
+    """
+    difference = x - y
+    e = np.exp(-np.abs(difference))
+    value = np.maximum(x, y) + np.log1p(e)
+    return value, (_sigmoid(difference, e), _sigmoid(-difference, e))
+
+
+def logsumexp(x):
+    """
+    Function to compute log(sum(exp(x))) over all elements of x and its gradient, the softmax
+    of x.
+
+    INPUTS
+    ------
+    x : int, float or numpy array
+
+    RETURNS
+    -------
+    the value and the gradient, of the shape of x
+
+    EXAMPLES
+    --------
+    >>> value, gradient = logsumexp(np.array([1000., 1000.]))
+    >>> print(value, gradient)
+    1000.6931471805599 [0.5 0.5]
+    """
+    shift = np.max(x)
+    e = np.exp(x - shift)
+    total = np.sum(e)
+    return shift + np.log(total), e / total
+
+
+def sigmoid_cross_entropy(x, labels):
+    """
+    Function to compute the binary cross-entropy of the logistic function of the logits x with
+    the labels, -labels * log(logistic(x)) - (1 - labels) * log(1 - logistic(x)), and its
+    derivative with respect to x.
+
+    INPUTS
+    ------
+    x : int, float or numpy array
+        logits
+    labels : int, float or numpy array
+        target probabilities, usually 0 or 1
+
+    RETURNS
+    -------
+    the elementwise value and derivative
+
+    EXAMPLES
+    --------
+    >>> sigmoid_cross_entropy(np.array([-40., 0., 800.]), np.array([1., 1., 1.]))
+    (array([40.        ,  0.69314718,  0.        ]), array([-1. , -0.5,  0. ]))
+    """
+    value, sigmoid = softplus(x)
+    # the labels in the dtype of the logits, so float64 labels do not widen float32 logits
+    labels = np.asarray(labels, dtype=np.result_type(value))
+    return value - x * labels, sigmoid - labels
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -1,8 +1,53 @@
+import contextlib
+from functools import partial
+
 import numpy as np
 
+from . import checks as _checks
+from . import graph as _graph
+from . import precision as _precision
+from . import tape as _tape
+from . import primitives as _primitives
+from . import ufuncs as _ufuncs
+
+# Number of lazy_derivatives blocks entered, local derivatives are deferred while it is positive
+_lazy = 0
+
+# Version of the graph, incremented by every operation recorded without a tape
+_version = 0
+
+
+class _Stamp:
+    """
+    Version stamps of the derivative cached in the grad attribute of a RD object.
+
+    changed is the version of the last operation recorded downstream of the object and computed
+    the version its derivative was computed at, so the derivative is stale when changed is
+    larger. n_children is the number of children summed in the cached derivative, which stays
+    a valid partial sum as long as only new children are appended. parents holds the stamps of
+    the operands, not the operands themselves, so the stamps do not create reference cycles.
+    """
+
+    __slots__ = ("changed", "computed", "n_children", "parents")
+
+    def __init__(self, parents=(), computed=-1):
+        self.changed = 0
+        self.computed = computed
+        self.n_children = 0
+        self.parents = parents
+
+    def renew(self):
+        """
+        Method to copy the stamp for an object whose children list is replaced. The nodes
+        built from the old children keep the old stamp, so they no longer mark the object.
+        """
+        stamp = _Stamp(self.parents, self.computed)
+        stamp.changed = self.changed
+        return stamp
+
 
 class RD:
-    def __init__(self, value):
+    def __init__(self, value, requires_grad=True, dtype=None):
         """
         Initialize a RD object.
 
@@ -12,6 +57,12 @@ class RD:
             A numpy array that stores the value of RD object
             vector input: np.array([1, 2, 3])
             scalar input: np.array([1.5])
+        requires_grad : bool, optional
+            False marks constant data. Operations do not record edges to RD objects that do not
+            require gradients, and their results only require gradients if another operand does.
+        dtype : numpy floating point dtype, optional
+            Convert the value to dtype. The default is the dtype of the active Precision scope,
+            or no conversion outside of one.
 
         RAISES
         ------
@@ -29,6 +80,12 @@ class RD:
         array([1., 1., 1.])
         >>> x.children
         []
+        >>> data = RD(np.array([4., 5., 6.]), requires_grad=False)
+        >>> f = (x * data).sin()
+        >>> data.children, f.requires_grad
+        ([], True)
+        >>> RD(np.array([1, 2]), dtype=np.float32).sin().val
+        array([0.841471 , 0.9092974], dtype=float32)
         """
 
         if not isinstance(value, np.ndarray):
@@ -37,13 +94,50 @@ class RD:
         if len(value.shape) != 1:
             raise Exception("Input cannot be a multidimentional array")
 
-        for i in range(len(value)):
-            if not isinstance(value[i], (np.int_, np.double)):
-                raise Exception("Input must be a numpy array of int or float!")
+        if value.dtype.type not in (np.int_, np.double, np.single):
+            raise Exception("Input must be a numpy array of int or float!")
 
+        value = _precision.cast(value, _precision.resolve(dtype))
         self.val = value
-        self.grad = np.ones(len(value))
+        self.grad = np.ones(len(value), _precision.floating([value.dtype]))
         self.children = []
+        self.tape = None
+        self.arena = None
+        self.requires_grad = requires_grad
+        self.stamp = _Stamp(computed=_version)
+
+    @classmethod
+    def _make(cls, value, requires_grad=True):
+        """
+        Trusted constructor for the results of operations
+
+        The operands of an operation were validated when they were created, so the value of the
+        result is stored without checking it again. The derivative is left to be computed by
+        get_derivative, so creating a node does not depend on its length.
+
+        INPUTS
+        ------
+        value : A numpy array
+        requires_grad : bool, optional
+
+        RETURNS
+        -------
+        A RD object
+
+        EXAMPLES
+        --------
+        >>> print(RD._make(np.array([2., 3.])))
+        value = [2. 3.], derivative = [1. 1.]
+        """
+        node = object.__new__(cls)
+        node.val = value
+        node.grad = None
+        node.children = []
+        node.tape = None
+        node.arena = None
+        node.requires_grad = requires_grad
+        node.stamp = _Stamp()
+        return node
 
     def sin(self):
         """
@@ -67,10 +161,7 @@ class RD:
         >>> x.get_derivative()
         array([-0.41614684])
         """
-        child = RD(np.sin(self.val))
-        self.children.append((np.cos(self.val), child))
-        self.grad = None
-        return child
+        return _record("sin", np.sin(self.val), (self, lambda x=self.val: np.cos(x)))
 
     def cos(self):
         """
@@ -87,10 +178,7 @@ class RD:
         >>> x.get_derivative()
         array([-0.90929743, -0.14112001,  0.7568025 ])
         """
-        child = RD(np.cos(self.val))
-        self.children.append((-np.sin(self.val), child))
-        self.grad = None
-        return child
+        return _record("cos", np.cos(self.val), (self, lambda x=self.val: -np.sin(x)))
 
     def tan(self):
         """
@@ -112,10 +200,9 @@ class RD:
         >>> x.get_derivative()
         array([-0.90929743, -0.14112001,  0.7568025 ])
         """
-        child = RD(np.tan(self.val))
-        self.children.append((1 / (np.cos(self.val) ** 2), child))
-        self.grad = None
-        return child
+        return _record(
+            "tan", np.tan(self.val), (self, lambda x=self.val: 1 / (np.cos(x) ** 2))
+        )
 
     def __add__(self, other):
         """
@@ -148,20 +235,24 @@ class RD:
         >>> x.get_derivative()
         array([1.])
         """
+        if not isinstance(other, (RD, float, int)):
+            return np.add(self, other)
         if isinstance(other, (float, int)):
-            child = RD(self.val + other)
-            self.children.append((np.ones(len(self.val)), child))
-            self.grad = None
-            return child
+            return _record(
+                "add",
+                self.val + other,
+                (self, partial(_full, self.val, 1.0)),
+                const=other,
+            )
         else:
             if len(self.val) != len(other.val):
                 raise Exception("Two vectors have different lengths!")
-            child = RD(self.val + other.val)
-            self.children.append((np.ones(len(self.val)), child))
-            other.children.append((np.ones(len(self.val)), child))
-            self.grad = None
-            other.grad = None
-            return child
+            return _record(
+                "add",
+                self.val + other.val,
+                (self, partial(_full, self.val, 1.0)),
+                (other, partial(_full, self.val, 1.0)),
+            )
 
     def __radd__(self, other):
         """
@@ -204,7 +295,7 @@ class RD:
         RETURNS
         -------
         int or float
-            derivative of the RD object
+            derivative of the RD object, None if it does not require gradients
 
         EXAMPLES
         --------
@@ -213,11 +304,12 @@ class RD:
         >>> x.get_derivative()
         array([4.])
         """
-        if self.grad is None:
-            grad = 0
-            for der, node in self.children:
-                grad += der * node.get_derivative()
-            self.grad = grad
+        if not self.requires_grad:
+            return None
+        if self.tape is not None:
+            self.grad = self.tape.gradient(self.index)
+        elif not _is_cached(self):
+            _backward(_topological_order(self))
         return self.grad
 
     def __mul__(self, other):
@@ -252,20 +344,21 @@ class RD:
         >>> x.get_derivative()
         array([3., 3., 3.])
         """
+        if not isinstance(other, (RD, float, int)):
+            return np.multiply(self, other)
         if isinstance(other, (float, int)):
-            child = RD(self.val * other)
-            self.children.append((np.ones(len(self.val)) * other, child))
-            self.grad = None
-            return child
+            return _record(
+                "mul",
+                self.val * other,
+                (self, partial(_full, self.val, float(other))),
+                const=other,
+            )
         else:
             if len(self.val) != len(other.val):
                 raise Exception("Two vectors have different lengths!")
-            child = RD(self.val * other.val)
-            self.children.append((other.val, child))
-            other.children.append((self.val, child))
-            self.grad = None
-            other.grad = None
-            return child
+            return _record(
+                "mul", self.val * other.val, (self, other.val), (other, self.val)
+            )
 
     def __rmul__(self, other):
         """
@@ -315,10 +408,7 @@ class RD:
         array([-1., -1., -1.])
 
         """
-        child = RD(-self.val)
-        self.children.append((-np.ones(len(self.val)), child))
-        self.grad = None
-        return child
+        return _record("neg", -self.val, (self, partial(_full, self.val, -1.0)))
 
     def __sub__(self, other):
         """
@@ -345,20 +435,24 @@ class RD:
         >>> x.get_derivative()
         array([1., 1., 1.])
         """
+        if not isinstance(other, (RD, float, int)):
+            return np.subtract(self, other)
         if isinstance(other, (float, int)):
-            child = RD(self.val - other)
-            self.children.append((np.ones(len(self.val)), child))
-            self.grad = None
-            return child
+            return _record(
+                "sub",
+                self.val - other,
+                (self, partial(_full, self.val, 1.0)),
+                const=other,
+            )
         else:
             if len(self.val) != len(other.val):
                 raise Exception("Two vectors have different lengths!")
-            child = RD(self.val - other.val)
-            self.children.append((np.ones(len(self.val)), child))
-            other.children.append((-np.ones(len(self.val)), child))
-            self.grad = None
-            other.grad = None
-            return child
+            return _record(
+                "sub",
+                self.val - other.val,
+                (self, partial(_full, self.val, 1.0)),
+                (other, partial(_full, self.val, -1.0)),
+            )
 
     def __rsub__(self, other):
         """
@@ -386,19 +480,21 @@ class RD:
         array([-1., -1., -1.])
         """
         if isinstance(other, (float, int)):
-            child = RD(other - self.val)
-            self.children.append((-np.ones(len(self.val)), child))
-            self.grad = None
-            return child
+            return _record(
+                "rsub",
+                other - self.val,
+                (self, partial(_full, self.val, -1.0)),
+                const=other,
+            )
         else:
             if len(self.val) != len(other.val):
                 raise Exception("Two vectors have different lengths!")
-            child = RD(other.val - self.val)
-            self.children.append((-np.ones(len(self.val)), child))
-            other.children.append((np.ones(len(self.val)), child))
-            self.grad = None
-            other.grad = None
-            return child
+            return _record(
+                "rsub",
+                other.val - self.val,
+                (self, partial(_full, self.val, -1.0)),
+                (other, partial(_full, self.val, 1.0)),
+            )
 
     def __pow__(self, other):
         """
@@ -432,28 +528,40 @@ class RD:
         >>> x.get_derivative()
         array([12.])
         """
-        self.val = self.val.astype(float)
+        if not isinstance(other, (RD, float, int)):
+            return np.power(self, other)
+        # integer values are raised to float powers, without changing the dtype of self.val
+        base = self.val.astype(_precision.floating([self.val.dtype]), copy=False)
         if isinstance(other, (float, int)):
-            if (other - np.floor(other) != 0) and any(self.val <= 0):
-                raise Exception(
-                    "Cannot take derivative of the root of a non-positive number"
-                )
-            if any(self.val == 0) and other < 0:
-                raise Exception("Cannot raise the negative power of 0")
-
-            child = RD(self.val ** other)
-            self.children.append((other * (self.val ** (other - 1)), child))
-            self.grad = None
-            return child
+            if _checks.enabled():
+                if (other - np.floor(other) != 0) and (self.val <= 0).any():
+                    raise Exception(
+                        "Cannot take derivative of the root of a non-positive number"
+                    )
+                if other < 0 and (self.val == 0).any():
+                    raise Exception("Cannot raise the negative power of 0")
+
+            return _record(
+                "pow",
+                base ** other,
+                (self, lambda x=base, p=other: p * (x ** (p - 1))),
+                const=other,
+            )
         else:
             if len(self.val) != len(other.val):
                 raise Exception("Two vectors have different lengths!")
-            child = RD(self.val ** other.val)
-            self.children.append((other.val * (self.val ** (other.val - 1)), child))
-            self.grad = None
-            other.children.append(((self.val ** other.val) * np.log(self.val), child))
-            other.grad = None
-            return child
+            value = base ** other.val
+            return _record(
+                "pow",
+                value,
+                (self, lambda x=base, p=other.val: p * (x ** (p - 1))),
+                (
+                    other,
+                    lambda x=base, p=other.val: _ufuncs.partial_derivative(
+                        _ufuncs.DERIVATIVES[np.power][1], value, x, p
+                    ),
+                ),
+            )
 
     def sqrt(self):
         """
@@ -534,7 +642,13 @@ class RD:
         array([1., 1., 1.])
         """
         self.children = []
-        self.grad = np.ones(len(self.val))
+        self.grad = np.ones(len(self.val), _precision.floating([self.val.dtype]))
+        self.tape = None
+        self.arena = None
+        # the results that were built from the object no longer contribute upstream
+        parents = self.stamp.parents
+        self.stamp = _Stamp(parents, computed=_version)
+        _invalidate(parents, upstream=True)
 
     def arcsin(self):
         """
@@ -556,14 +670,14 @@ class RD:
         >>> x.get_derivative()
         array([1.15470054])
         """
-        for i in range(len(self.val)):
-            if self.val[i] > 1 or self.val[i] < -1:
-                raise Exception("The domian of arcsin is between 1 and -1")
+        if _checks.enabled() and (np.abs(self.val) > 1).any():
+            raise Exception("The domian of arcsin is between 1 and -1")
 
-        child = RD(np.arcsin(self.val))
-        self.children.append((1 / (1 - (self.val ** 2)) ** 0.5, child))
-        self.grad = None
-        return child
+        return _record(
+            "arcsin",
+            np.arcsin(self.val),
+            (self, lambda x=self.val: 1 / (1 - (x ** 2)) ** 0.5),
+        )
 
     def arccos(self):
         """
@@ -585,14 +699,14 @@ class RD:
         >>> x.get_derivative()
         array([-1.15470054])
         """
-        for i in range(len(self.val)):
-            if self.val[i] > 1 or self.val[i] < -1:
-                raise Exception("The domian of arcsin is between 1 and -1")
+        if _checks.enabled() and (np.abs(self.val) > 1).any():
+            raise Exception("The domian of arcsin is between 1 and -1")
 
-        child = RD(np.arccos(self.val))
-        self.children.append((-1 / (1 - (self.val ** 2)) ** 0.5, child))
-        self.grad = None
-        return child
+        return _record(
+            "arccos",
+            np.arccos(self.val),
+            (self, lambda x=self.val: -1 / (1 - (x ** 2)) ** 0.5),
+        )
 
     def arctan(self):
         """
@@ -609,10 +723,9 @@ class RD:
         >>> x.get_derivative()
         array([0.5, 0.2, 0.1])
         """
-        child = RD(np.arctan(self.val))
-        self.children.append((1 / (1 + (self.val ** 2)), child))
-        self.grad = None
-        return child
+        return _record(
+            "arctan", np.arctan(self.val), (self, lambda x=self.val: 1 / (1 + (x ** 2)))
+        )
 
     def __eq__(self, other):
         """
@@ -713,10 +826,8 @@ class RD:
         array([1.38629436, 2.77258872, 5.54517744])
         """
         if base == None:
-            child = RD(np.exp(self.val))
-            self.children.append((np.exp(self.val), child))
-            self.grad = None
-            return child
+            value = np.exp(self.val)
+            return _record("exp", value, (self, value))
         elif isinstance(base, (int, float)):
             return self.__rpow__(base)
         else:
@@ -737,10 +848,7 @@ class RD:
         >>> x.get_derivative()
         array([ 1.54308063,  3.76219569, 10.067662  ])
         """
-        child = RD(np.sinh(self.val))
-        self.children.append((np.cosh(self.val), child))
-        self.grad = None
-        return child
+        return _record("sinh", np.sinh(self.val), (self, lambda x=self.val: np.cosh(x)))
 
     def cosh(self):
         """
@@ -757,10 +865,7 @@ class RD:
         >>> x.get_derivative()
         array([ 1.17520119,  3.62686041, 10.01787493])
         """
-        child = RD(np.cosh(self.val))
-        self.children.append((np.sinh(self.val), child))
-        self.grad = None
-        return child
+        return _record("cosh", np.cosh(self.val), (self, lambda x=self.val: np.sinh(x)))
 
     def tanh(self):
         """
@@ -777,10 +882,8 @@ class RD:
         >>> x.get_derivative()
         array([0.41997434, 0.07065082, 0.00986604])
         """
-        child = RD(np.tanh(self.val))
-        self.children.append((1 / (np.cosh(self.val) ** 2), child))
-        self.grad = None
-        return child
+        value = np.tanh(self.val)
+        return _record("tanh", value, (self, lambda value=value: 1 - value ** 2))
 
     def log(self, base=10):
         """
@@ -814,12 +917,16 @@ class RD:
             raise Exception("The log base must be a number!")
         if base <= 0 or (not isinstance(base, (int, float))):
             raise Exception("The log base must be a positive number (int or float)")
-        if any(self.val <= 0):
+        if _checks.enabled() and (self.val <= 0).any():
             raise Exception("The input vector must be positive")
-        child = RD(np.log(self.val) / np.log(base))
-        self.children.append((1 / (self.val * np.log(base)), child))
-        self.grad = None
-        return child
+        # a Python float keeps the precision of the values
+        log_base = float(np.log(base))
+        return _record(
+            "log",
+            np.log(self.val) / log_base,
+            (self, lambda x=self.val: 1 / (x * log_base)),
+            const=base,
+        )
 
     def __rpow__(self, other):
         """
@@ -849,25 +956,27 @@ class RD:
         """
         other = float(other)
         if isinstance(other, (float, int)):
-            if other == 0 and any(self.val < 0):
-                raise Exception("Cannot raise the negative power of 0")
-            if other < 0 and any(self.val - np.floor(self.val) != 0):
-                raise Exception(
-                    "Cannot take derivative of the root of a non-positive number"
-                )
-            child = RD(other ** self.val)
-            self.children.append(((other ** self.val) * np.log(other), child))
-            self.grad = None
-            return child
+            if _checks.enabled():
+                if other == 0 and (self.val < 0).any():
+                    raise Exception("Cannot raise the negative power of 0")
+                if other < 0 and (self.val - np.floor(self.val) != 0).any():
+                    raise Exception(
+                        "Cannot take derivative of the root of a non-positive number"
+                    )
+            value = other ** self.val
+            return _record(
+                "rpow", value, (self, lambda: value * float(np.log(other))), const=other
+            )
         else:
             if len(other.val) != len(self.val):
                 raise Exception("Two vectors have different lengths!")
-            child = RD([other.val ** self.val])
-            other.children.append((self.val * (other.val ** (self.val - 1)), child))
-            other.grad = None
-            self.children.append(((other.val ** self.val) * np.log(other.val), child))
-            self.grad = None
-            return child
+            value = other.val ** self.val
+            return _record(
+                "pow",
+                value,
+                (other, lambda x=other.val, p=self.val: p * (x ** (p - 1))),
+                (self, lambda x=other.val: value * np.log(x)),
+            )
 
     def __truediv__(self, other):
         """
@@ -899,15 +1008,19 @@ class RD:
         >>> x.get_derivative()
         array([1. , 0.5])
         """
+        if not isinstance(other, (RD, float, int)):
+            return np.divide(self, other)
         if isinstance(other, (float, int)):
             if other == 0:
                 raise Exception("Cannot divide by 0")
-            child = RD(self.val / other)
-            self.children.append((1 / other * np.ones(len(self.val)), child))
-            self.grad = None
-            return child
+            return _record(
+                "truediv",
+                self.val / other,
+                (self, partial(_full, self.val, 1 / other)),
+                const=other,
+            )
         else:
-            if any(other.val == 0):
+            if _checks.enabled() and (other.val == 0).any():
                 raise Exception("Cannot divide by 0")
             return self * (other ** (-1))
 
@@ -941,7 +1054,7 @@ class RD:
         >>> x.get_derivative()
         array([1. , 0.5])
         """
-        if any(self.val == 0):
+        if _checks.enabled() and (self.val == 0).any():
             raise Exception("Cannot divide by 0")
         return other * (self ** (-1))
 
@@ -965,13 +1078,736 @@ class RD:
         >>> x.get_derivative()
         array([0.10499359])
         """
-        child = RD(1 / (1 + np.exp(-self.val)))
-        self.children.append(
-            (np.exp(-self.val) / ((1 + np.exp(-self.val)) ** 2), child)
+        value, local = _primitives.logistic(self.val)
+        return _record("logistic", value, (self, local))
+
+    def softplus(self):
+        """
+        Method to perform the softplus operation log(1 + exp(x)) for RD objects. The
+        exponential is computed once for the value and the derivative.
+
+        RETURNS
+        -------
+        child : RD object
+
+        EXAMPLES
+        --------
+        >>> x = RD(np.array([-1000., 0., 1000.]))
+        >>> f = x.softplus()
+        >>> x.get_derivative()
+        array([0. , 0.5, 1. ])
+        """
+        value, local = _primitives.softplus(self.val)
+        return _record("softplus", value, (self, local))
+
+    def logaddexp(self, other):
+        """
+        Method to compute log(exp(self) + exp(other)) for RD objects without overflow.
+        Operands of length 1 are broadcast against longer ones.
+
+        INPUTS
+        ------
+        other : RD object or int or float or numpy array
+
+        RAISES
+        ------
+        Exception
+            if other is not a RD object or a number
+
+        RETURNS
+        -------
+        child : RD object
+
+        EXAMPLES
+        --------
+        >>> x, y = RD(np.array([1000., 0.])), RD(np.array([1000.]))
+        >>> f = x.logaddexp(y)
+        >>> x.get_derivative(), y.get_derivative()
+        (array([0.5, 0. ]), array([1.5]))
+        """
+        if isinstance(other, RD):
+            value, (dx, dy) = _primitives.logaddexp(self.val, other.val)
+            return _record(
+                "logaddexp",
+                value,
+                (self, np.broadcast_to(dx, value.shape)),
+                (other, np.broadcast_to(dy, value.shape)),
+            )
+        if not isinstance(other, (float, int, np.ndarray)):
+            raise Exception("The other operand must be a RD object or a number")
+        value, (dx, _) = _primitives.logaddexp(self.val, other)
+        const = other if isinstance(other, (float, int)) else np.nan
+        return _record(
+            "logaddexp", value, (self, np.broadcast_to(dx, value.shape)), const=const
         )
-        self.grad = None
+
+    def logsumexp(self):
+        """
+        Method to compute log(sum(exp(x))) over all elements of a RD object without overflow.
+
+        RETURNS
+        -------
+        child : RD object of length 1
+
+        EXAMPLES
+        --------
+        >>> x = RD(np.array([1., 2., 3.]))
+        >>> f = x.logsumexp()
+        >>> x.get_derivative()
+        array([0.09003057, 0.24472847, 0.66524096])
+        """
+        value, gradient = _primitives.logsumexp(self.val)
+        return _record("logsumexp", np.array([value]), (self, gradient))
+
+    def sigmoid_cross_entropy(self, labels):
+        """
+        Method to compute the binary cross-entropy of the logistic function of a RD object with
+        the labels, elementwise and without overflow. The labels are not differentiated.
+
+        INPUTS
+        ------
+        labels : int or float or numpy array
+            target probabilities, usually 0 or 1
+
+        RETURNS
+        -------
+        child : RD object
+
+        EXAMPLES
+        --------
+        >>> x = RD(np.array([-2., 0., 2.]))
+        >>> f = x.sigmoid_cross_entropy(np.array([0., 1., 1.]))
+        >>> x.get_derivative()
+        array([ 0.11920292, -0.5       , -0.11920292])
+        """
+        value, local = _primitives.sigmoid_cross_entropy(self.val, labels)
+        return _record("sigmoid_cross_entropy", value, (self, local))
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """
+        Apply a numpy ufunc to RD objects.
+
+        The ufunc runs once on the values and records one operation with the partial derivative
+        of the result with respect to every RD input, given by lahg_ad.ufuncs. Operands of
+        length 1 are broadcast against longer ones. Unsupported ufuncs, operand types or
+        keyword arguments return NotImplemented and numpy raises a TypeError.
+
+        RETURNS
+        -------
+        child : RD object
+
+        EXAMPLES
+        --------
+        >>> x = RD(np.array([3., 5.]))
+        >>> f = np.hypot(x, np.array([4., 12.]))
+        >>> x.get_derivative()
+        array([0.6       , 0.38461538])
+
+        >>> x = RD(np.array([1., 2., 3.]))
+        >>> f = np.array([1., 2., 3.]) * np.add.reduce(x)
+        >>> f.val
+        array([ 6., 12., 18.])
+        >>> x.get_derivative()
+        array([6., 6., 6.])
+        """
+        if not all(
+            isinstance(x, (RD, np.ndarray, np.generic, float, int)) for x in inputs
+        ):
+            return NotImplemented
+        if method == "__call__" and ufunc in _ufuncs.COMPARISONS and not kwargs:
+            left, right = inputs
+            if not isinstance(left, RD):
+                left, right = right, left
+            return _ufuncs.COMPARISONS[ufunc](left, right)
+        if method == "__call__" and ufunc in _ufuncs.DERIVATIVES and not kwargs:
+            values = [x.val if isinstance(x, RD) else x for x in inputs]
+            value = ufunc(*values)
+            edges = [
+                (x, partial(_partial_derivative, rule, value, values))
+                for x, rule in zip(inputs, _ufuncs.DERIVATIVES[ufunc])
+                if isinstance(x, RD)
+            ]
+            const = [x for x in inputs if not isinstance(x, RD)]
+            if len(const) == 1 and isinstance(const[0], (float, int)):
+                return _record(ufunc.__name__, value, *edges, const=const[0])
+            return _record(ufunc.__name__, value, *edges)
+        if (
+            method == "reduce"
+            and ufunc in _ufuncs.REDUCTIONS
+            and set(kwargs) <= {"axis"}
+        ):
+            if kwargs.get("axis", 0) not in (0, -1, None):
+                return NotImplemented
+            return _record(
+                ufunc.__name__ + ".reduce",
+                np.array([ufunc.reduce(self.val)]),
+                (self, partial(_ufuncs.REDUCTIONS[ufunc], self.val, None)),
+            )
+        return NotImplemented
+
+    def __array_function__(self, func, types, args, kwargs):
+        """
+        Apply the numpy reductions np.sum, np.mean, np.max and np.min to a RD object.
+        The result is a RD object of length 1. Other numpy functions return NotImplemented.
+
+        RETURNS
+        -------
+        child : RD object
+
+        EXAMPLES
+        --------
+        >>> x = RD(np.array([1., 4., 2.]))
+        >>> f = np.max(x) + np.mean(x)
+        >>> f.val
+        array([6.33333333])
+        >>> x.get_derivative()
+        array([0.33333333, 1.33333333, 0.33333333])
+        """
+        if len(args) != 1 or set(kwargs) - {"axis"}:
+            return NotImplemented
+        if func is np.mean:
+            return np.sum(self, **kwargs) / len(self.val)
+        if func in _ufuncs.ARRAY_FUNCTIONS:
+            return self.__array_ufunc__(
+                _ufuncs.ARRAY_FUNCTIONS[func], "reduce", self, axis=kwargs.get("axis")
+            )
+        return NotImplemented
+
+
+@contextlib.contextmanager
+def lazy_derivatives():
+    """
+    Context manager deferring the local derivatives of the operations run inside it.
+
+    Operations normally compute the local derivative of their result with respect to every
+    operand when they run. Inside this block, an operation only keeps a function of the values
+    it needs, and the local derivative is computed in the backward sweep, for the edges on a
+    path from a seeded node to a node whose adjoint is requested. Results that are never
+    differentiated cost no derivative work or memory. A local derivative computed by the sweep
+    replaces the function, so it is computed once. Operations recorded on a tape and the fused
+    primitives, which get the derivative together with the value, compute it right away.
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([1., 2.]))
+    >>> with lazy_derivatives():
+    ...     f = x.sin() * 2
+    >>> callable(x.children[0][0])
+    True
+    >>> x.get_derivative()
+    array([ 1.08060461, -0.83229367])
+    >>> callable(x.children[0][0])
+    False
+    """
+    global _lazy
+    _lazy += 1
+    try:
+        yield
+    finally:
+        _lazy -= 1
+
+
+def _full(value, fill):
+    """
+    Compute a local derivative filled with one number, with the length and the floating point
+    precision of value.
+
+    EXAMPLES
+    --------
+    >>> _full(np.array([1, 2], dtype=np.float32), -1.0)
+    array([-1., -1.], dtype=float32)
+    >>> _full(np.array([1, 2]), 0.5)
+    array([0.5, 0.5])
+    """
+    return np.full(len(value), fill, _precision.floating([value.dtype]))
+
+
+def _partial_derivative(rule, value, values):
+    """
+    Compute the partial derivative of a ufunc result given by a rule of lahg_ad.ufuncs,
+    broadcast to the shape of the result.
+
+    EXAMPLES
+    --------
+    >>> rule = _ufuncs.DERIVATIVES[np.multiply][0]
+    >>> _partial_derivative(rule, np.array([3., 6.]), (np.array([1., 2.]), 3.))
+    array([3., 3.])
+    """
+    der = _ufuncs.partial_derivative(rule, value, *values)
+    return np.broadcast_to(der, value.shape)
+
+
+def _record(op, value, *edges, const=np.nan):
+    """
+    Create the RD object holding the result of an operation and link it to its operands.
+
+    Without a tape, the result and its local derivative are appended to the children of every
+    operand. When a graph is active, the result belongs to it, and operands that do not belong
+    to an open graph are handed over to it first. When a tape is active, or an operand already
+    lives on a tape, the operation is appended to that tape instead and the result does not keep
+    a children list. Operands that do not require gradients get no edge, and when no operand
+    requires gradients, nothing is recorded and the result does not require gradients either.
+
+    INPUTS
+    ------
+    op : str
+        name of the operation, one of lahg_ad.tape.OPS
+    value : numpy array
+        value of the result
+    edges : tuples of (RD object, numpy array or function)
+        every operand with the local derivative of the result with respect to it, or a
+        function without arguments computing it. Functions are called right away unless
+        lazy_derivatives is active.
+    const : int or float, optional
+        scalar constant operand of the operation
+
+    RETURNS
+    -------
+    child : RD object
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([1., 2.]))
+    >>> f = _record("mul", x.val * 3, (x, np.array([3., 3.])), const=3)
+    >>> x.get_derivative()
+    array([3., 3.])
+    """
+    child = RD._make(value)
+    if not all(parent.requires_grad for parent, _ in edges):
+        edges = [edge for edge in edges if edge[0].requires_grad]
+        if not edges:
+            child.requires_grad = False
+            return child
+    tape = _tape.active()
+    if tape is None:
+        for parent, _ in edges:
+            if parent.tape is not None:
+                tape = parent.tape
+                break
+    if tape is None:
+        graph = _graph.active()
+        if graph is not None:
+            for parent, _ in edges:
+                if not _graph.is_open(parent.arena):
+                    graph.own(parent)
+            child.arena = graph.key
+            graph.n_nodes += 1
+        for parent, der in edges:
+            if not _lazy and callable(der):
+                der = der()
+            parent.children.append((der, child))
+        # built from a list, a tuple built from a generator is resized and fills the free
+        # lists of small tuples of the interpreter
+        child.stamp.parents = tuple([parent.stamp for parent, _ in edges])
+        _invalidate(child.stamp.parents)
         return child
 
+    for parent, _ in edges:
+        if parent.tape is not tape:
+            parent.tape = tape
+            parent.index = tape.record("leaf", len(parent.val))
+            parent.grad = None
+    child.tape = tape
+    child.children = None
+    child.grad = None
+    child.index = tape.record(
+        op,
+        len(value),
+        [(parent.index, der() if callable(der) else der) for parent, der in edges],
+        const,
+    )
+    return child
+
+
+def backward(output, cotangent, inputs):
+    """
+    Function to compute the vector-Jacobian product of one output with respect to some inputs.
+    The cotangent is pushed backward from the output only, so other results built from the
+    inputs do not contribute, and the adjoints of all inputs are computed in one sweep.
+    A matrix of cotangents, one per row, is propagated in the same sweep.
+    The derivatives stored on the RD objects are not modified.
+
+    INPUTS
+    ------
+    output : RD object
+        the node the cotangent is seeded at
+    cotangent : numpy array or None
+        cotangent of the output, with the same length as the output, or a 2-D array with
+        one cotangent per row. None seeds ones.
+    inputs : list of RD objects
+        the nodes to compute the adjoints of
+
+    RAISES
+    ------
+    Exception
+        if the cotangent and the output have different lengths
+
+    RETURNS
+    -------
+    list of numpy arrays
+        the adjoint of every input, zeros for the inputs the output does not depend on.
+        For a 2-D cotangent, every adjoint has one row per cotangent.
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([1., 2.]))
+    >>> y = RD(np.array([3., 4.]))
+    >>> f = x * y
+    >>> g = x.sin()
+    >>> backward(f, np.array([1., 10.]), [x, y])
+    [array([ 3., 40.]), array([ 1., 20.])]
+    >>> backward(f, np.array([[1., 0.], [1., 1.]]), [x])
+    [array([[3., 0.],
+           [3., 4.]])]
+    """
+    if cotangent is None:
+        cotangent = np.ones(len(output.val))
+    cotangent = np.asarray(cotangent, dtype=float)
+    if cotangent.ndim not in (1, 2) or cotangent.shape[-1] != len(output.val):
+        raise Exception("The cotangent must have the same length as the output!")
+    return _vjp([(output, cotangent)], inputs)
+
+
+def jacobian(outputs, inputs):
+    """
+    Function to compute the Jacobian matrix of some outputs with respect to some inputs.
+    The graph is recorded once and all rows of the Jacobian are propagated in one sweep.
+
+    INPUTS
+    ------
+    outputs : RD object or list of RD objects
+    inputs : RD object or list of RD objects
+
+    RETURNS
+    -------
+    numpy array
+        a 2-D numpy array with one row per element of the outputs and one column per element
+        of the inputs
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([1.]))
+    >>> y = RD(np.array([2.]))
+    >>> jacobian([x * y, x + y, y ** 2], [x, y])
+    array([[2., 1.],
+           [1., 1.],
+           [0., 4.]])
+    """
+    if isinstance(outputs, RD):
+        outputs = [outputs]
+    if isinstance(inputs, RD):
+        inputs = [inputs]
+    rows = sum(len(f.val) for f in outputs)
+    seeds = []
+    start = 0
+    for f in outputs:
+        cotangent = np.zeros((rows, len(f.val)))
+        cotangent[start : start + len(f.val)] = np.eye(len(f.val))
+        seeds.append((f, cotangent))
+        start += len(f.val)
+    return np.concatenate(_vjp(seeds, inputs), axis=1)
+
+
+def _vjp(seeds, inputs):
+    """
+    Push the cotangents of some outputs backward to some inputs in one sweep.
+
+    INPUTS
+    ------
+    seeds : list of (RD object, numpy array)
+        every output with its cotangent, all cotangents have the same number of dimensions
+    inputs : list of RD objects
+
+    RAISES
+    ------
+    Exception
+        if some outputs are recorded on a tape and others are not
+
+    RETURNS
+    -------
+    list of numpy arrays
+        the adjoint of every input
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([1., 2.]))
+    >>> f = x * x
+    >>> _vjp([(f, np.ones(2)), (x, np.ones(2))], [x])
+    [array([3., 5.])]
+    """
+    batch = seeds[0][1].shape[:-1]
+
+    def zeros(x):
+        return np.zeros(batch + (len(x.val),))
+
+    tape = seeds[0][0].tape
+    if any(output.tape is not tape for output, _ in seeds):
+        raise Exception("All outputs must be recorded on the same tape!")
+    if tape is not None:
+        adjoint, offsets = tape.vjp(
+            {output.index: cotangent for output, cotangent in seeds}
+        )
+        n = len(offsets) - 1
+        return [
+            adjoint[..., offsets[x.index] : offsets[x.index + 1]].copy()
+            if x.tape is tape and x.index < n
+            else zeros(x)
+            for x in inputs
+        ]
+
+    stop = seeds[0][0] if len(seeds) == 1 else None
+    order = _topological_order(inputs, cached=False, stop=stop)
+    adjoints = _accumulate(
+        order, {id(output): cotangent for output, cotangent in seeds}
+    )
+    result = []
+    for x in inputs:
+        adjoint = adjoints.get(id(x))
+        result.append(zeros(x) if adjoint is None else adjoint.copy())
+    return result
+
+
+def _is_cached(node):
+    """
+    Check if the derivative cached on a node is up to date with the graph.
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([1., 2.]))
+    >>> _is_cached(x)
+    True
+    >>> y = x.sin()
+    >>> _is_cached(x), _is_cached(y)
+    (False, False)
+    """
+    stamp = node.stamp
+    return node.grad is not None and stamp.changed <= stamp.computed
+
+
+def _invalidate(stamps, upstream=False):
+    """
+    Mark the derivatives cached on the operands of a new operation, and upstream of them, as
+    stale.
+
+    The operands only got a new child, so their cached derivative stays a partial sum of their
+    first children. The derivatives of the nodes upstream of them change as a whole and are
+    computed again from all of their children. The walk stops at stamps that are already
+    stale, since everything upstream of those was marked when they were, so recording an
+    operation costs O(1) amortized over the derivatives that are computed.
+
+    INPUTS
+    ------
+    stamps : iterable of _Stamp
+        stamps of the operands
+    upstream : bool, optional
+        if True, the children the operands had changed, not only grew
+
+    RETURNS
+    -------
+    None
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([1., 2.]))
+    >>> y = x.sin()
+    >>> f = y * 2
+    >>> x.get_derivative()
+    array([ 1.08060461, -0.83229367])
+    >>> g = y * 3
+    >>> x.get_derivative()
+    array([ 2.70151153, -2.08073418])
+    """
+    global _version
+    _version += 1
+    stack = []
+    for stamp in stamps:
+        if upstream:
+            stamp.n_children = 0
+        if stamp.changed <= stamp.computed:
+            stamp.changed = _version
+            stack.extend(stamp.parents)
+    while stack:
+        stamp = stack.pop()
+        stale = stamp.changed > stamp.computed
+        stamp.n_children = 0
+        if not stale:
+            stamp.changed = _version
+            stack.extend(stamp.parents)
+
+
+def _topological_order(roots, cached=True, stop=None):
+    """
+    Collect the nodes reachable from the roots.
+
+    The graph is walked with an explicit stack instead of recursion, so the length of
+    the graph is not bounded by the interpreter recursion limit. Every node appears in
+    the returned list after all of its children, i.e. in reverse topological order.
+
+    INPUTS
+    ------
+    roots : RD object or list of RD objects
+    cached : bool, optional
+        if True, nodes whose derivative is cached and up to date are not collected
+    stop : RD object, optional
+        node whose children are not walked
+
+    RETURNS
+    -------
+    order : list of RD objects
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([1, 2]))
+    >>> y = x.sin()
+    >>> f = y.cos()
+    >>> f.get_derivative()
+    array([1., 1.])
+    >>> _topological_order(x) == [y, x]
+    True
+    >>> _topological_order(x, cached=False) == [f, y, x]
+    True
+    """
+    if isinstance(roots, RD):
+        roots = [roots]
+
+    def first(node):
+        if node is stop:
+            return len(node.children)
+        # the children summed in a cached partial derivative are all up to date
+        return node.stamp.n_children if cached and node.grad is not None else 0
+
+    order = []
+    visited = set()
+    # the nodes being walked and the position of the next child to visit in each
+    stack = []
+    positions = []
+    for root in roots:
+        if id(root) in visited:
+            continue
+        visited.add(id(root))
+        stack.append(root)
+        positions.append(first(root))
+        while stack:
+            children = stack[-1].children
+            k = positions[-1]
+            while k < len(children):
+                child = children[k][1]
+                k += 1
+                if id(child) in visited or (cached and _is_cached(child)):
+                    continue
+                visited.add(id(child))
+                positions[-1] = k
+                stack.append(child)
+                positions.append(first(child))
+                break
+            else:
+                positions.pop()
+                order.append(stack.pop())
+    return order
+
+
+def _accumulate(order, seeds, cached=False):
+    """
+    Accumulate the adjoints of the nodes in order, children first.
+
+    All adjoints are views into one preallocated buffer, and every edge is accumulated
+    in place, so the sweep runs in O(nodes + edges). Nodes that do not lead to a seeded
+    node get no adjoint and their edges are skipped. Deferred local derivatives are computed
+    when their edge is accumulated and stored in place of their function.
+
+    INPUTS
+    ------
+    order : list of RD objects in reverse topological order
+    seeds : dict
+        maps the id of a node to the adjoint it is seeded with. A 2-D seed with one row
+        per cotangent makes every adjoint 2-D.
+    cached : bool, optional
+        if True, children outside of order contribute their cached derivative, and nodes in
+        order resume from their cached derivative when only new children were appended since
+        it was computed
+
+    RETURNS
+    -------
+    adjoints : dict
+        maps the id of every node in order to its adjoint, or to None
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([1., 2.]))
+    >>> f = x * x
+    >>> adjoints = _accumulate([f, x], {id(f): np.ones(2)})
+    >>> adjoints[id(x)]
+    array([2., 4.])
+    """
+    batch = np.shape(next(iter(seeds.values()), 0))[:-1]
+    sizes = [len(node.val) for node in order]
+    offsets = np.cumsum([0] + sizes).tolist()
+    dtype = _precision.floating(node.val.dtype for node in order)
+    buffer = np.zeros(batch + (offsets[-1],), dtype)
+    scratch = np.empty(batch + (max(sizes, default=0),), dtype)
+    adjoints = {}
+    for node, start, size in zip(order, offsets, sizes):
+        adjoint = None
+        seed = seeds.get(id(node))
+        if seed is not None:
+            adjoint = buffer[..., start : start + size]
+            adjoint += seed
+        children = node.children
+        first = node.stamp.n_children if cached and node.grad is not None else 0
+        if first:
+            adjoint = buffer[..., start : start + size]
+            adjoint += node.grad
+        for k in range(first, len(children)):
+            der, child = children[k]
+            child_adjoint = adjoints.get(id(child))
+            if child_adjoint is None:
+                if not cached:
+                    continue
+                child_adjoint = child.grad
+            if callable(der):
+                der = der()
+                children[k] = (der, child)
+            if adjoint is None:
+                adjoint = buffer[..., start : start + size]
+            if child_adjoint.shape[-1] > size:
+                # the node was broadcast against a longer operand
+                adjoint += (der * child_adjoint).sum(axis=-1, keepdims=True)
+                continue
+            np.multiply(der, child_adjoint, out=scratch[..., :size])
+            adjoint += scratch[..., :size]
+        adjoints[id(node)] = adjoint
+    return adjoints
+
+
+def _backward(order):
+    """
+    Store the derivative of the sum of all results without children on every node in order,
+    stamped with the current version of the graph. The derivatives are copied out of the adjoint
+    buffer of the sweep, so a derivative that is kept does not keep the buffer of the whole graph.
+
+    INPUTS
+    ------
+    order : list of RD objects in reverse topological order
+
+    RETURNS
+    -------
+    None
+
+    EXAMPLES
+    --------
+    >>> x = RD(np.array([1., 2.]))
+    >>> f = x * x
+    >>> _backward(_topological_order(x))
+    >>> x.grad
+    array([2., 4.])
+    """
+    seeds = {id(node): 1.0 for node in order if not node.children}
+    adjoints = _accumulate(order, seeds, cached=True)
+    for node in order:
+        node.grad = adjoints[id(node)].copy()
+        node.stamp.computed = _version
+        node.stamp.n_children = len(node.children)
+
 
 if __name__ == "__main__":
     import doctest
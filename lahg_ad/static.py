@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the StaticGraph class, a reverse mode graph frozen after its first build.
+When the structure of the graph is the same at every iteration and only the values of the leaves
+change, building the RD graph and ordering it again at every iteration is repeated work.
+A StaticGraph traces the function once, keeps the topological order of the operations as a list
+of prepared ufunc calls and keeps one buffer per value and per adjoint. Every evaluation writes
+the new leaf values into their buffers and runs the forward and backward schedules in place.
+"""
+
+from functools import partial
+
+import numpy as np
+
+from . import precision as _precision
+from . import ufuncs as _ufuncs
+from .fd import Variable
+from .rd import RD
+from .tracing import PRIMITIVES, REDUCTIONS, trace
+
+
+def _add_to(target, shape):
+    """
+    Function to build a step adding a contribution of the given shape into a target buffer,
+    summing the broadcast axes of the contribution first.
+    """
+    if shape == target.shape:
+        return lambda contribution: np.add(target, contribution, out=target)
+    lead = len(shape) - target.ndim
+    axes = tuple(range(lead)) + tuple(
+        lead + i for i, n in enumerate(target.shape) if n == 1 and shape[lead + i] != 1
+    )
+    return lambda contribution: np.add(
+        target, np.sum(contribution, axis=axes).reshape(target.shape), out=target
+    )
+
+
+class StaticGraph:
+    """
+    This is the StaticGraph class, the frozen reverse mode graph of a function of RD objects or
+    arrays. The function is traced once on the sample inputs, so it must apply the same
+    operations to inputs of the same shapes, as for trace. Calling the graph with new input
+    values re-executes the recorded operations in their topological order into the value
+    buffers, and accumulates the adjoints into one preallocated adjoint buffer, without creating
+    RD objects, children lists or local derivative functions.
+
+    The values and adjoints returned by a call are copies, the buffers are reused by the next
+    call.
+
+    EXAMPLES
+    ========
+    >>> def model(x, y):
+    ...     return np.sum((x * y).sin() + x.exp())
+    >>> graph = StaticGraph(model, RD(np.array([1.0, 2.0])), np.ones(2))
+    >>> value, (dx, dy) = graph(np.array([0.5, 1.0]), np.array([2.0, 3.0]))
+    >>> print(value)
+    5.349594092026937
+    >>> dx
+    array([ 2.72932588, -0.25169566])
+    >>> x, y = RD(np.array([0.5, 1.0])), RD(np.array([2.0, 3.0]))
+    >>> f = np.sum((x * y).sin() + x.exp())
+    >>> x.get_derivative()
+    array([ 2.72932588, -0.25169566])
+    """
+
+    def __init__(self, function, *inputs):
+        """
+        StaticGraph class constructor
+
+        INPUTS
+        ------
+        function : callable
+            function of RD objects returning one RD object or a list of RD objects
+        inputs : RD objects or numpy arrays
+            sample values of the inputs
+
+        RAISES
+        ------
+        Exception
+            if an output is a RD object that is not computed from the inputs
+        """
+        samples = []
+        for x in inputs:
+            value = np.asarray(x.val if isinstance(x, RD) else x)
+            samples.append(np.array(value, _precision.floating([value.dtype])))
+        self.program = trace(
+            function,
+            *[Variable._make(value, np.zeros_like(value)) for value in samples]
+        )
+        program = self.program
+        nodes = program.nodes
+        for index in program.outputs:
+            if isinstance(program.values[index], RD):
+                raise Exception("The outputs must be computed from the inputs")
+
+        # one buffer per value, constants keep their value
+        self.values = [
+            value if node.op == "const" else np.array(value)
+            for node, value in zip(nodes, program.values)
+        ]
+        # one flat buffer holding the adjoints of all nodes that are not constants
+        variables = [i for i, node in enumerate(nodes) if node.op != "const"]
+        dtype = _precision.floating(self.values[i].dtype for i in variables)
+        sizes = [self.values[i].size for i in variables]
+        self.buffer = np.zeros(sum(sizes), dtype)
+        self.adjoints = [None] * len(nodes)
+        start = 0
+        for index, size in zip(variables, sizes):
+            view = self.buffer[start : start + size]
+            self.adjoints[index] = view.reshape(self.values[index].shape)
+            start += size
+        self.seeds = [
+            np.ones(self.values[index].shape, dtype) for index in program.outputs
+        ]
+        # scratch buffers for the products of local derivatives and adjoints, by shape
+        self._scratch = {}
+        self._forward = []
+        self._backward = []
+        for index in variables:
+            if nodes[index].op != "input":
+                self._forward.append(self._forward_step(index))
+        for index in reversed(variables):
+            if nodes[index].op != "input":
+                self._backward += self._backward_steps(index)
+
+    def _scratch_buffer(self, shape):
+        if shape not in self._scratch:
+            self._scratch[shape] = np.empty(shape, self.buffer.dtype)
+        return self._scratch[shape]
+
+    def _forward_step(self, index):
+        """
+        Method to prepare the call computing the value of a node into its buffer.
+        """
+        node = self.program.nodes[index]
+        operands = [self.values[arg] for arg in node.args]
+        out = self.values[index]
+        if node.op in REDUCTIONS:
+            return partial(
+                REDUCTIONS[node.op].reduce, operands[0], axis=node.params[0], out=out
+            )
+        ufunc = getattr(np, node.op, None)
+        if isinstance(ufunc, np.ufunc):
+            return partial(ufunc, *operands, out=out)
+        forward = PRIMITIVES[node.op][0]
+        return lambda: np.copyto(out, forward(*operands))
+
+    def _backward_steps(self, index):
+        """
+        Method to prepare the calls adding the contributions of the adjoint of a node to the
+        adjoints of its operands.
+        """
+        nodes = self.program.nodes
+        node = nodes[index]
+        adjoint = self.adjoints[index]
+        out = self.values[index]
+        operands = [self.values[arg] for arg in node.args]
+        steps = []
+        if node.op in REDUCTIONS:
+            (arg,), (axis,) = node.args, node.params
+            expanded = adjoint if axis is None else np.expand_dims(adjoint, axis)
+            add = _add_to(self.adjoints[arg], operands[0].shape)
+            if REDUCTIONS[node.op] is np.add:
+                return [partial(add, expanded)]
+            rule = _ufuncs.REDUCTIONS[REDUCTIONS[node.op]]
+            scratch = self._scratch_buffer(operands[0].shape)
+
+            def step():
+                np.multiply(rule(operands[0], axis), expanded, out=scratch)
+                add(scratch)
+
+            return [step]
+        scratch = self._scratch_buffer(out.shape)
+        for arg, rule in zip(node.args, PRIMITIVES[node.op][1]):
+            if nodes[arg].op == "const":
+                continue
+            add = _add_to(self.adjoints[arg], out.shape)
+            if not callable(rule) and rule == 1:
+                steps.append(partial(add, adjoint))
+            elif not callable(rule):
+
+                def step(rule=rule, add=add):
+                    np.multiply(adjoint, rule, out=scratch)
+                    add(scratch)
+
+                steps.append(step)
+            else:
+
+                def step(rule=rule, add=add):
+                    local = _ufuncs.partial_derivative(rule, out, *operands)
+                    np.multiply(local, adjoint, out=scratch)
+                    add(scratch)
+
+                steps.append(step)
+        return steps
+
+    def __call__(self, *inputs, cotangents=None):
+        """
+        Method to evaluate the function and the gradient of its outputs at new inputs.
+
+        INPUTS
+        ------
+        inputs : RD objects or numpy arrays
+            one per traced input, with the shapes of the traced inputs
+        cotangents : numpy array or list of numpy arrays, optional
+            cotangent of the output, one per output if the function returned several. The
+            default is ones, the gradient of the sum of the outputs as for get_derivative.
+
+        RETURNS
+        -------
+        outputs : numpy array, or a tuple of numpy arrays if the function returned several
+        gradients : list of numpy arrays, the adjoint of every input
+
+        RAISES
+        ------
+        Exception
+            if the number of inputs is not the number of traced inputs
+            if an input does not have the shape of the traced input
+
+        EXAMPLES
+        --------
+        >>> graph = StaticGraph(lambda x: x * x, np.array([1.0, 2.0]))
+        >>> graph(np.array([3.0, 4.0]), cotangents=np.array([1.0, 0.0]))
+        (array([ 9., 16.]), [array([6., 0.])])
+        """
+        program = self.program
+        if len(inputs) != len(program.inputs):
+            raise Exception("The graph takes {} inputs".format(len(program.inputs)))
+        for index, x in zip(program.inputs, inputs):
+            value = x.val if isinstance(x, RD) else x
+            if np.shape(value) != self.values[index].shape:
+                raise Exception("The inputs must have the shapes of the traced inputs")
+            np.copyto(self.values[index], value)
+        for step in self._forward:
+            step()
+
+        if cotangents is None:
+            cotangents = self.seeds
+        elif program.single:
+            cotangents = [cotangents]
+        self.buffer.fill(0)
+        for index, cotangent in zip(program.outputs, cotangents):
+            if program.nodes[index].op != "const":
+                self.adjoints[index] += cotangent
+        for step in self._backward:
+            step()
+
+        outputs = tuple(np.copy(self.values[index]) for index in program.outputs)
+        gradients = [self.adjoints[index].copy() for index in program.inputs]
+        return (outputs[0] if program.single else outputs), gradients
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the Tape class, an array-backed record (Wengert list) of reverse mode operations.
+While a tape is active, RD operations append one record to the tape instead of storing their
+children on every operand, and the backward sweep runs over the record.
+"""
+
+import numpy as np
+
+from . import precision as _precision
+
+# Operation codes stored in the tape, the position in the tuple is the code
+OPS = (
+    "leaf",
+    "sin",
+    "cos",
+    "tan",
+    "add",
+    "sub",
+    "rsub",
+    "mul",
+    "truediv",
+    "neg",
+    "pow",
+    "rpow",
+    "log",
+    "exp",
+    "arcsin",
+    "arccos",
+    "arctan",
+    "sinh",
+    "cosh",
+    "tanh",
+    "logistic",
+    "add.reduce",
+    "maximum.reduce",
+    "minimum.reduce",
+    "subtract",
+    "multiply",
+    "divide",
+    "power",
+    "negative",
+    "positive",
+    "absolute",
+    "square",
+    "sqrt",
+    "cbrt",
+    "reciprocal",
+    "exp2",
+    "expm1",
+    "log2",
+    "log10",
+    "log1p",
+    "arcsinh",
+    "arccosh",
+    "arctanh",
+    "hypot",
+    "arctan2",
+    "maximum",
+    "minimum",
+    "logaddexp",
+    "softplus",
+    "logsumexp",
+    "sigmoid_cross_entropy",
+)
+CODES = {op: code for code, op in enumerate(OPS)}
+
+# Stack of the tapes entered with a with statement, the last one is recording
+_stack = []
+
+
+def active():
+    """
+    Function to get the tape that is currently recording.
+
+    RETURNS
+    -------
+    Tape object or None if no tape is active
+
+    EXAMPLES
+    --------
+    >>> active() is None
+    True
+    >>> with Tape() as tape:
+    ...     active() is tape
+    True
+    """
+    return _stack[-1] if _stack else None
+
+
+class Tape:
+    """
+    This is the Tape class that records reverse mode operations in contiguous arrays.
+    Every node of the graph is a record holding its operation code, the indices of up to two
+    parents, the offsets of the local derivatives in a flat derivative buffer and an optional
+    scalar constant operand.
+
+    EXAMPLES
+    ========
+    >>> import numpy as np
+    >>> from lahg_ad import RD
+    >>> with Tape() as tape:
+    ...     x = RD(np.array([1.0, 2.0]))
+    ...     f = x * x + x.sin()
+    >>> x.get_derivative()
+    array([2.54030231, 3.58385316])
+    >>> len(tape)
+    4
+    """
+
+    def __init__(self, capacity=1024, dtype=None):
+        """
+        Tape class constructor
+
+        INPUTS
+        ------
+        capacity : int, optional
+            Number of records allocated up front. The arrays grow geometrically when full.
+        dtype : numpy floating point dtype, optional
+            dtype of the local derivatives and adjoints. The default is the dtype of the active
+            Precision scope, or float64.
+
+        EXAMPLES
+        --------
+        >>> tape = Tape()
+        >>> len(tape)
+        0
+        >>> Tape(dtype=np.float32).derivatives.dtype
+        dtype('float32')
+        """
+        self.n_nodes = 0
+        self.n_der = 0
+        self.ops = np.zeros(capacity, dtype=np.int8)
+        self.sizes = np.zeros(capacity, dtype=np.int64)
+        self.parents = np.full((capacity, 2), -1, dtype=np.int64)
+        self.der_offsets = np.zeros((capacity, 2), dtype=np.int64)
+        self.consts = np.full(capacity, np.nan)
+        self.dtype = _precision.resolve(dtype) or np.dtype(float)
+        self.derivatives = np.zeros(capacity, self.dtype)
+        self._adjoint = None
+        self._offsets = None
+        self._adjoint_nodes = -1
+
+    def __enter__(self):
+        _stack.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _stack.remove(self)
+        return False
+
+    def __len__(self):
+        return self.n_nodes
+
+    def _grow(self, n_nodes, n_der):
+        """
+        Method to enlarge the record arrays so that they hold n_nodes records and n_der derivatives.
+        """
+        capacity = len(self.ops)
+        if n_nodes > capacity:
+            capacity = max(n_nodes, 2 * capacity)
+            self.ops = np.resize(self.ops, capacity)
+            self.sizes = np.resize(self.sizes, capacity)
+            self.consts = np.resize(self.consts, capacity)
+            parents = np.full((capacity, 2), -1, dtype=np.int64)
+            parents[: self.n_nodes] = self.parents[: self.n_nodes]
+            self.parents = parents
+            self.der_offsets = np.resize(self.der_offsets, (capacity, 2))
+        if n_der > len(self.derivatives):
+            self.derivatives = np.resize(
+                self.derivatives, max(n_der, 2 * len(self.derivatives))
+            )
+
+    def record(self, op, size, edges=(), const=np.nan):
+        """
+        Method to append one operation to the tape.
+
+        INPUTS
+        ------
+        op : str
+            name of the operation, one of OPS
+        size : int
+            number of elements of the result
+        edges : list of (int, numpy array)
+            index of every parent and the local derivative of the result with respect to it
+        const : float, optional
+            scalar constant operand of the operation
+
+        RETURNS
+        -------
+        index : int
+            index of the new record
+
+        EXAMPLES
+        --------
+        >>> tape = Tape()
+        >>> x = tape.record("leaf", 2)
+        >>> tape.record("mul", 2, [(x, np.array([3.0, 3.0]))], 3.0)
+        1
+        >>> tape.gradient(x)
+        array([3., 3.])
+        """
+        index = self.n_nodes
+        start = self.n_der
+        length = sum(max(size, self.sizes[parent]) for parent, _ in edges)
+        self._grow(index + 1, start + length)
+        self.ops[index] = CODES[op]
+        self.sizes[index] = size
+        self.consts[index] = const
+        for slot, (parent, der) in enumerate(edges):
+            length = max(size, self.sizes[parent])
+            self.derivatives[start : start + length] = der
+            self.parents[index, slot] = parent
+            self.der_offsets[index, slot] = start
+            start += length
+        self.n_der = start
+        self.n_nodes = index + 1
+        return index
+
+    def _sweep(self, adjoint, offsets, n):
+        """
+        Method to propagate adjoints from record n - 1 to the first record, in place.
+
+        INPUTS
+        ------
+        adjoint : numpy array
+            seeded adjoints of the nodes, laid out according to offsets
+        offsets : list of int
+            start of the adjoint of every node, followed by the total size
+        n : int
+            number of records to sweep
+
+        RETURNS
+        -------
+        None
+        """
+        scalar = adjoint.ndim == 1 and (self.sizes[:n] == 1).all()
+        parents = self.parents[:n].tolist()
+        der_offsets = self.der_offsets[:n].tolist()
+        sizes = self.sizes[:n].tolist()
+        if scalar:
+            # every node is a scalar, accumulate in Python floats instead of array slices
+            adj = adjoint.tolist()
+            ders = self.derivatives[: self.n_der].tolist()
+            for i in range(n - 1, -1, -1):
+                a = adj[i]
+                if a == 0:
+                    continue
+                p0, p1 = parents[i]
+                if p0 >= 0:
+                    d0, d1 = der_offsets[i]
+                    adj[p0] += ders[d0] * a
+                    if p1 >= 0:
+                        adj[p1] += ders[d1] * a
+            adjoint[:] = adj
+            return
+        ders = self.derivatives
+        for i in range(n - 1, -1, -1):
+            p0, p1 = parents[i]
+            if p0 < 0:
+                continue
+            a = adjoint[..., offsets[i] : offsets[i + 1]]
+            for parent, start in zip((p0, p1), der_offsets[i]):
+                if parent < 0:
+                    break
+                length = max(sizes[i], sizes[parent])
+                contribution = ders[start : start + length] * a
+                if sizes[parent] < length:
+                    contribution = contribution.sum(axis=-1, keepdims=True)
+                adjoint[..., offsets[parent] : offsets[parent + 1]] += contribution
+
+    def gradient(self, index):
+        """
+        Method to get the derivative of the sum of all results that are not used by another
+        operation (the sinks of the graph) with respect to a node.
+        The adjoints of all nodes are computed in one sweep and cached until the next record.
+
+        INPUTS
+        ------
+        index : int
+            index of the node
+
+        RETURNS
+        -------
+        numpy array
+
+        EXAMPLES
+        --------
+        >>> tape = Tape()
+        >>> x = tape.record("leaf", 1)
+        >>> y = tape.record("sin", 1, [(x, np.cos([2.0]))])
+        >>> tape.gradient(x)
+        array([-0.41614684])
+        >>> tape.gradient(y)
+        array([1.])
+        """
+        n = self.n_nodes
+        if self._adjoint_nodes != n:
+            sizes = self.sizes[:n]
+            parents = self.parents[:n]
+            sink = np.ones(n, dtype=bool)
+            sink[parents[parents >= 0]] = False
+            offsets = np.concatenate(([0], np.cumsum(sizes))).tolist()
+            self._adjoint = np.repeat(sink.astype(self.dtype), sizes)
+            self._offsets = offsets
+            self._sweep(self._adjoint, offsets, n)
+            self._adjoint_nodes = n
+        return self._adjoint[self._offsets[index] : self._offsets[index + 1]]
+
+    def vjp(self, seeds):
+        """
+        Method to push cotangents backward from some nodes only.
+
+        INPUTS
+        ------
+        seeds : dict
+            maps the index of a node to its cotangent. A cotangent is a vector with the size
+            of the node, or a matrix with one row per cotangent. All cotangents must have the
+            same number of rows.
+
+        RETURNS
+        -------
+        adjoint : numpy array
+            adjoints of the records up to the last seeded one, along the last axis
+        offsets : list of int
+            start of the adjoint of every record in adjoint
+
+        EXAMPLES
+        --------
+        >>> tape = Tape()
+        >>> x = tape.record("leaf", 2)
+        >>> y = tape.record("mul", 2, [(x, np.array([3.0, 3.0]))], 3.0)
+        >>> z = tape.record("sin", 2, [(y, np.array([0.5, 0.5]))])
+        >>> adjoint, offsets = tape.vjp({y: np.array([1.0, 2.0])})
+        >>> adjoint[offsets[x] : offsets[x + 1]]
+        array([3., 6.])
+        >>> adjoint, offsets = tape.vjp({y: np.eye(2), z: np.zeros((2, 2))})
+        >>> adjoint[:, offsets[x] : offsets[x + 1]]
+        array([[3., 0.],
+               [0., 3.]])
+        """
+        n = max(seeds) + 1
+        offsets = np.concatenate(([0], np.cumsum(self.sizes[:n]))).tolist()
+        batch = np.shape(next(iter(seeds.values())))[:-1]
+        adjoint = np.zeros(batch + (offsets[-1],), self.dtype)
+        for index, cotangent in seeds.items():
+            adjoint[..., offsets[index] : offsets[index + 1]] += cotangent
+        self._sweep(adjoint, offsets, n)
+        return adjoint, offsets
+
+    def nbytes(self):
+        """
+        Method to get the memory used by the tape arrays in bytes.
+
+        RETURNS
+        -------
+        int
+
+        EXAMPLES
+        --------
+        >>> Tape(capacity=10).nbytes()
+        570
+        """
+        return sum(
+            array.nbytes
+            for array in (
+                self.ops,
+                self.sizes,
+                self.parents,
+                self.der_offsets,
+                self.consts,
+                self.derivatives,
+            )
+        )
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the trace function, which records the operations a function performs on
+Variable objects once and returns a Program that replays them on new inputs.
+The replay evaluates the values and tangents with precompiled numpy kernels, without creating
+intermediate Variable objects or dispatching the overloaded operators.
+"""
+
+import operator
+from collections import namedtuple
+
+import numpy as np
+
+from . import ufuncs as _ufuncs
+from .fd import Variable
+
+# One recorded operation: op is a key of PRIMITIVES, "input", "const" or "<ufunc>.reduce",
+# args are the indices of the operand nodes and params holds the other arguments
+Node = namedtuple("Node", ["op", "args", "params"])
+
+
+def _logistic(x):
+    return 1 / (1 + np.exp(-x))
+
+
+# Numpy source of every primitive: the forward expression of the inputs x and y, and the
+# partial derivative rules of lahg_ad.ufuncs
+SOURCES = {
+    ufunc.__name__: (
+        "np.{}({})".format(ufunc.__name__, "x, y" if ufunc.nin == 2 else "x"),
+        rules,
+    )
+    for ufunc, rules in _ufuncs.RULES.items()
+}
+SOURCES["logistic"] = ("1 / (1 + np.exp(-x))", ("out * (1 - out)",))
+SOURCES["softplus"] = ("np.logaddexp(0.0, x)", ("np.exp(x - out)",))
+SOURCES["sigmoid_cross_entropy"] = (
+    "np.logaddexp(0.0, x) - x * y",
+    ("np.exp(x - out - x * y) - y", "-x"),
+)
+
+# The Python operators give the same results as these ufuncs and skip the ufunc machinery
+# on scalars
+_OPERATORS = {
+    "add": (operator.add, "x + y"),
+    "subtract": (operator.sub, "x - y"),
+    "multiply": (operator.mul, "x * y"),
+    "negative": (operator.neg, "-x"),
+    "positive": (operator.pos, "+x"),
+}
+for _name, (_, _expression) in _OPERATORS.items():
+    SOURCES[_name] = (_expression, SOURCES[_name][1])
+
+# Maps the name of a primitive to its forward function and its partial derivative rules,
+# which take the output followed by the inputs
+PRIMITIVES = {
+    ufunc.__name__: (ufunc, rules) for ufunc, rules in _ufuncs.DERIVATIVES.items()
+}
+for _name, (_operator, _) in _OPERATORS.items():
+    PRIMITIVES[_name] = (_operator, PRIMITIVES[_name][1])
+for _name, _nin in (("logistic", 1), ("softplus", 1), ("sigmoid_cross_entropy", 2)):
+    _expression, _rules = SOURCES[_name]
+    PRIMITIVES[_name] = (
+        eval(
+            "lambda {}: {}".format("x, y" if _nin == 2 else "x", _expression),
+            {"np": np},
+        ),
+        tuple(_ufuncs.compile_rule(rule, _nin) for rule in _rules),
+    )
+
+REDUCTIONS = {ufunc.__name__ + ".reduce": ufunc for ufunc in _ufuncs.REDUCTIONS}
+
+
+class Tracer(Variable):
+    """
+    This is the Tracer class, a Variable that records every operation applied to it in a Program.
+    All operators and elementary functions are evaluated through the numpy ufunc protocol, so
+    that one node is recorded per ufunc call.
+    """
+
+    __slots__ = ("program", "node")
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        result = super().__array_ufunc__(ufunc, method, *inputs, **kwargs)
+        if not isinstance(result, Tracer):
+            return result
+        program = self.program
+        args = []
+        for x in inputs:
+            if isinstance(x, Tracer):
+                if x.program is not program:
+                    raise Exception("Cannot combine Tracers of different traces")
+                args.append(x.node)
+            elif isinstance(x, Variable):
+                raise Exception(
+                    "Only the inputs of the traced function can be Variables"
+                )
+            else:
+                args.append(program.constant(x))
+        if method == "reduce":
+            op, params = ufunc.__name__ + ".reduce", (kwargs.get("axis", 0),)
+        else:
+            op, params = ufunc.__name__, ()
+        return program.record(op, args, params, result)
+
+    def __add__(self, other):
+        return np.add(self, other)
+
+    def __radd__(self, other):
+        return np.add(other, self)
+
+    def __sub__(self, other):
+        return np.subtract(self, other)
+
+    def __rsub__(self, other):
+        return np.subtract(other, self)
+
+    def __mul__(self, other):
+        return np.multiply(self, other)
+
+    def __rmul__(self, other):
+        return np.multiply(other, self)
+
+    def __truediv__(self, other):
+        return np.divide(self, other)
+
+    def __rtruediv__(self, other):
+        return np.divide(other, self)
+
+    def __pow__(self, other):
+        return np.power(self, other)
+
+    def __rpow__(self, other):
+        return np.power(other, self)
+
+    def __neg__(self):
+        return np.negative(self)
+
+    def sin(self):
+        return np.sin(self)
+
+    def cos(self):
+        return np.cos(self)
+
+    def tan(self):
+        return np.tan(self)
+
+    def arcsin(self):
+        return np.arcsin(self)
+
+    def arccos(self):
+        return np.arccos(self)
+
+    def arctan(self):
+        return np.arctan(self)
+
+    def sinh(self):
+        return np.sinh(self)
+
+    def cosh(self):
+        return np.cosh(self)
+
+    def tanh(self):
+        return np.tanh(self)
+
+    def sqrt(self):
+        return np.sqrt(self)
+
+    def exp(self, base=None):
+        if base is None:
+            return np.exp(self)
+        return np.power(base, self)
+
+    def log(self, base=10):
+        return np.log(self) / np.log(base)
+
+    def logistic(self):
+        value = _logistic(self.val)
+        local = value * (1 - value)
+        if getattr(local, "ndim", 0) and np.ndim(self.der) > np.ndim(self.val):
+            local = local[..., np.newaxis]
+        result = self._make(value, local * self.der)
+        return self.program.record("logistic", [self.node], (), result)
+
+    def softplus(self):
+        return self.program.record("softplus", [self.node], (), super().softplus())
+
+    def sigmoid_cross_entropy(self, labels):
+        result = super().sigmoid_cross_entropy(labels)
+        labels = np.asarray(labels, dtype=np.result_type(result.val))
+        args = [self.node, self.program.constant(labels)]
+        return self.program.record("sigmoid_cross_entropy", args, (), result)
+
+    def logaddexp(self, other):
+        return np.logaddexp(self, other)
+
+    def logsumexp(self):
+        # the shift is traced too, its derivative cancels out
+        shift = np.max(self, axis=None)
+        return np.log(np.sum(np.exp(self - shift), axis=None)) + shift
+
+
+class Program:
+    """
+    This is the Program class holding the operations recorded by trace.
+    Calling a Program with Variable objects of the same shapes as the traced inputs returns
+    the values and tangents of the traced function at these inputs.
+
+    EXAMPLES
+    ========
+    >>> import numpy as np
+    >>> program = trace(lambda x, y: x * y + x.sin(), Variable(1.0, 1.0), Variable(2.0, 0.0))
+    >>> print(program(Variable(np.pi, 1.0), Variable(3.0, 0.0)))
+    value = 9.42477796076938, derivative = 2.0
+    >>> len(program)
+    3
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.values = []
+        self.directions = []
+        self.inputs = []
+        self.outputs = []
+        self.single = True
+        self._steps = None
+
+    def __len__(self):
+        return sum(node.op not in ("input", "const") for node in self.nodes)
+
+    def _append(self, op, args, params, value, directions):
+        self.nodes.append(Node(op, tuple(args), params))
+        self.values.append(value)
+        self.directions.append(directions)
+        self._steps = None
+        return len(self.nodes) - 1
+
+    def constant(self, value):
+        """
+        Method to add a constant operand to the program.
+
+        RETURNS
+        -------
+        index of the constant node
+        """
+        return self._append("const", (), (value,), value, False)
+
+    def record(self, op, args, params, result):
+        """
+        Method to append an operation to the program and attach it to its result.
+
+        INPUTS
+        ------
+        op : str
+            name of the operation
+        args : list of int
+            indices of the operand nodes
+        params : tuple
+            other arguments of the operation
+        result : Tracer object
+            result of the operation on the traced sample inputs
+
+        RETURNS
+        -------
+        result, attached to the new node
+        """
+        directions = np.ndim(result.der) > np.ndim(result.val)
+        result.program = self
+        result.node = self._append(op, args, params, result.val, directions)
+        return result
+
+    def check(self, inputs, tangents=True):
+        """
+        Method to check that inputs can replace the traced inputs. The operations are compiled
+        for the traced shapes and for tangents with or without a direction axis, so other inputs
+        would give wrong derivatives or fail in an unrelated operation.
+
+        INPUTS
+        ------
+        inputs : list of Variable objects, or of values if tangents is False
+        tangents : bool, optional
+            whether to check the tangents of the inputs. The default is True.
+
+        RAISES
+        ------
+        Exception
+            if the number of inputs, the shape of a value or the rank of a tangent differs from
+            the trace
+        """
+        if len(inputs) != len(self.inputs):
+            raise Exception("The program takes {} inputs".format(len(self.inputs)))
+        for k, (index, x) in enumerate(zip(self.inputs, inputs)):
+            shape = np.shape(self.values[index])
+            if np.shape(x.val if isinstance(x, Variable) else x) != shape:
+                raise Exception(
+                    "Input {} must have the traced shape {}".format(k, shape)
+                )
+            if tangents and (np.ndim(x.der) > len(shape)) != self.directions[index]:
+                raise Exception(
+                    "The tangent of input {} must have {} dimensions".format(
+                        k,
+                        len(shape) + 1
+                        if self.directions[index]
+                        else "at most {}".format(len(shape)),
+                    )
+                )
+
+    def _compile(self):
+        """
+        Method to build one kernel per operation. A kernel reads the values and tangents of its
+        operands from two lists and writes the value and tangent of its node.
+        """
+        steps = []
+        for index, node in enumerate(self.nodes):
+            if node.op in ("input", "const"):
+                continue
+            directions = [self.directions[arg] for arg in node.args]
+            if node.op in REDUCTIONS:
+                ndim = np.ndim(self.values[node.args[0]])
+                steps.append(
+                    _reduce_kernel(
+                        REDUCTIONS[node.op],
+                        node.params[0],
+                        ndim,
+                        directions[0],
+                        node.args[0],
+                        index,
+                    )
+                )
+            else:
+                forward, rules = PRIMITIVES[node.op]
+                chains = [
+                    (arg, _chain(rule, expand))
+                    for arg, rule, expand in zip(node.args, rules, directions)
+                    if self.nodes[arg].op != "const"
+                ]
+                steps.append(_kernel(forward, node.args, chains, index))
+        return steps
+
+    def __call__(self, *inputs):
+        """
+        Method to evaluate the traced function and its derivative at new inputs.
+
+        INPUTS
+        ------
+        inputs : Variable objects
+            one per traced input, with the shapes of the traced inputs and tangents with a
+            direction axis if the traced tangents had one
+
+        RETURNS
+        -------
+        A Variable object, or a tuple of Variable objects if the traced function returned several
+
+        RAISES
+        ------
+        Exception
+            if the inputs do not match the traced inputs, see check
+        """
+        self.check(inputs)
+        if self._steps is None:
+            self._steps = self._compile()
+        values = list(self.values)
+        tangents = [None] * len(values)
+        for index, x in zip(self.inputs, inputs):
+            values[index] = x.val
+            tangents[index] = x.der
+        for step in self._steps:
+            step(values, tangents)
+        outputs = tuple(
+            Variable._make(
+                values[index], 0 if tangents[index] is None else tangents[index]
+            )
+            for index in self.outputs
+        )
+        return outputs[0] if self.single else outputs
+
+
+def _chain(rule, expand):
+    """
+    Function to build the product of a partial derivative rule with the tangent of its operand.
+    Constant rules of 1 and -1 return the tangent without multiplying it.
+    """
+    if not callable(rule):
+        if rule == 1:
+            return lambda out, operands, der: der
+        if rule == -1:
+            return lambda out, operands, der: -der
+        return lambda out, operands, der: rule * der
+    if expand:
+
+        def chain(out, operands, der):
+            local = rule(out, *operands)
+            if getattr(local, "ndim", 0):
+                # the tangent carries several directions along its last axis
+                local = local[..., np.newaxis]
+            return local * der
+
+        return chain
+    return lambda out, operands, der: rule(out, *operands) * der
+
+
+def _kernel(forward, args, chains, index):
+    """
+    Function to build the kernel of an elementwise operation, specialized on the number of
+    operands and on which of them carry a tangent.
+    """
+    if len(args) == 1:
+        ((arg, chain),) = chains
+
+        def step(values, tangents):
+            x = values[arg]
+            out = forward(x)
+            values[index] = out
+            tangents[index] = chain(out, (x,), tangents[arg])
+
+    elif len(chains) == 1:
+        a, b = args
+        ((arg, chain),) = chains
+
+        def step(values, tangents):
+            operands = (values[a], values[b])
+            out = forward(*operands)
+            values[index] = out
+            tangents[index] = chain(out, operands, tangents[arg])
+
+    else:
+        ((a, chain_a), (b, chain_b)) = chains
+
+        def step(values, tangents):
+            operands = (values[a], values[b])
+            out = forward(*operands)
+            values[index] = out
+            tangents[index] = chain_a(out, operands, tangents[a]) + chain_b(
+                out, operands, tangents[b]
+            )
+
+    return step
+
+
+def _reduce_kernel(ufunc, axis, ndim, expand, arg, index):
+    """
+    Function to build the kernel of a reduction.
+    """
+    partial = _ufuncs.REDUCTIONS[ufunc]
+    axes = _ufuncs.reduction_axes(ndim, axis)
+
+    def step(values, tangents):
+        x = values[arg]
+        local = partial(x, axis)
+        if expand:
+            local = local[..., np.newaxis]
+        values[index] = ufunc.reduce(x, axis=axis)
+        tangents[index] = (local * tangents[arg]).sum(axis=axes)
+
+    return step
+
+
+def trace(function, *inputs):
+    """
+    Function to record the operations of a function of Variable objects.
+
+    The function is called once with the sample inputs. Operations on plain numbers and Python
+    control flow are evaluated at that time and frozen into the program, and only operations on
+    the inputs are recorded. The replay follows the numpy semantics of the ufuncs, so the domain
+    checks of the Variable methods are not repeated.
+
+    INPUTS
+    ------
+    function : callable
+        function of Variable objects returning a Variable object or a list of Variable objects
+    inputs : Variable objects
+        sample inputs. The program accepts inputs of the same shapes.
+
+    RETURNS
+    -------
+    A Program object
+
+    EXAMPLES
+    --------
+    >>> import numpy as np
+    >>> f = trace(lambda x: np.sum(x.logistic() * 2), Variable(np.zeros(3), np.ones(3)))
+    >>> print(f(Variable(np.array([0., 1., 2.]), np.array([1., 0., 0.]))))
+    value = 4.223711313215774, derivative = 0.5
+    """
+    program = Program()
+    tracers = []
+    for x in inputs:
+        if not isinstance(x, Variable):
+            raise Exception("The inputs must be Variable objects")
+        tracer = Tracer._make(x.val, x.der)
+        program.record("input", (), (), tracer)
+        program.inputs.append(tracer.node)
+        tracers.append(tracer)
+    result = function(*tracers)
+    program.single = not isinstance(result, (list, tuple))
+    for output in [result] if program.single else result:
+        if isinstance(output, Tracer) and output.program is program:
+            program.outputs.append(output.node)
+        elif isinstance(output, Variable):
+            raise Exception("The outputs must be computed from the traced inputs")
+        else:
+            program.outputs.append(program.constant(output))
+    return program
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
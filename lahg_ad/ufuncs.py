@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the derivative rules of the numpy ufuncs supported by Variable and RD objects.
+Every elementwise rule maps a ufunc to one expression per input, which computes the partial
+derivative of the output with respect to that input from the output and the input values,
+or to a number when the partial derivative is constant.
+Only the partial derivatives with respect to differentiable inputs are evaluated.
+"""
+
+import operator
+
+import numpy as np
+
+from . import precision as _precision
+
+# Partial derivative rules written as numpy expressions of the output out and the inputs x and y,
+# so that they can be evaluated directly or emitted into generated source code. Constants are
+# Python floats (0.693... is log(2), 2.302... is log(10)), which keep the precision of the inputs,
+# and the masks of maximum and minimum are built in the dtype of the output. The derivative of
+# x ** y with respect to y is 0 where the base is not positive: there x ** y is only real for
+# integer y and log(x) is not real, so the term is dropped as in Variable.__pow__.
+RULES = {
+    np.add: (1.0, 1.0),
+    np.subtract: (1.0, -1.0),
+    np.multiply: ("y", "x"),
+    np.divide: ("1 / y", "-out / y"),
+    np.power: (
+        "y * x ** (y - 1)",
+        "np.where(x > 0, out, 0) * np.log(np.where(x > 0, x, 1))",
+    ),
+    np.negative: (-1.0,),
+    np.positive: (1.0,),
+    np.absolute: ("np.sign(x)",),
+    np.square: ("2 * x",),
+    np.sqrt: ("0.5 / out",),
+    np.cbrt: ("1 / (3 * out ** 2)",),
+    np.reciprocal: ("-(out ** 2)",),
+    np.exp: ("out",),
+    np.exp2: ("out * 0.6931471805599453",),
+    np.expm1: ("out + 1",),
+    np.log: ("1 / x",),
+    np.log2: ("1 / (x * 0.6931471805599453)",),
+    np.log10: ("1 / (x * 2.302585092994046)",),
+    np.log1p: ("1 / (1 + x)",),
+    np.sin: ("np.cos(x)",),
+    np.cos: ("-np.sin(x)",),
+    np.tan: ("1 / (np.cos(x) ** 2)",),
+    np.arcsin: ("1 / np.sqrt(1 - x ** 2)",),
+    np.arccos: ("-1 / np.sqrt(1 - x ** 2)",),
+    np.arctan: ("1 / (1 + x ** 2)",),
+    np.sinh: ("np.cosh(x)",),
+    np.cosh: ("np.sinh(x)",),
+    np.tanh: ("1 - out ** 2",),
+    np.arcsinh: ("1 / np.sqrt(x ** 2 + 1)",),
+    np.arccosh: ("1 / np.sqrt(x ** 2 - 1)",),
+    np.arctanh: ("1 / (1 - x ** 2)",),
+    np.hypot: ("x / out", "y / out"),
+    np.arctan2: ("y / (x ** 2 + y ** 2)", "-x / (x ** 2 + y ** 2)"),
+    np.maximum: ("(x >= y).astype(out.dtype)", "(x < y).astype(out.dtype)"),
+    np.minimum: ("(x <= y).astype(out.dtype)", "(x > y).astype(out.dtype)"),
+    np.logaddexp: ("np.exp(x - out)", "np.exp(y - out)"),
+}
+
+
+def compile_rule(rule, nin):
+    """
+    Function to turn a partial derivative rule of RULES into a function.
+
+    INPUTS
+    ------
+    rule : str or float
+        numpy expression of out, x and y, or a constant
+    nin : int
+        number of inputs of the operation
+
+    RETURNS
+    -------
+    function of (out, x) or (out, x, y), or the constant itself
+
+    EXAMPLES
+    --------
+    >>> compile_rule("x / out", 2)(5.0, 3.0, 4.0)
+    0.6
+    >>> compile_rule(-1.0, 1)
+    -1.0
+    """
+    if not isinstance(rule, str):
+        return rule
+    args = "out, x, y" if nin == 2 else "out, x"
+    return eval("lambda {}: {}".format(args, rule), {"np": np})
+
+
+DERIVATIVES = {
+    ufunc: tuple(compile_rule(rule, ufunc.nin) for rule in rules)
+    for ufunc, rules in RULES.items()
+}
+
+
+def partial_derivative(rule, out, *inputs):
+    """
+    Function to evaluate one partial derivative rule of DERIVATIVES.
+
+    INPUTS
+    ------
+    rule : function or float
+        partial derivative rule
+    out : numpy array or float
+        output of the ufunc
+    inputs : numpy arrays or floats
+        inputs of the ufunc
+
+    RETURNS
+    -------
+    the partial derivative of the output with respect to one input
+
+    EXAMPLES
+    --------
+    >>> partial_derivative(DERIVATIVES[np.multiply][0], 6.0, 2.0, 3.0)
+    3.0
+    >>> partial_derivative(DERIVATIVES[np.subtract][1], -1.0, 2.0, 3.0)
+    -1.0
+    >>> partial_derivative(DERIVATIVES[np.power][1], np.float32(8.0), 2, np.float32(3.0))
+    np.float32(5.5451775)
+    """
+    if callable(rule):
+        dtype = getattr(out, "dtype", None)
+        if dtype is not None and dtype.kind == "f" and dtype.itemsize < 8:
+            # numpy functions turn Python numbers into float64, which would promote the result
+            inputs = [dtype.type(x) if type(x) in (int, float) else x for x in inputs]
+            local = rule(out, *inputs)
+            # numpy 1 also promotes numpy scalars with the Python constants of the rules
+            return dtype.type(local) if np.ndim(local) == 0 else local
+        return rule(out, *inputs)
+    return rule
+
+
+def _one_hot(index):
+    """
+    Function to build the partial derivative rule of a reduction that selects one element.
+
+    INPUTS
+    ------
+    index : function
+        numpy function returning the position of the selected element, like np.argmax
+
+    RETURNS
+    -------
+    function of (x, axis) returning an array of the shape of x, one at the selected elements
+
+    EXAMPLES
+    --------
+    >>> _one_hot(np.argmax)(np.array([[1, 5], [7, 2]]), 0)
+    array([[0., 1.],
+           [1., 0.]])
+    """
+
+    def partial(x, axis):
+        hot = np.zeros(x.shape, _precision.floating([x.dtype]))
+        if axis is None:
+            hot.flat[index(x)] = 1.0
+        else:
+            position = np.expand_dims(index(x, axis=axis), axis)
+            np.put_along_axis(hot, position, 1.0, axis=axis)
+        return hot
+
+    return partial
+
+
+# Reductions map a ufunc to the partial derivative of ufunc.reduce(x, axis) with respect to x
+REDUCTIONS = {
+    np.add: lambda x, axis: np.ones(x.shape, _precision.floating([x.dtype])),
+    np.maximum: _one_hot(np.argmax),
+    np.minimum: _one_hot(np.argmin),
+}
+
+# Comparison ufuncs are answered by the comparison methods of the AD classes
+COMPARISONS = {np.equal: operator.eq, np.not_equal: operator.ne}
+
+# Array functions that are computed as a reduction of a ufunc
+ARRAY_FUNCTIONS = {
+    np.sum: np.add,
+    np.max: np.maximum,
+    np.amax: np.maximum,
+    np.min: np.minimum,
+    np.amin: np.minimum,
+}
+
+
+def reduction_axes(ndim, axis):
+    """
+    Function to normalize the axis argument of a reduction.
+
+    INPUTS
+    ------
+    ndim : int
+        number of dimensions of the reduced value
+    axis : int or None
+
+    RETURNS
+    -------
+    tuple of the non-negative axes that are reduced
+
+    EXAMPLES
+    --------
+    >>> reduction_axes(3, None)
+    (0, 1, 2)
+    >>> reduction_axes(3, -1)
+    (2,)
+    """
+    if axis is None:
+        return tuple(range(ndim))
+    return (axis % ndim,)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
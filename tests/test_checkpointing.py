@@ -0,0 +1,115 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import tracemalloc
+import lahg_ad as ad
+from lahg_ad import checkpointing
+import numpy as np
+
+
+def simulation(a, n):
+    def step(y):
+        return (y * a).sin() + y * 0.5 - a.logistic()
+
+    return [step] * n
+
+
+def full_storage(x0, a0, n, cotangent=None):
+    x = ad.RD(x0)
+    a = ad.RD(a0)
+    f = x
+    for step in simulation(a, n):
+        f = step(f)
+    return f.val, ad.backward(f, cotangent, [x, a])
+
+
+def test_checkpoint_matches_full_storage():
+    x0 = np.linspace(0.1, 1.0, 5)
+    a0 = np.linspace(1.0, 2.0, 5)
+    n = 30
+    value, (dx, da) = full_storage(x0, a0, n)
+    for checkpoints in (None, 1, 7, n, 100, [4, 13, 29]):
+        a = ad.RD(a0)
+        result, (x_adjoint, a_adjoint) = ad.checkpoint(
+            simulation(a, n), ad.RD(x0), params=[a], checkpoints=checkpoints
+        )
+        assert np.allclose(result, value)
+        assert np.allclose(x_adjoint, dx)
+        assert np.allclose(a_adjoint, da)
+        assert a.children == []
+
+    cotangent = np.random.rand(3, 5)
+    _, (dx, da) = full_storage(x0, a0, n, cotangent)
+    a = ad.RD(a0)
+    _, (x_adjoint, a_adjoint) = ad.checkpoint(
+        simulation(a, n), ad.RD(x0), cotangent, params=[a]
+    )
+    assert x_adjoint.shape == (3, 5)
+    assert np.allclose(x_adjoint, dx) and np.allclose(a_adjoint, da)
+
+
+def test_checkpoint_schedule():
+    assert checkpointing.schedule(100) == list(range(0, 100, 10))
+    assert checkpointing.schedule(5, 10) == [0]
+    assert checkpointing.schedule(0) == []
+    value, (adjoint,) = ad.checkpoint([], ad.RD(np.array([1.0, 2.0])))
+    assert np.array_equal(value, [1.0, 2.0]) and np.array_equal(adjoint, [1.0, 1.0])
+    with pytest.raises(Exception):
+        checkpointing.schedule(10, 0)
+    with pytest.raises(Exception):
+        checkpointing.schedule(10, [3, 10])
+    with pytest.raises(Exception):
+        ad.checkpoint(simulation(ad.RD(np.ones(2)), 3), ad.RD(np.ones(2)), np.ones(3))
+    with pytest.raises(Exception):
+        with ad.Tape():
+            ad.checkpoint(simulation(ad.RD(np.ones(2)), 3), ad.RD(np.ones(2)))
+
+
+def test_checkpoint_forward_pass():
+    # the forward pass runs the steps on temporaries that record no graph
+    inputs = []
+
+    def step(y):
+        inputs.append(y)
+        return (y * 2.0).sin()
+
+    ad.checkpoint([step] * 4, ad.RD(np.array([0.5, 1.0])))
+    forward, recomputed = inputs[:4], inputs[4:]
+    assert not any(y.requires_grad or y.children for y in forward)
+    assert len(recomputed) == 4 and all(y.requires_grad for y in recomputed)
+
+    # the params are owned by the graphs of the steps, their earlier children are dropped
+    a = ad.RD(np.array([1.0, 2.0]))
+    f = a * 3.0
+    ad.checkpoint([lambda y: y * a], ad.RD(np.array([0.5, 1.0])), params=[a])
+    assert a.children == []
+
+
+def test_checkpoint_peak_memory():
+    x0 = np.linspace(0.1, 1.0, 500)
+    a0 = np.linspace(1.0, 2.0, 500)
+    n = 36
+
+    def peak(function):
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    full = peak(lambda: full_storage(x0, a0, n))
+    a = ad.RD(a0)
+    checkpointed = peak(
+        lambda: ad.checkpoint(simulation(a, n), ad.RD(x0), params=[a])
+    )
+    assert checkpointed < full / 3
+
+
+if __name__ == "__main__":
+    test_checkpoint_matches_full_storage()
+    test_checkpoint_schedule()
+    test_checkpoint_forward_pass()
+    test_checkpoint_peak_memory()
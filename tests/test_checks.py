@@ -0,0 +1,88 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import warnings
+import lahg_ad as ad
+import numpy as np
+
+
+def test_unchecked_rd():
+    x = ad.RD(np.array([1.0, 0.0, -1.0]))
+    with pytest.raises(Exception):
+        x.log(np.e)
+    with pytest.raises(Exception):
+        1 / x
+    with pytest.raises(Exception):
+        x ** -1
+    with pytest.raises(Exception):
+        x ** 0.5
+
+    with pytest.warns(RuntimeWarning) as record:
+        with ad.Unchecked() as scope:
+            assert not ad.checks.enabled()
+            f = x.log(np.e) + 1 / x + x ** 0.5
+    assert ad.checks.enabled()
+    # one warning for the whole scope
+    assert len(record) == 1
+    assert "divide by zero" in scope.errors and "invalid value" in scope.errors
+    assert f.val[0] == 2.0 and np.isnan(f.val[2])
+
+    x = ad.RD(np.array([0.5, 2.0, -1.5]))
+    for function in (lambda x: x.arcsin(), lambda x: x.arccos()):
+        with pytest.raises(Exception):
+            function(x)
+        with ad.Unchecked(errors="ignore") as scope:
+            f = function(x)
+        assert scope.errors == ["invalid value"]
+        assert np.isclose(f.val[0], function(ad.RD(np.array([0.5]))).val[0])
+        assert np.isnan(f.val[1:]).all()
+
+    x = ad.RD(np.array([1.0, 0.0]))
+    with pytest.raises(ValueError):
+        with ad.Unchecked(errors="raise"):
+            x ** -1
+    with ad.Unchecked(errors="raise") as scope:
+        x * 2
+    assert scope.errors == []
+    with pytest.raises(ValueError):
+        ad.Unchecked(errors="print")
+
+
+def test_unchecked_fd():
+    x = ad.Variable(np.array([0.5, 0.0, 2.0]), np.ones(3))
+    for function in (lambda x: x.log(), lambda x: 1 / x, lambda x: x.arcsin()):
+        with pytest.raises((ValueError, ZeroDivisionError)):
+            function(x)
+        with ad.Unchecked(errors="ignore") as scope:
+            f = function(x)
+        assert scope.errors
+        assert not np.isfinite(f.val).all() or not np.isfinite(f.der).all()
+        # values inside the domain are the same as in checked mode
+        assert np.isclose(f.val[0], function(ad.Variable(0.5)).val)
+
+    # scalar inputs are still checked
+    with ad.Unchecked():
+        with pytest.raises(ValueError):
+            ad.Variable(0.0).log()
+
+
+def test_unchecked_no_errors():
+    x = ad.RD(np.array([1.0, 2.0]))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        with ad.Unchecked() as scope:
+            f = (x.log(np.e) + 1 / x) ** 2
+    assert scope.errors == []
+    y = ad.RD(np.array([1.0, 2.0]))
+    g = (y.log(np.e) + 1 / y) ** 2
+    assert np.array_equal(f.val, g.val)
+    assert np.array_equal(x.get_derivative(), y.get_derivative())
+
+
+if __name__ == "__main__":
+    test_unchecked_rd()
+    test_unchecked_fd()
+    test_unchecked_no_errors()
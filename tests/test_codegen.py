@@ -0,0 +1,113 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import lahg_ad as ad
+from lahg_ad import codegen
+import numpy as np
+
+
+def model(x, y):
+    z = np.maximum(x, 0.5) * y.sin() + np.array([1.0, 2.0, 3.0]) / y
+    return np.sum(z, axis=0) - (x / y).logistic() ** 2, np.mean(np.hypot(x, y))
+
+
+def sample():
+    x = ad.DualArray(np.linspace(0.2, 1.4, 6).reshape(2, 3), np.random.rand(2, 3, 2))
+    y = ad.DualArray(np.linspace(1.0, 2.0, 3), np.random.rand(3, 2))
+    return x, y
+
+
+def test_codegen_forward():
+    x, y = sample()
+    program = ad.trace(model, x, y)
+    compiled = ad.compile_program(program)
+    for result, expected in zip(compiled(x, y), model(x, y)):
+        assert np.allclose(result.val, expected.val)
+        assert np.allclose(result.der, expected.der)
+    assert "def forward(" in ad.generate_source(program)
+    with pytest.raises(ValueError):
+        ad.generate_source(program, "sideways")
+
+
+def test_codegen_reverse():
+    x, y = sample()
+    program = ad.trace(model, x, y)
+    cotangents = [np.array([[1.0, 0.5, -1.0], [0.3, 0.2, 0.1]]), 2.0]
+    values, gradients = ad.compile_program(program, "reverse")(
+        x.val, y.val, cotangents=cotangents
+    )
+    # forward mode with one unit direction per input element gives the full jacobians
+    xj = ad.DualArray(x.val, np.eye(9)[:6].reshape(2, 3, 9))
+    yj = ad.DualArray(y.val, np.eye(9)[6:])
+    f, g = model(xj, yj)
+    expected = np.tensordot(cotangents[0], f.der, axes=2) + cotangents[1] * g.der
+    assert np.allclose(gradients[0], expected[:6].reshape(2, 3))
+    assert np.allclose(gradients[1], expected[6:])
+    assert np.allclose(values[1], g.val)
+
+
+def test_codegen_cache():
+    codegen._cache.clear()
+    for constant in (2.0, 3.0, 4.0):
+        program = ad.trace(lambda x: x.sin() * constant, ad.Variable(1.0, 1.0))
+        result = ad.compile_program(program)(ad.Variable(0.5, 1.0))
+        assert np.isclose(result.der, constant * np.cos(0.5))
+    assert len(codegen._cache) == 1
+
+
+def test_codegen_fused():
+    def elementwise(x, y):
+        z = np.cos(x * y) + 3 * np.log(x) - (x / y).logistic() + np.arange(7.0) / y
+        return z, -x, 2.0
+
+    for seed in (np.random.rand(7), np.random.rand(7, 3)):
+        x = ad.DualArray(np.linspace(0.5, 2.0, 7), seed)
+        y = ad.DualArray(np.linspace(1.0, 3.0, 7), np.ones(seed.shape))
+        program = ad.trace(elementwise, x, y)
+        for block in (1, 3, 7, 100):
+            fused = ad.compile_program(program, "fused", block=block)
+            for result, expected in zip(fused(x, y), elementwise(x, y)):
+                assert np.allclose(result.val, getattr(expected, "val", expected))
+                assert np.allclose(result.der, getattr(expected, "der", 0.0))
+    with pytest.raises(Exception):
+        fused(x[:3], y[:3])
+    # reductions and broadcasting are not elementwise
+    with pytest.raises(ValueError):
+        ad.compile_program(ad.trace(lambda x: np.sum(x), x), "fused")
+    with pytest.raises(ValueError):
+        ad.compile_program(ad.trace(lambda x: x * np.ones((2, 7)), x), "fused")
+
+
+def test_codegen_input_mismatch():
+    # the compiled code is specialized on the traced shapes and tangent directions
+    x = ad.DualArray(np.array([1.0, 2.0]), np.ones(2))
+    program = ad.trace(lambda a: a.sin() * a, x)
+    for mode in ("forward", "fused"):
+        with pytest.raises(Exception, match="tangent of input 0"):
+            ad.compile_program(program, mode)(ad.DualArray(x.val, np.eye(2)))
+        with pytest.raises(Exception, match="traced shape"):
+            ad.compile_program(program, mode)(ad.DualArray(np.ones(3), np.ones(3)))
+    with pytest.raises(Exception, match="traced shape"):
+        ad.compile_program(program, "reverse")(np.ones(3))
+
+
+def test_codegen_fused_float32():
+    x = ad.DualArray(np.linspace(0.5, 2.0, 7), np.ones(7), dtype=np.float32)
+    program = ad.trace(lambda a: (a * 2.0).logistic() * a.sin() + 1.5, x)
+    result = ad.compile_program(program, "fused", block=3)(x)
+    expected = program(x)
+    assert result.val.dtype == np.float32 and result.der.dtype == np.float32
+    assert np.allclose(result.val, expected.val, rtol=1e-6)
+    assert np.allclose(result.der, expected.der, rtol=1e-6)
+
+
+if __name__ == "__main__":
+    test_codegen_forward()
+    test_codegen_reverse()
+    test_codegen_cache()
+    test_codegen_fused()
+    test_codegen_input_mismatch()
+    test_codegen_fused_float32()
@@ -0,0 +1,63 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import lahg_ad as ad
+import numpy as np
+
+
+def test_dualarray():
+    x = ad.DualArray([[1.0, 2.0], [3.0, 4.0]])
+    assert x.shape == (2, 2) and x.ndim == 2 and x.size == 4 and len(x) == 2
+    assert np.array_equal(x.der, np.ones((2, 2)))
+    with pytest.raises(Exception):
+        ad.DualArray([1.0, 2.0], [1.0, 2.0, 3.0])
+    with pytest.raises(ValueError):
+        ad.DualArray(["a", "b"])
+
+
+def test_dualarray_indexing():
+    x = ad.DualArray(np.arange(6.0).reshape(2, 3), np.ones((2, 3, 2)))
+    assert x[1].val.tolist() == [3.0, 4.0, 5.0] and x[1].der.shape == (3, 2)
+    assert x[..., 0].der.shape == (2, 2)
+    assert x[:, 1:].shape == (2, 2)
+    assert x[1, 2].val == 5.0 and x[1, 2].der.tolist() == [1.0, 1.0]
+    y = x.reshape(3, 2)
+    assert y.shape == (3, 2) and y.der.shape == (3, 2, 2)
+    assert np.reshape(x, (6,)).der.shape == (6, 2)
+    z = ad.DualArray([1.0, 2.0, 3.0]).broadcast_to((2, 3))
+    assert z.shape == (2, 3) and np.array_equal(z.der, np.ones((2, 3)))
+
+
+def test_dualarray_broadcasting():
+    a = np.arange(1.0, 4.0).reshape(3, 1)
+    b = np.arange(1.0, 5.0).reshape(1, 4)
+    x = ad.DualArray(a, np.stack([np.ones((3, 1)), np.zeros((3, 1))], axis=-1))
+    y = ad.DualArray(b, np.stack([np.zeros((1, 4)), np.ones((1, 4))], axis=-1))
+    f = (x * y).sin() + x ** 2 / y - 2 ** x
+    assert isinstance(f, ad.DualArray) and f.der.shape == (3, 4, 2)
+    assert np.allclose(f.der[..., 0], b * np.cos(a * b) + 2 * a / b - np.log(2) * 2 ** a)
+    assert np.allclose(f.der[..., 1], a * np.cos(a * b) - a ** 2 / b ** 2)
+    assert isinstance(ad.Variable(2.0, 1.0) * ad.DualArray([1.0]), ad.DualArray)
+
+
+def test_dualarray_variables():
+    x, y = ad.make_variables([2, 1], np.eye(2))
+    objects = np.array([[x * y, x + y], [x.sin(), y ** 2]], dtype=object)
+    f = ad.DualArray.from_variables(objects)
+    assert f.shape == (2, 2) and f.der.shape == (2, 2, 2)
+    assert np.array_equal(f.der[0, 0], [1.0, 2.0])
+    assert f.to_variables()[1, 1] == y ** 2
+    with pytest.raises(Exception):
+        ad.DualArray.from_variables([x, 3])
+    with pytest.raises(Exception):
+        ad.DualArray.from_variables([x, ad.Variable(1.0, 1.0)])
+
+
+if __name__ == "__main__":
+    test_dualarray()
+    test_dualarray_indexing()
+    test_dualarray_broadcasting()
+    test_dualarray_variables()
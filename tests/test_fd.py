@@ -190,10 +190,10 @@ def test_tanh():
 
     x = ad.Variable(np.array([1, 2]), np.array([3, 4])).tanh()
     assert np.array_equal(x.val, np.array([np.tanh(1), np.tanh(2)]))
-    assert np.array_equal(x.der, np.array([(1 / (np.cosh(1) ** 2)) * 3, (1 / (np.cosh(2) ** 2)) * 4]))
+    assert np.array_equal(x.der, np.array([(1 - np.tanh(1) ** 2) * 3, (1 - np.tanh(2) ** 2) * 4]))
     assert ad.Variable(0.5).tanh() == ad.tanh(ad.Variable(0.5))
     assert np.array_equal(
-        x.der, np.array([(1 / (np.cosh(1) ** 2)) * 3, (1 / (np.cosh(2) ** 2)) * 4])
+        x.der, np.array([(1 - np.tanh(1) ** 2) * 3, (1 - np.tanh(2) ** 2) * 4])
     )
     
 
@@ -442,7 +442,8 @@ def test_pow():
     y = ad.Variable(np.array([2, 1]), np.array([1, 2]))
     f = x ** y
     assert np.array_equal(f.val, np.array([0, 2]))
-    assert np.array_equal(f.der, np.array([0, 6]))
+    # the log term is only dropped where the base is not positive
+    assert np.array_equal(f.der, np.array([0, 1 * 2 ** (1 - 1) * 6 + np.log(2) * 2 ** 1 * 2]))
 
     x = ad.Variable(np.array([3, 2]), np.array([5, 6]))
     y = ad.Variable(np.array([2, 1]), np.array([1, 2]))
@@ -464,6 +465,16 @@ def test_pow():
         x.der, np.array([np.log(2) * 2 ** 0 * 5, np.log(2) * 2 ** 2 * 6])
     )
 
+    # a negative base with an integer exponent, through ** and the np.power rule
+    a, b = ad.make_variables([-2.0, 2.0], np.eye(2))
+    for f in (a ** b, np.power(a, b)):
+        assert f.val == 4.0 and np.array_equal(f.der, [-4.0, 0.0])
+    x = ad.DualArray(np.array([-2.0, 3.0]), np.ones(2))
+    y = ad.DualArray(np.array([2.0, 2.0]), np.ones(2))
+    program = ad.trace(lambda u, v: u ** v, x, y)
+    for f in (x ** y, program(x, y), ad.compile_program(program, "fused")(x, y)):
+        assert np.allclose(f.der, [-4.0, 6.0 + 9.0 * np.log(3.0)])
+
 
 def test_log():
     assert ad.Variable(1).log(base=np.e).val == 0
@@ -581,6 +592,147 @@ def test_logistic():
     )
 
 
+def test_multi_direction():
+    value = np.array([0.2, 0.5, 0.7])
+    seed = np.array([[1.0, 0.0, 2.0], [0.0, 1.0, -1.0], [3.0, 1.0, 0.5]])
+    functions = [
+        lambda x: x.sin() * x.cos() + x.tan(),
+        lambda x: x.arcsin() - x.arccos() + x.arctan(),
+        lambda x: x.sinh() / x.cosh() ** 2 + x.tanh(),
+        lambda x: x.exp() + x.exp(2) + x.log() * x.log(np.e),
+        lambda x: x ** 2.5 + x ** x + 2 ** x + x.sqrt(),
+        lambda x: 3 / x - x / 4 + (1 - x) * 2 + x.logistic() - (-x),
+        lambda x: x / (x + 1) - x * np.array([1.0, 2.0, 3.0]),
+    ]
+    for f in functions:
+        result = f(ad.Variable(value, seed))
+        assert result.der.shape == (3, 3)
+        for j in range(3):
+            single = f(ad.Variable(value, seed[:, j]))
+            assert np.allclose(result.val, single.val)
+            assert np.allclose(result.der[:, j], single.der)
+    with pytest.raises(Exception):
+        ad.Variable(value, np.ones((2, 3)))
+
+
+def test_make_variables_default_seed():
+    x, y = ad.make_variables([np.array([1.0, 2.0]), np.array([3.0, 4.0])])
+    f = x * y.sin()
+    assert np.allclose(f.der, np.stack([np.sin(y.val), x.val * np.cos(y.val)], axis=1))
+    x, y = ad.make_variables([2, 1])
+    assert np.array_equal((x * y).der, [1, 2])
+
+
+def test_ufunc():
+    x = ad.Variable(np.array([3.0, 5.0]), np.array([1.0, 2.0]))
+    f = np.hypot(x, 4.0)
+    assert np.allclose(f.val, [5.0, np.sqrt(41)])
+    assert np.allclose(f.der, [0.6, 2 * 5 / np.sqrt(41)])
+    f = np.array([2.0, 3.0]) * np.log(x)
+    assert np.allclose(f.der, [2 / 3, 3 * 2 / 5])
+    f = np.maximum(x, np.array([4.0, 4.0]))
+    assert np.array_equal(f.der, [0.0, 2.0])
+    f = np.add.reduce(x)
+    assert f.val == 8.0 and f.der == 3.0
+    with pytest.raises(TypeError):
+        np.floor(x)
+
+
+def test_array_function():
+    x = ad.Variable(np.array([[1.0, 4.0], [3.0, 2.0]]), np.arange(4.0).reshape(2, 2))
+    assert np.array_equal(np.sum(x, axis=1).der, [1.0, 5.0])
+    assert np.array_equal(np.max(x, axis=0).der, [2.0, 1.0])
+    assert np.mean(x).der == 1.5
+    x, y = ad.make_variables([np.array([1.0, 2.0]), np.array([3.0, 4.0])])
+    f = np.sum(x * y)
+    assert np.array_equal(f.der, [7.0, 3.0])
+
+
+
+def test_fused_primitives():
+    x = ad.Variable(np.array([-1000.0, -1.0, 0.0, 2.0, 1000.0]), np.ones(5))
+    f = x.softplus()
+    assert np.allclose(f.val, np.logaddexp(0, x.val))
+    assert np.allclose(f.der, np.exp(-np.logaddexp(0, -x.val)))
+    assert ad.softplus(ad.Variable(0.5)) == ad.Variable(0.5).softplus()
+
+    f = x.logistic()
+    assert np.all(np.isfinite(f.val)) and np.all(np.isfinite(f.der))
+    assert np.allclose(f.der, f.val * (1 - f.val))
+
+    y = ad.Variable(np.array([3.0, -1.0, 5.0, 2.0, 999.0]), 2 * np.ones(5))
+    f = x.logaddexp(y)
+    weight = np.exp(x.val - np.logaddexp(x.val, y.val))
+    assert np.allclose(f.val, np.logaddexp(x.val, y.val))
+    assert np.allclose(f.der, weight + 2 * (1 - weight))
+    assert np.allclose(x.logaddexp(3.0).val, np.logaddexp(x.val, 3.0))
+    with pytest.raises(ValueError):
+        x.logaddexp("a")
+
+    x, y = ad.make_variables([np.array([1.0, 2.0]), np.array([1000.0, 1000.0])])
+    f = (x * y).logsumexp()
+    assert f.val == pytest.approx(2000 + np.log(1 + np.exp(-1000)))
+    assert np.allclose(f.der, [1000.0, 2.0])
+
+    labels = np.array([0.0, 1.0, 1.0, 0.0])
+    x = ad.Variable(np.array([-800.0, -2.0, 0.5, 3.0]), np.ones(4))
+    f = x.sigmoid_cross_entropy(labels)
+    p = 1 / (1 + np.exp(-x.val[1:]))
+    expected = -labels[1:] * np.log(p) - (1 - labels[1:]) * np.log(1 - p)
+    assert f.val[0] == 0.0 and np.allclose(f.val[1:], expected)
+    assert np.allclose(f.der, np.exp(-np.logaddexp(0, -x.val)) - labels)
+
+
+
+def test_constant_operands():
+    x = ad.Variable(2.0, 1.0)
+    for c in (3, 3.0, np.float64(3.0), np.int64(3), np.float32(3.0)):
+        assert (x + c) == ad.Variable(5.0, 1.0)
+        assert (c + x) == ad.Variable(5.0, 1.0)
+        assert (x - c) == ad.Variable(-1.0, 1.0)
+        assert (c - x) == ad.Variable(1.0, -1.0)
+        assert (x * c) == ad.Variable(6.0, 3.0)
+        assert (c * x) == ad.Variable(6.0, 3.0)
+        assert (x / c).der == pytest.approx(1 / 3)
+        assert (c / x).der == pytest.approx(-0.75)
+        assert (x ** c) == ad.Variable(8.0, 12.0)
+        assert x != c and not (x == c)
+
+    x = ad.Variable(np.array([1.0, 2.0]), np.array([1.0, 1.0]))
+    c = np.array([2.0, 4.0])
+    assert np.array_equal((x * c).der, [2.0, 4.0])
+    assert np.array_equal((x / c).der, [0.5, 0.25])
+    assert np.array_equal((x - c).val, [-1.0, -2.0])
+    with pytest.raises(ZeroDivisionError):
+        x / np.array([1.0, 0.0])
+    with pytest.raises(TypeError):
+        x ** np.array([1.0, 2.0])
+
+
+def test_scalar_fast_path():
+    functions = ("sin", "cos", "tan", "arcsin", "arccos", "arctan", "log", "sqrt")
+    cases = [
+        (float(value), der)
+        for value in np.linspace(0.01, 0.99, 25)
+        for der in (0.7, np.array([1.0, -0.3]))
+    ]
+    fast = [[getattr(ad.Variable(*case), name)() for name in functions] for case in cases]
+    # without the fast path the same scalars go through the numpy ufuncs
+    scalars, ad.fd._SCALARS = ad.fd._SCALARS, ()
+    try:
+        slow = [[getattr(ad.Variable(*case), name)() for name in functions] for case in cases]
+    finally:
+        ad.fd._SCALARS = scalars
+    for fast_row, slow_row in zip(fast, slow):
+        for result, expected in zip(fast_row, slow_row):
+            assert result.val == expected.val
+            assert np.array_equal(result.der, expected.der)
+    assert type(ad.Variable(2.0).sin().val) is float
+    assert ad.Variable(2).log(base=2) == ad.Variable(1.0, 1 / (2 * np.log(2)))
+    with pytest.raises(ValueError):
+        ad.Variable(1.0).arcsin()
+
+
 if __name__ == "__main__":
     test_arccos_domain()
     test_arcsin_domain()
@@ -600,3 +752,10 @@ if __name__ == "__main__":
     test_repr()
     test_logistic()
     test_variable_types()
+    test_multi_direction()
+    test_make_variables_default_seed()
+    test_ufunc()
+    test_array_function()
+    test_fused_primitives()
+    test_constant_operands()
+    test_scalar_fast_path()
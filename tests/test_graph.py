@@ -0,0 +1,100 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import gc
+import tracemalloc
+import weakref
+import lahg_ad as ad
+import numpy as np
+
+
+def model(x, y):
+    return (x * y).sin() + x.log(np.e) * 3 - y ** 2 / x + (2 ** x).logistic()
+
+
+def test_graph_matches_children():
+    x = ad.RD(np.array([1.0, 2.0, 3.0]))
+    y = ad.RD(np.array([0.5, 1.5, 2.5]))
+    model(x, y)
+    expected_x, expected_y = x.get_derivative(), y.get_derivative()
+
+    x.reset()
+    y.reset()
+    for _ in range(3):
+        with ad.Graph() as graph:
+            f = model(x, y)
+            assert np.allclose(x.get_derivative(), expected_x)
+            assert np.allclose(y.get_derivative(), expected_y)
+        assert x.children == [] and y.children == []
+        assert len(graph) > 10
+    # derivatives computed inside the graph stay cached
+    assert np.allclose(x.get_derivative(), expected_x)
+
+
+def test_graph_releases_nodes():
+    x = ad.RD(np.array([1.0, 2.0]))
+    x.sin()
+    gc.disable()
+    try:
+        with ad.Graph():
+            node = weakref.ref(x.cos() * 2)
+            f = x.exp()
+            assert node() is not None and len(x.children) == 2
+        # freed by reference counting alone, the graph leaves no cycles behind
+        assert node() is None
+        assert f.children == []
+    finally:
+        gc.enable()
+
+
+def test_graph_nested():
+    x = ad.RD(np.array([1.0, 2.0]))
+    with ad.Graph() as outer:
+        y = x * x
+        with ad.Graph() as inner:
+            f = y.sin()
+            assert len(x.children) == 2 and len(y.children) == 1
+        # nodes of the outer graph keep the children recorded by the inner one
+        assert len(y.children) == 1
+        assert np.allclose(x.get_derivative(), np.cos([1.0, 4.0]) * [2.0, 4.0])
+    assert len(outer) == 1 and len(inner) == 1
+    # only operands from outside are emptied, y was created in the outer graph
+    assert x.children == [] and len(y.children) == 1
+
+
+def test_graph_memory_is_flat():
+    x = ad.RD(np.linspace(0.5, 1.5, 100))
+    y = ad.RD(np.linspace(1.0, 2.0, 100))
+
+    def step():
+        with ad.Graph():
+            model(x, y)
+            return x.get_derivative() + y.get_derivative()
+
+    tracemalloc.start()
+    try:
+        for _ in range(20):
+            step()
+        start = tracemalloc.get_traced_memory()[0]
+        for _ in range(500):
+            step()
+        growth = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    assert growth < 64 * 1024
+    assert x.children == [] and y.children == []
+
+    # without a graph every iteration stays reachable from the leaves
+    for _ in range(10):
+        model(x, y)
+    assert len(x.children) == 40
+
+
+if __name__ == "__main__":
+    test_graph_matches_children()
+    test_graph_releases_nodes()
+    test_graph_nested()
+    test_graph_memory_is_flat()
@@ -0,0 +1,88 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import lahg_ad as ad
+import numpy as np
+
+
+def model(x, y, z):
+    f = (x * y).sin() + x.log(np.e) * 3 - y ** 2 / x + (2 ** z).logistic()
+    return np.sum(f * np.array([1.0, 2.0, 3.0])) + np.max(z * x) + np.mean(y.exp())
+
+
+def rebuilt(*values):
+    leaves = [ad.RD(value) for value in values]
+    f = model(*leaves)
+    return f.val, ad.backward(f, None, leaves)
+
+
+def test_incremental_matches_rebuild():
+    values = [np.array([1.0, 2.0, 3.0]), np.array([0.5, 1.5, 2.5]), np.zeros(3)]
+    graph = ad.Incremental(model, *[ad.RD(value) for value in values])
+    rng = np.random.default_rng(0)
+    for step in range(12):
+        index = step % 3
+        values[index] = rng.uniform(0.5, 2.0, 3)
+        graph.update(index, values[index])
+        if step % 2:
+            # several updates are recomputed together
+            values[0] = values[0] + 0.1
+            graph.update(0, values[0])
+        value, adjoints = rebuilt(*values)
+        assert np.allclose(graph.value(), value)
+        for adjoint, expected in zip(graph.gradient(), adjoints):
+            assert np.allclose(adjoint, expected)
+
+    # an update with the same value recomputes nothing
+    graph.update(1, values[1].copy())
+    graph.gradient()
+    assert graph.n_forward == 0 and graph.n_backward == 0
+
+
+def test_incremental_cost_follows_the_change():
+    width = 64
+    values = [np.linspace(0.1, 1.0, 5) + i / width for i in range(width)]
+
+    def wide(*xs):
+        terms = [np.sum((x * 0.5).sin() * x.exp()) for x in xs]
+        while len(terms) > 1:
+            terms = [a + b for a, b in zip(terms[::2], terms[1::2])]
+        return terms[0]
+
+    graph = ad.Incremental(wide, *values)
+    n_nodes = len(graph.program.nodes)
+    values[7] = values[7] * 2
+    graph.update(7, values[7])
+    gradient = graph.gradient()
+    # one branch of 5 nodes and the 6 sums above it
+    assert graph.n_forward == 11
+    # the adjoints of the branch and its input, the sums keep theirs
+    assert graph.n_backward <= 6
+    assert graph.n_forward + graph.n_backward < n_nodes / 10
+
+    leaves = [ad.RD(value) for value in values]
+    expected = ad.backward(wide(*leaves), None, leaves)
+    for adjoint, expected_adjoint in zip(gradient, expected):
+        assert np.allclose(adjoint, expected_adjoint)
+
+
+def test_incremental_errors():
+    graph = ad.Incremental(lambda x, y: (x * y, x.sin()), np.ones(2), np.ones(2))
+    product, sine = graph.value()
+    assert np.allclose(product, 1.0) and np.allclose(sine, np.sin(1.0))
+    assert np.allclose(graph.gradient()[0], 1 + np.cos(1.0))
+    with pytest.raises(Exception):
+        graph.update(2, np.ones(2))
+    with pytest.raises(Exception):
+        graph.update(0, np.ones(3))
+    with pytest.raises(Exception):
+        ad.Incremental(lambda x: ad.RD(np.ones(2)), np.ones(2))
+
+
+if __name__ == "__main__":
+    test_incremental_matches_rebuild()
+    test_incremental_cost_follows_the_change()
+    test_incremental_errors()
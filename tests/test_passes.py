@@ -0,0 +1,72 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import lahg_ad as ad
+from lahg_ad import passes
+import numpy as np
+
+
+def model(x, y):
+    a = np.cos(x * y) + y * x + 3 * np.log(x)
+    b = (a + 0.0) * 1.0 + np.sum(x * y, axis=0) * 2.0 + x / 1
+    unused = np.exp(x) * y
+    return b - 0, np.mean(np.hypot(x, y)) + 3.0
+
+
+def sample():
+    x = ad.DualArray(np.linspace(0.5, 2.0, 6).reshape(2, 3), np.random.rand(2, 3, 2))
+    y = ad.DualArray(np.linspace(1.0, 2.0, 3), np.random.rand(3, 2))
+    return x, y
+
+
+def test_simplify():
+    x, y = sample()
+    program = ad.trace(model, x, y)
+    simple, removed = ad.simplify(program)
+    assert removed == {"fold": 4, "cse": 2, "dead": 2}
+    assert len(simple) == len(program) - 8
+    for result, expected in zip(simple(x, y), model(x, y)):
+        assert np.allclose(result.val, expected.val)
+        assert np.allclose(result.der, expected.der)
+    _, gradients = ad.compile_program(program, "reverse")(x.val, y.val)
+    _, simple_gradients = ad.compile_program(simple, "reverse")(x.val, y.val)
+    for gradient, expected in zip(simple_gradients, gradients):
+        assert np.allclose(gradient, expected)
+
+
+def test_fold_constants():
+    x = ad.Variable(2.0, 1.0)
+    # broadcasting and dtype changes are not identities
+    program = ad.trace(lambda x: x * np.ones(3) + 0, x)
+    folded, removed = passes.fold_constants(program)
+    assert removed == 1 and len(folded) == 1
+    program = ad.trace(lambda x: x, x)
+    assert ad.simplify(program)[1] == {"fold": 0, "cse": 0, "dead": 0}
+    # operations on constants only become constants
+    program = ad.Program()
+    program.outputs = [program.constant(2.0)]
+    program.outputs = [program._append("exp", program.outputs, (), np.exp(2.0), False)]
+    folded, removed = passes.fold_constants(program)
+    assert removed == 1 and folded.nodes[folded.outputs[0]].op == "const"
+    assert folded().val == np.exp(2.0)
+
+
+def test_eliminate_dead_nodes():
+    program = ad.trace(
+        lambda x, y: (x.sin(), x.cos() * 2.0)[0],
+        *ad.make_variables([1.0, 2.0], np.eye(2))
+    )
+    simple, removed = passes.eliminate_dead_nodes(program)
+    assert removed == 2 and len(simple) == 1
+    assert len(simple.inputs) == 2
+    result = simple(*ad.make_variables([0.5, 1.0], np.eye(2)))
+    assert np.allclose(result.der, [np.cos(0.5), 0.0])
+
+
+if __name__ == "__main__":
+    test_simplify()
+    test_fold_constants()
+    test_eliminate_dead_nodes()
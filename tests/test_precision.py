@@ -0,0 +1,110 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import lahg_ad as ad
+import numpy as np
+
+
+def fd_model(x):
+    return (x * x).sin() + x.exp() / (x + 1) - x.log() + x ** 2 - 2 ** x
+
+
+def rd_model(x):
+    return (x * x).sin() + x.exp() / (x + 1) - x.log(np.e) + x ** 2 - 2 ** x
+
+
+def test_precision_scope():
+    assert ad.precision.current() is None
+    with ad.Precision(np.float32):
+        with ad.Precision("float64"):
+            assert ad.precision.current() == np.float64
+        assert ad.precision.current() == np.float32
+    assert ad.precision.current() is None
+    with pytest.raises(ValueError):
+        ad.Precision(int)
+    with pytest.raises(ValueError):
+        ad.RD(np.array([1.0]), dtype=np.int32)
+
+
+def test_fd_precision():
+    value = np.array([0.5, 1.0, 2.0])
+    expected = fd_model(ad.Variable(value, np.ones(3)))
+    f = fd_model(ad.Variable(value, np.ones(3), dtype=np.float32))
+    assert f.val.dtype == np.float32 and f.der.dtype == np.float32
+    assert np.allclose(f.der, expected.der, rtol=1e-5)
+
+    with ad.Precision(np.float32):
+        x, y = ad.make_variables([value, value * 2])
+        dual = ad.DualArray(value)
+        # the dtype argument overrides the scope
+        z = ad.Variable(value, np.ones(3), dtype=np.float64)
+    assert x.val.dtype == np.float32 and y.der.dtype == np.float32
+    assert fd_model(dual).der.dtype == np.float32
+    assert np.allclose(fd_model(dual).der, expected.der, rtol=1e-5)
+    assert z.val.dtype == np.float64
+    for reduction in (np.sum, np.mean, np.max):
+        assert reduction(fd_model(dual)).der.dtype == np.float32
+
+    # outside of a scope values keep their dtype
+    x = ad.Variable(np.array([1, 2]), np.array([1, 1]))
+    assert x.val.dtype == np.int_ and fd_model(x).der.dtype == np.float64
+
+
+def test_rd_precision():
+    value = np.array([0.5, 1.0, 2.0])
+    x = ad.RD(value)
+    rd_model(x)
+    expected = x.get_derivative()
+
+    x = ad.RD(value, dtype=np.float32)
+    f = rd_model(x)
+    assert f.val.dtype == np.float32
+    assert x.get_derivative().dtype == np.float32
+    assert np.allclose(x.get_derivative(), expected, rtol=1e-5)
+    (adjoint,) = ad.backward(f, None, [x])
+    assert adjoint.dtype == np.float32
+    assert np.sum(x * x).get_derivative().dtype == np.float32
+
+    with ad.Precision(np.float32):
+        with ad.Tape() as tape:
+            x = ad.RD(value)
+            rd_model(x)
+    assert tape.derivatives.dtype == np.float32
+    assert x.get_derivative().dtype == np.float32
+    assert np.allclose(x.get_derivative(), expected, rtol=1e-5)
+
+    # integer values keep their dtype, the power does not convert them in place
+    x = ad.RD(np.array([1, 2]))
+    f = x ** -1
+    assert x.val.dtype == np.int_ and np.allclose(f.val, [1.0, 0.5])
+    assert np.allclose(x.get_derivative(), [-1.0, -0.25])
+
+
+def test_precision_masks_and_labels():
+    # the masks of maximum and minimum and float64 labels do not widen float32 values
+    labels = np.array([0.0, 1.0, 1.0])
+    dual = ad.DualArray(np.array([-1.0, 0.5, 2.0]), dtype=np.float32)
+    for f in (
+        np.maximum(dual, 0.5),
+        np.minimum(dual, np.float32(0.5)),
+        np.maximum(dual[0], dual[1]),
+        dual.sigmoid_cross_entropy(labels),
+        ad.trace(lambda a: a.sigmoid_cross_entropy(labels), dual)(dual),
+    ):
+        assert f.val.dtype == np.float32 and f.der.dtype == np.float32
+    assert np.allclose(np.maximum(dual, 0.5).der, [0.0, 1.0, 1.0])
+
+    x = ad.RD(np.array([-1.0, 0.5, 2.0]), dtype=np.float32)
+    f = np.minimum(x, 0.5) + x.sigmoid_cross_entropy(labels)
+    assert f.val.dtype == np.float32
+    assert x.get_derivative().dtype == np.float32
+
+
+if __name__ == "__main__":
+    test_precision_scope()
+    test_fd_precision()
+    test_rd_precision()
+    test_precision_masks_and_labels()
@@ -4,6 +4,7 @@ import sys
 
 os.chdir(sys.path[0])
 sys.path.append("../")
+import tracemalloc
 import lahg_ad as ad
 import numpy as np
 
@@ -390,6 +391,13 @@ def test_rdpow():
     y = ad.RD(np.array([1, 2]))
     with pytest.raises(Exception):
         x ** y
+    # the log term of the exponent is dropped where the base is not positive
+    for power in (lambda a, b: a ** b, np.power):
+        x = ad.RD(np.array([-2.0, 3.0]))
+        y = ad.RD(np.array([2.0, 2.0]))
+        f = power(x, y)
+        assert np.allclose(x.get_derivative(), [-4.0, 6.0])
+        assert np.allclose(y.get_derivative(), [0.0, 9.0 * np.log(3.0)])
 
 
 def test_rdeq():
@@ -411,6 +419,283 @@ def test_rdrepr():
     assert x.__repr__() == "value = [2], derivative = [1.]"
 
 
+def test_rdlongchain():
+    x = ad.RD(np.array([0.5, 2.0]))
+    f = x
+    for _ in range(20000):
+        f = f * 1.0 + 0.0
+    assert np.array_equal(x.get_derivative(), [1.0, 1.0])
+    assert np.array_equal(f.get_value(), [0.5, 2.0])
+
+
+def test_rdshared():
+    x = ad.RD(np.array([1.0, 2.0]))
+    y = x * x
+    f = y.sin() + y.cos()
+    g = y * 3
+    expected = 2 * x.val * (np.cos(y.val) - np.sin(y.val) + 3)
+    assert np.allclose(x.get_derivative(), expected)
+    assert np.allclose(y.get_derivative(), np.cos(y.val) - np.sin(y.val) + 3)
+
+
+def test_rdbackward():
+    x = ad.RD(np.array([1.0, 2.0]))
+    y = ad.RD(np.array([3.0, 4.0]))
+    h = x * y
+    f = h.sin()
+    g = x.exp()
+    cotangent = np.array([2.0, -1.0])
+    dx, dy = ad.backward(f, cotangent, [x, y])
+    assert np.allclose(dx, cotangent * np.cos(h.val) * y.val)
+    assert np.allclose(dy, cotangent * np.cos(h.val) * x.val)
+    # the adjoint stops at the chosen output, even if it is used later
+    dx, dh = ad.backward(h, None, [x, h])
+    assert np.array_equal(dx, y.val)
+    assert np.array_equal(dh, [1.0, 1.0])
+    # an input the output does not depend on gets zeros
+    z = ad.RD(np.array([5.0, 6.0]))
+    assert np.array_equal(ad.backward(g, None, [z])[0], [0.0, 0.0])
+    # the cached derivatives are left alone
+    assert np.allclose(x.get_derivative(), y.val * np.cos(h.val) + np.exp(x.val))
+    with pytest.raises(Exception):
+        ad.backward(f, np.ones(3), [x])
+
+
+def test_rdbackward_tape():
+    with ad.Tape():
+        x = ad.RD(np.array([1.0, 2.0]))
+        y = ad.RD(np.array([3.0, 4.0]))
+        h = x * y
+        f = h.sin()
+        g = x.exp()
+    z = ad.RD(np.array([5.0, 6.0]))
+    dx, dy, dz = ad.backward(f, np.array([2.0, -1.0]), [x, y, z])
+    assert np.allclose(dx, [2.0, -1.0] * np.cos(h.val) * y.val)
+    assert np.allclose(dy, [2.0, -1.0] * np.cos(h.val) * x.val)
+    assert np.array_equal(dz, [0.0, 0.0])
+
+
+def build_vector_function(x, y):
+    h = x * y + x.sin()
+    return [h.exp() / y, (h - y) ** 2]
+
+
+def test_rdjacobian():
+    x = ad.RD(np.array([0.5, 1.0, 1.5]))
+    y = ad.RD(np.array([2.0, 3.0, 4.0]))
+    outputs = build_vector_function(x, y)
+    jac = ad.jacobian(outputs, [x, y])
+    assert jac.shape == (6, 6)
+    rows = []
+    for f in outputs:
+        for i in range(3):
+            rows.append(np.concatenate(ad.backward(f, np.eye(3)[i], [x, y])))
+    assert np.allclose(jac, np.array(rows))
+    # one sweep with a matrix of cotangents
+    dx, dy = ad.backward(outputs[0], np.eye(3), [x, y])
+    assert np.allclose(dx, jac[:3, :3]) and np.allclose(dy, jac[:3, 3:])
+
+    with ad.Tape():
+        x = ad.RD(np.array([0.5, 1.0, 1.5]))
+        y = ad.RD(np.array([2.0, 3.0, 4.0]))
+        outputs = build_vector_function(x, y)
+    assert np.allclose(ad.jacobian(outputs, [x, y]), jac)
+    z = ad.RD(np.array([1.0]))
+    with pytest.raises(Exception):
+        ad.jacobian([outputs[0], z * 2], [x])
+
+
+def test_rdjacobian_scalar():
+    x = ad.RD(np.array([1.0]))
+    y = ad.RD(np.array([2.0]))
+    f = x * y
+    jac = ad.jacobian([f, f.sin(), y ** 2], [x, y])
+    expected = [[2.0, 1.0], [2 * np.cos(2.0), np.cos(2.0)], [0.0, 4.0]]
+    assert np.allclose(jac, expected)
+
+
+def test_rdufunc():
+    x = ad.RD(np.array([3.0, 5.0]))
+    f = np.hypot(x, np.array([4.0, 12.0])) + np.array([1.0, 2.0]) * x
+    assert np.allclose(x.get_derivative(), [1.6, 5 / 13 + 2])
+    x = ad.RD(np.array([1.0, 2.0, 3.0]))
+    f = np.multiply(np.sum(x * x), x)
+    assert np.allclose(f.val, [14.0, 28.0, 42.0])
+    assert np.allclose(x.get_derivative(), [26.0, 38.0, 50.0])
+    with pytest.raises(TypeError):
+        np.floor(x)
+    with pytest.raises(Exception):
+        np.sum(x) * x
+
+
+def test_rdufunc_tape():
+    def f(x):
+        return np.multiply(np.logaddexp(np.max(x), np.arctan2(x, 2.0)), np.mean(x))
+
+    x = ad.RD(np.array([0.3, 1.2, -0.7]))
+    expected = ad.backward(f(x), None, [x])[0]
+    with ad.Tape():
+        x = ad.RD(np.array([0.3, 1.2, -0.7]))
+        y = f(x)
+    assert np.allclose(ad.backward(y, None, [x])[0], expected)
+
+
+
+def test_rdfused_primitives():
+    values = np.array([-1000.0, -1.0, 0.0, 2.0, 1000.0])
+    x = ad.RD(values)
+    x.softplus()
+    assert np.allclose(x.get_derivative(), np.exp(-np.logaddexp(0, -values)))
+
+    x, y = ad.RD(values), ad.RD(values[::-1])
+    x.logaddexp(y)
+    weight = np.exp(values - np.logaddexp(values, values[::-1]))
+    assert np.allclose(x.get_derivative(), weight)
+    assert np.allclose(y.get_derivative(), 1 - weight)
+    with pytest.raises(Exception):
+        x.logaddexp("a")
+
+    x = ad.RD(values)
+    f = x.logsumexp()
+    assert np.allclose(f.val, [1000.0])
+    assert np.allclose(x.get_derivative(), [0, 0, 0, 0, 1])
+
+    labels = np.array([0.0, 1.0, 1.0, 0.0, 1.0])
+    with ad.Tape():
+        x = ad.RD(values)
+        f = x.sigmoid_cross_entropy(labels)
+    assert np.all(np.isfinite(f.val))
+    sigmoid = np.exp(-np.logaddexp(0, -values))
+    assert np.allclose(ad.backward(f, np.ones(5), [x])[0], sigmoid - labels)
+
+
+def test_rdlazy_derivatives():
+    def model(x, y):
+        return (
+            (x * y).sin() + x.cos() * 2 - (x / 3).tan() + x.arcsin() - x.arccos()
+            + (1 - x).arctan() + x.sinh() + x.cosh() / y + x.tanh() ** 2 - x.log(2)
+            + 2 ** x + x ** y + y ** x + np.multiply(np.hypot(x, y), np.sum(-x)) + x.exp()
+        )
+
+    x0, y0 = np.array([0.2, 0.4, 0.6]), np.array([1.5, 2.0, 2.5])
+    x, y = ad.RD(x0), ad.RD(y0)
+    model(x, y)
+    expected = [x.get_derivative(), y.get_derivative()]
+
+    x, y = ad.RD(x0), ad.RD(y0)
+    with ad.lazy_derivatives():
+        f = model(x, y)
+        unused = (y * 2).sin()
+    assert callable(y.children[1][0]) and callable(y.children[-1][0])
+    x.val = x0 + 1.0  # local derivatives use the values the operations saw
+    x_adjoint, y_adjoint = ad.backward(f, None, [x, y])
+    assert np.allclose(x_adjoint, expected[0]) and np.allclose(y_adjoint, expected[1])
+    # the branch that does not reach f is never evaluated
+    assert not callable(y.children[1][0]) and callable(y.children[-1][0])
+
+    with ad.Tape():
+        x, y = ad.RD(x0), ad.RD(y0)
+        with ad.lazy_derivatives():
+            model(x, y)
+    assert np.allclose(x.get_derivative(), expected[0])
+
+
+def test_rdrequires_grad():
+    def model(w, data):
+        features = (data * 2.0).sin() + np.hypot(data, data) - data.log(2)
+        return (w * features).tanh() + features.exp()
+
+    data0 = np.linspace(1.0, 2.0, 4)
+    w = ad.RD(np.array([0.5, 1.0, 1.5, 2.0]))
+    model(w, ad.RD(data0))
+    expected = w.get_derivative()
+
+    w = ad.RD(np.array([0.5, 1.0, 1.5, 2.0]))
+    data = ad.RD(data0, requires_grad=False)
+    f = model(w, data)
+    assert np.allclose(w.get_derivative(), expected)
+    assert data.children == [] and data.get_derivative() is None
+    assert len(w.children) == 1 and f.requires_grad
+    assert "derivative = None" in repr(data.sin())
+    assert np.array_equal(ad.backward(f, None, [w, data])[1], np.zeros(4))
+
+    with ad.Tape() as tape:
+        w = ad.RD(np.array([0.5, 1.0, 1.5, 2.0]))
+        data = ad.RD(data0, requires_grad=False)
+        f = model(w, data)
+    # the leaf w, the product, tanh and the sum
+    assert len(tape) == 4
+    assert np.allclose(w.get_derivative(), expected)
+
+
+def test_rdinit_validation():
+    for value in (np.array([1, 2]), np.array([1.0, 2.0]), np.array([])):
+        assert ad.RD(value).val is value
+    for value in (
+        [1.0, 2.0],
+        np.array([[1.0, 2.0]]),
+        np.array([1, 2], dtype=np.int8),
+        np.array([True, False]),
+        np.array(["a", "b"]),
+        np.array([1.0, "a"], dtype=object),
+    ):
+        with pytest.raises(Exception):
+            ad.RD(value)
+    # results of operations use the trusted constructor
+    x = ad.RD(np.linspace(0.0, 1.0, 10 ** 6))
+    f = x.sin() * 2.0
+    assert f.val.shape == (10 ** 6,) and f.children == []
+
+
+def test_rdgradient_versioning():
+    # operations on a node upstream of a cached derivative make it stale
+    x = ad.RD(np.array([1.0, 2.0]))
+    y = x.sin()
+    assert np.allclose(x.get_derivative(), np.cos([1.0, 2.0]))
+    z = y * 2
+    assert np.allclose(x.get_derivative(), 2 * np.cos([1.0, 2.0]))
+    assert np.allclose(y.get_derivative(), [2.0, 2.0])
+    y.reset()
+    assert np.allclose(x.get_derivative(), np.cos([1.0, 2.0]))
+
+    # interleaved builds and queries match a derivative computed from scratch
+    x = ad.RD(np.linspace(0.5, 1.5, 4))
+    d = np.linspace(1.0, -1.0, 4)
+    expected = np.zeros(4)
+    for i in range(20):
+        t = 0.5 ** i
+        y = x + d * t
+        np.sum((y * y).sin() + y.exp())
+        expected += 2 * (x.val + d * t) * np.cos((x.val + d * t) ** 2)
+        expected += np.exp(x.val + d * t)
+        assert np.allclose(x.get_derivative(), expected)
+    # only the new trial point is walked, the earlier ones keep their derivatives
+    y = x + d
+    f = np.sum(y.cos())
+    order = ad.rd._topological_order(x)
+    assert len(order) == 4 and order[-1] is x
+
+
+def test_rdgradient_memory():
+    # the derivative of a small leaf does not keep the adjoints of a large graph alive
+    x = ad.RD(np.linspace(0.5, 1.5, 1000))
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        with ad.Graph():
+            f = x
+            for _ in range(1000):
+                f = (f * 0.5).sin()
+            gradient = x.get_derivative()
+        del f
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    # the adjoint buffer of the graph alone is 16 MB, the derivative 8 kB
+    assert retained < 256 * 1024
+    assert np.allclose(gradient, x.get_derivative())
+
+
 if __name__ == "__main__":
     test_rdsin()
     test_rdcos()
@@ -436,3 +721,17 @@ if __name__ == "__main__":
     test_rdeq()
     test_rdne()
     test_rdrepr()
+    test_rdlongchain()
+    test_rdshared()
+    test_rdbackward()
+    test_rdbackward_tape()
+    test_rdjacobian()
+    test_rdjacobian_scalar()
+    test_rdufunc()
+    test_rdufunc_tape()
+    test_rdfused_primitives()
+    test_rdlazy_derivatives()
+    test_rdrequires_grad()
+    test_rdinit_validation()
+    test_rdgradient_versioning()
+    test_rdgradient_memory()
@@ -0,0 +1,66 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import lahg_ad as ad
+import numpy as np
+
+
+def model(x, y, z):
+    f = (x * y).sin() + x.log(np.e) * 3 - y ** 2 / x + (2 ** z).logistic()
+    return np.sum(f * np.array([1.0, 2.0, 3.0])) + np.max(z * x) + np.mean(y.exp())
+
+
+def test_static_matches_rebuild():
+    rng = np.random.default_rng(1)
+    samples = [ad.RD(rng.uniform(0.5, 2.0, 3)) for _ in range(3)]
+    graph = ad.StaticGraph(model, *samples)
+    buffers = [id(value) for value in graph.values]
+    for _ in range(5):
+        values = [rng.uniform(0.5, 2.0, 3) for _ in range(3)]
+        value, gradients = graph(*values)
+        leaves = [ad.RD(v) for v in values]
+        f = model(*leaves)
+        assert np.allclose(value, f.val)
+        for gradient, leaf in zip(gradients, leaves):
+            assert np.allclose(gradient, leaf.get_derivative())
+    # the buffers are reused by every call
+    assert [id(value) for value in graph.values] == buffers
+
+
+def test_static_broadcast_and_cotangents():
+    def function(x, b):
+        return (x * b + 1.0).tanh(), np.max(x, axis=0) * np.sum(b)
+
+    x = np.linspace(0.1, 1.2, 12).reshape(4, 3)
+    b = np.array([0.5, -1.0, 2.0])
+    graph = ad.StaticGraph(function, x, b)
+    program = ad.trace(function, ad.Variable(x, np.zeros((4, 3))), ad.Variable(b, np.zeros(3)))
+    reverse = ad.compile_program(program, "reverse")
+    cotangents = [np.ones((4, 3)), np.array([1.0, 2.0, 3.0])]
+    for scale in (1.0, 2.0):
+        (value, maxima), gradients = graph(x * scale, b, cotangents=cotangents)
+        (expected, expected_maxima), expected_gradients = reverse(
+            x * scale, b, cotangents=cotangents
+        )
+        assert np.allclose(value, expected) and np.allclose(maxima, expected_maxima)
+        for gradient, expected_gradient in zip(gradients, expected_gradients):
+            assert np.allclose(gradient, expected_gradient)
+
+
+def test_static_errors():
+    graph = ad.StaticGraph(lambda x: x.sin(), np.ones(2))
+    with pytest.raises(Exception):
+        graph(np.ones(2), np.ones(2))
+    with pytest.raises(Exception):
+        graph(np.ones(3))
+    with pytest.raises(Exception):
+        ad.StaticGraph(lambda x: ad.RD(np.ones(2)), np.ones(2))
+
+
+if __name__ == "__main__":
+    test_static_matches_rebuild()
+    test_static_broadcast_and_cotangents()
+    test_static_errors()
@@ -0,0 +1,86 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import lahg_ad as ad
+import numpy as np
+
+
+def composite(x, y):
+    return (x * y).sin() + x.log(np.e) * 3 - y ** 2 / x + (2 ** x).logistic()
+
+
+def test_tape_matches_children():
+    x = ad.RD(np.array([1.0, 2.0, 3.0]))
+    y = ad.RD(np.array([0.5, 1.5, 2.5]))
+    composite(x, y)
+    expected_x, expected_y = x.get_derivative(), y.get_derivative()
+
+    with ad.Tape() as tape:
+        x = ad.RD(np.array([1.0, 2.0, 3.0]))
+        y = ad.RD(np.array([0.5, 1.5, 2.5]))
+        f = composite(x, y)
+    assert np.allclose(x.get_derivative(), expected_x)
+    assert np.allclose(y.get_derivative(), expected_y)
+    assert np.array_equal(f.get_derivative(), [1.0, 1.0, 1.0])
+    assert x.children == [] and f.children is None
+    assert len(tape) > 10
+
+
+def test_tape_scalar_chain():
+    with ad.Tape(capacity=4) as tape:
+        x = ad.RD(np.array([0.5]))
+        f = x
+        for _ in range(50000):
+            f = f.sin() * 1.0
+    expected = 1.0
+    value = 0.5
+    for _ in range(50000):
+        expected *= np.cos(value)
+        value = np.sin(value)
+    assert np.allclose(x.get_derivative(), [expected])
+    assert np.allclose(f.get_value(), [value])
+    assert len(tape) == 100001
+
+
+def test_tape_keeps_recording():
+    with ad.Tape() as tape:
+        x = ad.RD(np.array([2.0]))
+        y = x * x
+    f = y * 3
+    assert len(tape) == 3
+    assert np.array_equal(x.get_derivative(), [12.0])
+    g = y + 1
+    assert np.array_equal(x.get_derivative(), [16.0])
+
+
+def test_tape_reset():
+    with ad.Tape():
+        x = ad.RD(np.array([2.0]))
+        f = x ** 3
+    assert np.array_equal(x.get_derivative(), [12.0])
+    x.reset()
+    assert np.array_equal(x.get_derivative(), [1.0])
+    assert x.tape is None
+
+
+def test_tape_record():
+    tape = ad.Tape(capacity=1)
+    x = tape.record("leaf", 3)
+    y = tape.record("leaf", 3)
+    z = tape.record("mul", 3, [(x, np.array([1, 2, 3])), (y, np.array([4, 5, 6]))])
+    assert np.array_equal(tape.gradient(x), [1, 2, 3])
+    assert np.array_equal(tape.gradient(y), [4, 5, 6])
+    assert np.array_equal(tape.gradient(z), [1, 1, 1])
+    with pytest.raises(KeyError):
+        tape.record("unknown", 3)
+
+
+if __name__ == "__main__":
+    test_tape_matches_children()
+    test_tape_scalar_chain()
+    test_tape_keeps_recording()
+    test_tape_reset()
+    test_tape_record()
@@ -0,0 +1,81 @@
+import pytest
+import os
+import sys
+
+os.chdir(sys.path[0])
+sys.path.append("../")
+import lahg_ad as ad
+import numpy as np
+
+
+def composite(x, y):
+    return np.cos(x * y) + x * y + 3 * np.log(x) + (x / y).logistic() - y.exp(2) + 1 / y
+
+
+def test_trace():
+    x, y = ad.make_variables([5.0, 7.0], np.eye(2))
+    program = ad.trace(composite, x, y)
+    assert len(program) == 14
+    for a, b in [(5.0, 7.0), (1.5, -2.0), (0.3, 0.9)]:
+        x, y = ad.make_variables([a, b], np.eye(2))
+        expected = composite(x, y)
+        result = program(x, y)
+        assert np.isclose(result.val, expected.val)
+        assert np.allclose(result.der, expected.der)
+
+
+def test_trace_vector():
+    def f(x, y):
+        return np.sum(np.maximum(x, 1.5) * y.sin()), x.sqrt() - y ** 2
+
+    x, y = ad.make_variables([np.linspace(1.0, 2.0, 4), np.linspace(2.0, 3.0, 4)])
+    program = ad.trace(f, x, y)
+    x, y = ad.make_variables([np.linspace(0.5, 3.0, 4), np.linspace(-1.0, 1.0, 4)])
+    for result, expected in zip(program(x, y), f(x, y)):
+        assert np.allclose(result.val, expected.val)
+        assert np.allclose(result.der, expected.der)
+
+
+def test_trace_errors():
+    x = ad.Variable(2.0, 1.0)
+    with pytest.raises(Exception):
+        ad.trace(lambda a: a * x, x)
+    with pytest.raises(Exception):
+        ad.trace(lambda a: a, 2.0)
+    program = ad.trace(lambda a: a * 2, x)
+    with pytest.raises(Exception):
+        program(x, x)
+
+
+def test_trace_input_mismatch():
+    # the kernels are specialized on the traced shapes and tangent directions
+    program = ad.trace(lambda a: a.sin() * a, ad.DualArray(np.array([1.0, 2.0]), np.ones(2)))
+    x = ad.DualArray(np.array([0.5, 1.5]), np.eye(2))
+    with pytest.raises(Exception, match="tangent of input 0"):
+        program(x)
+    with pytest.raises(Exception, match="traced shape"):
+        program(ad.DualArray(np.ones(3), np.ones(3)))
+    result = ad.trace(lambda a: a.sin() * a, x)(x)
+    assert np.allclose(result.der, np.diag(np.sin(x.val) + x.val * np.cos(x.val)))
+
+
+def test_trace_fused_primitives():
+    def f(x, y):
+        return x.softplus() * y + x.logaddexp(y) + x.sigmoid_cross_entropy(np.ones(3)) + y.logsumexp()
+
+    x = ad.DualArray(np.array([-3.0, 0.5, 2.0]), np.random.rand(3, 2))
+    y = ad.DualArray(np.array([1.0, -2.0, 3.0]), np.random.rand(3, 2))
+    program = ad.trace(f, x, y)
+    x, y = ad.DualArray(x.val * 1.5, x.der), ad.DualArray(y.val - 0.5, y.der)
+    expected = f(x, y)
+    for result in (program(x, y), ad.compile_program(program)(x, y)):
+        assert np.allclose(result.val, expected.val)
+        assert np.allclose(result.der, expected.der)
+
+
+if __name__ == "__main__":
+    test_trace()
+    test_trace_vector()
+    test_trace_errors()
+    test_trace_input_mismatch()
+    test_trace_fused_primitives()